@@ -1,12 +1,17 @@
-from fastapi import APIRouter, HTTPException, Depends
+from typing import List, Optional
+from fastapi import APIRouter, Body, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
 from app.models.expense import Expense
-from app.services import expense_service
+from app.responses import DocumentResponse, page_response
+from app.services import expense_service, export_service, user_service
+from app.services.export_service import DEFAULT_EXPORT_BATCH_SIZE, EXPORT_FORMATS
 from app import validators
+from app.utils import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, parse_fields
 
 expense_router = APIRouter()
 
 
-@expense_router.get('/{expense_id}')
+@expense_router.get('/{expense_id}', response_model=Expense)
 async def get_expense_by_id(expense_id: int):
     """
     Retrieve an expense by its ID.
@@ -21,20 +26,28 @@ async def get_expense_by_id(expense_id: int):
         HTTPException: If an error occurs during the retrieval process.
     """
     try:
-        return await expense_service.get_expense_by_id(expense_id)
+        return DocumentResponse(await expense_service.get_expense_by_id(expense_id))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@expense_router.get('/user/{user_id}')
-async def get_all_expenses_by_user_id(user_id: int):
+@expense_router.get('/user/{user_id}', response_model=List[Expense])
+async def get_all_expenses_by_user_id(user_id: int,
+                                      limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                                      after: Optional[int] = None, fields: Optional[str] = None):
     """
-    Retrieve all expenses belonging to a specific user by their ID.
+    Retrieve one page of the expenses belonging to a specific user by their ID.
+
+    The ID of the last item is returned in the X-Next-Cursor header when more items may follow;
+    pass it as "after" to fetch the next page.
 
     Args:
         user_id (int): The ID of the user.
+        limit (int): The maximum number of expenses to return.
+        after (int, optional): The cursor returned with the previous page.
+        fields (str, optional): Comma separated fields to return; all fields by default.
 
     Returns:
         List[Expense]: A list containing all expenses associated with the user.
@@ -43,11 +56,40 @@ async def get_all_expenses_by_user_id(user_id: int):
         HTTPException: If an error occurs during the retrieval process.
     """
     try:
-        return await expense_service.get_all_expenses_by_user_id(user_id)
+        expenses = await expense_service.get_all_expenses_by_user_id(user_id, limit=limit, after=after,
+                                                                     fields=parse_fields(fields))
+        return page_response(expenses, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@expense_router.get('/user/{user_id}/export')
+async def export_expenses_by_user_id(user_id: int, format: str = Query('ndjson', pattern='^(ndjson|csv)$'),
+                                     batch_size: int = Query(DEFAULT_EXPORT_BATCH_SIZE, ge=1, le=10000)):
+    """
+    Stream every expense of a specific user as NDJSON or CSV.
+
+    Args:
+        user_id (int): The ID of the user.
+        format (str): "ndjson" or "csv".
+        batch_size (int): The number of expenses fetched from the database per round trip.
+
+    Returns:
+        StreamingResponse: The expenses, ordered by ID.
+    """
+    try:
+        await user_service.check_user_exists(user_id)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return StreamingResponse(
+        export_service.export_user_collection(user_id, "expenses", format, batch_size),
+        media_type=EXPORT_FORMATS[format],
+        headers={'Content-Disposition': f'attachment; filename="expenses_{user_id}.{format}"'},
+    )
 
 
 @expense_router.post('/create_expense_to_user/{user_id}')
@@ -78,6 +120,31 @@ async def create_expense_to_user(user_id: int, new_expense: Expense,
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@expense_router.post('/batch')
+async def create_expenses_batch(items: List[dict] = Body(...)):
+    """
+    Create many expenses in one request.
+
+    Each item is validated on its own; invalid items and items of users who cannot take more
+    expenses are reported in "errors" while the rest are created.
+
+    Args:
+        items (List[dict]): The expenses to create.
+
+    Returns:
+        dict: The number of created expenses, the ID of each by item index, and per-item errors.
+
+    Raises:
+        HTTPException: If the batch is empty or too large, or an error occurs while writing it.
+    """
+    try:
+        return await expense_service.create_expenses_batch(items)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @expense_router.put('/update_expense/{expense_id}')
 async def update_expense(expense_id: int, new_expense: Expense, validate_expense: bool = Depends(validators.validate_expense_dependency)):
     """
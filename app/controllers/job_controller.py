@@ -0,0 +1,23 @@
+from fastapi import APIRouter, HTTPException
+from app.services import job_service
+
+job_router = APIRouter()
+
+
+@job_router.get('/{job_id}')
+async def get_job(job_id: str):
+    """
+    Retrieves the status of a background job.
+
+    Args:
+        job_id (str): The ID of the job.
+
+    Returns:
+        dict: The job's kind, status, progress, result or error, and timestamps.
+    """
+    try:
+        return await job_service.get_job(job_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
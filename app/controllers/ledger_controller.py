@@ -0,0 +1,41 @@
+from fastapi import APIRouter, HTTPException
+from app.services import ledger_service
+
+ledger_router = APIRouter()
+
+
+@ledger_router.get('/{user_id}/balance')
+async def check_balance(user_id: int):
+    """
+    Compares a user's stored balance with the balance rebuilt from the ledger.
+
+    Args:
+        user_id (int): The ID of the user.
+
+    Returns:
+        dict: The stored and ledger balances, the ledger version, and whether they agree.
+    """
+    try:
+        return await ledger_service.check_balance(user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@ledger_router.post('/reconcile')
+async def reconcile(fix: bool = False):
+    """
+    Starts a background job checking every user's balance against the ledger.
+
+    Args:
+        fix (bool): Whether to overwrite mismatched balances with the ledger balance.
+
+    Returns:
+        dict: The ID of the job, which can be polled at /jobs/{job_id}.
+    """
+    try:
+        job_id = await ledger_service.start_reconciliation(fix)
+        return {"message": "Reconciliation started", "job_id": job_id}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
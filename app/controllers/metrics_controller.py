@@ -0,0 +1,16 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.metrics import render_prometheus
+
+metrics_router = APIRouter()
+
+
+@metrics_router.get('', response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Exposes every application metric in the Prometheus text format.
+
+    Returns:
+        PlainTextResponse: The metrics exposition.
+    """
+    return PlainTextResponse(render_prometheus(), media_type='text/plain; version=0.0.4')
@@ -1,11 +1,16 @@
-from fastapi import APIRouter, HTTPException
+from typing import List, Optional
+from fastapi import APIRouter, Body, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from app.models.revenue import Revenue
-from app.services import revenue_service
+from app.responses import DocumentResponse, page_response
+from app.services import revenue_service, export_service, user_service
+from app.services.export_service import DEFAULT_EXPORT_BATCH_SIZE, EXPORT_FORMATS
+from app.utils import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, parse_fields
 
 revenue_router = APIRouter()
 
 
-@revenue_router.get('/{revenue_id}')
+@revenue_router.get('/{revenue_id}', response_model=Revenue)
 async def get_revenue_by_id(revenue_id: int):
     """
     Retrieves a revenue by its ID.
@@ -20,20 +25,28 @@ async def get_revenue_by_id(revenue_id: int):
         HTTPException: Returns a 400 error if the provided revenue ID is invalid. Returns a 500 error for any other exceptions.
     """
     try:
-        return await revenue_service.get_revenue_by_id(revenue_id)
+        return DocumentResponse(await revenue_service.get_revenue_by_id(revenue_id))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@revenue_router.get('/user/{user_id}')
-async def get_all_revenues_by_user_id(user_id: int):
+@revenue_router.get('/user/{user_id}', response_model=List[Revenue])
+async def get_all_revenues_by_user_id(user_id: int,
+                                      limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                                      after: Optional[int] = None, fields: Optional[str] = None):
     """
-    Retrieves all revenues associated with a specific user.
+    Retrieves one page of the revenues associated with a specific user.
+
+    The ID of the last item is returned in the X-Next-Cursor header when more items may follow;
+    pass it as "after" to fetch the next page.
 
     Args:
         user_id (int): The ID of the user whose revenues to retrieve.
+        limit (int): The maximum number of revenues to return.
+        after (int, optional): The cursor returned with the previous page.
+        fields (str, optional): Comma separated fields to return; all fields by default.
 
     Returns:
         List[dict]: A list of revenue objects associated with the user.
@@ -42,13 +55,42 @@ async def get_all_revenues_by_user_id(user_id: int):
         HTTPException: Returns a 400 error if the provided user ID is invalid. Returns a 500 error for any other exceptions.
     """
     try:
-        return await revenue_service.get_all_revenues_by_user_id(user_id)
+        revenues = await revenue_service.get_all_revenues_by_user_id(user_id, limit=limit, after=after,
+                                                                     fields=parse_fields(fields))
+        return page_response(revenues, limit)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@revenue_router.get('/user/{user_id}/export')
+async def export_revenues_by_user_id(user_id: int, format: str = Query('ndjson', pattern='^(ndjson|csv)$'),
+                                     batch_size: int = Query(DEFAULT_EXPORT_BATCH_SIZE, ge=1, le=10000)):
+    """
+    Stream every revenue of a specific user as NDJSON or CSV.
+
+    Args:
+        user_id (int): The ID of the user.
+        format (str): "ndjson" or "csv".
+        batch_size (int): The number of revenues fetched from the database per round trip.
+
+    Returns:
+        StreamingResponse: The revenues, ordered by ID.
+    """
+    try:
+        await user_service.check_user_exists(user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return StreamingResponse(
+        export_service.export_user_collection(user_id, "revenues", format, batch_size),
+        media_type=EXPORT_FORMATS[format],
+        headers={'Content-Disposition': f'attachment; filename="revenues_{user_id}.{format}"'},
+    )
+
+
 @revenue_router.post('/create_revenue_to_user/{user_id}')
 async def create_revenue(user_id: int, new_revenue: Revenue):
     """
@@ -72,6 +114,30 @@ async def create_revenue(user_id: int, new_revenue: Revenue):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@revenue_router.post('/batch')
+async def create_revenues_batch(items: List[dict] = Body(...)):
+    """
+    Creates many revenue entries in one request.
+
+    Each item is validated on its own; invalid items are reported in "errors" while the rest are created.
+
+    Args:
+        items (List[dict]): The revenue objects to create.
+
+    Returns:
+        dict: The number of created revenues, the ID of each by item index, and per-item errors.
+
+    Raises:
+        HTTPException: Returns a 400 error if the batch is empty or too large. Returns a 500 error for any other exceptions.
+    """
+    try:
+        return await revenue_service.create_revenues_batch(items)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @revenue_router.put('/update revenue/{revenue_id}')
 async def update_revenue(revenue_id: int, new_revenue: Revenue):
     """
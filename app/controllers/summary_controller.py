@@ -0,0 +1,27 @@
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from app.services import summary_service
+
+summary_router = APIRouter()
+
+
+@summary_router.get('/{user_id}')
+async def get_summary(user_id: int, year: Optional[int] = Query(None, ge=1900, le=9999),
+                      month: Optional[int] = Query(None, ge=1, le=12)):
+    """
+    Retrieves a user's totals for one month from the maintained monthly summaries.
+
+    Args:
+        user_id (int): The ID of the user.
+        year (int, optional): The year; the current year by default.
+        month (int, optional): The month, 1 to 12; the current month by default.
+
+    Returns:
+        dict: The month's total expense and revenue, their counts, and the net amount.
+    """
+    try:
+        return await summary_service.get_summary(user_id, year, month)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
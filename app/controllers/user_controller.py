@@ -1,7 +1,12 @@
-from fastapi import APIRouter, HTTPException, Depends
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import StreamingResponse
 from app.models.user import User
-from app.services import user_service
+from app.responses import DocumentResponse, page_response
+from app.services import user_service, export_service, import_service
+from app.services.export_service import DEFAULT_EXPORT_BATCH_SIZE, EXPORT_FORMATS
 from app import validators
+from app.utils import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, parse_fields
 
 
 user_router = APIRouter()
@@ -19,7 +24,7 @@ async def get_user_by_id(user_id: int):
         dict: A dictionary containing the user's information.
     """
     try:
-        return await user_service.get_user_by_id(user_id)
+        return DocumentResponse(await user_service.get_user_by_id(user_id))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -27,18 +32,81 @@ async def get_user_by_id(user_id: int):
 
 
 @user_router.get('')
-async def get_all_users():
+async def get_all_users(limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                        after: Optional[int] = None, fields: Optional[str] = None):
     """
-    Retrieves all users.
+    Retrieves one page of users, without their password hashes.
+
+    The ID of the last item is returned in the X-Next-Cursor header when more items may follow;
+    pass it as "after" to fetch the next page.
+
+    Args:
+        limit (int): The maximum number of users to return.
+        after (int, optional): The cursor returned with the previous page.
+        fields (str, optional): Comma separated fields to return; all fields except the password by default.
 
     Returns:
         list: A list containing dictionaries of user information.
     """
     try:
-        users = await user_service.get_all_users()
-        if not users:
+        users = await user_service.get_all_users(limit=limit, after=after, fields=parse_fields(fields))
+        if not users and after is None:
             raise HTTPException(status_code=404, detail="No users found")
-        return users
+        return page_response(users, limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@user_router.get('/{user_id}/ledger/export')
+async def export_ledger(user_id: int, format: str = Query('ndjson', pattern='^(ndjson|csv)$'),
+                        batch_size: int = Query(DEFAULT_EXPORT_BATCH_SIZE, ge=1, le=10000)):
+    """
+    Streams a user's expenses and revenues as one ledger ordered by date, as NDJSON or CSV.
+
+    Args:
+        user_id (int): The ID of the user.
+        format (str): "ndjson" or "csv".
+        batch_size (int): The number of documents fetched from the database per round trip.
+
+    Returns:
+        StreamingResponse: The ledger rows, with a kind and a signed amount.
+    """
+    try:
+        await user_service.check_user_exists(user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return StreamingResponse(
+        export_service.export_user_ledger(user_id, format, batch_size),
+        media_type=EXPORT_FORMATS[format],
+        headers={'Content-Disposition': f'attachment; filename="ledger_{user_id}.{format}"'},
+    )
+
+
+@user_router.post('/{user_id}/import')
+async def import_statement(user_id: int, request: Request, format: str = Query('csv', pattern='^(csv|ofx)$')):
+    """
+    Imports a bank statement, sent as the raw request body, into a user's expenses and revenues.
+
+    CSV statements need a header with date, description and either amount or debit and credit columns.
+    Negative amounts become expenses and positive ones revenues; rows already recorded for the user
+    are skipped. The import runs as a background job whose progress can be polled at /jobs/{job_id}.
+
+    Args:
+        user_id (int): The ID of the user.
+        request (Request): The upload request.
+        format (str): "csv" or "ofx".
+
+    Returns:
+        dict: The ID of the import job.
+    """
+    try:
+        await user_service.get_user_by_id(user_id)
+        job_id = await import_service.start_import(user_id, request.stream(), format)
+        return {"message": "Import started", "job_id": job_id}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -125,18 +193,20 @@ async def update_user(user_id: int, new_user: User,
 
 
 @user_router.delete('/{user_id}')
-async def delete_user(user_id: int):
+async def delete_user(user_id: int, background: bool = False):
     """
     Deletes a user from the system.
 
     Args:
         user_id (int): The ID of the user to be deleted.
+        background (bool): If True, the user's revenues and expenses are deleted by a background
+            job that can be polled at /jobs/{job_id}.
 
     Returns:
         dict: A dictionary containing the result of deleting the user.
     """
     try:
-        return await user_service.delete_user(user_id)
+        return await user_service.delete_user(user_id, background)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
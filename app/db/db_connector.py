@@ -1,15 +1,140 @@
-from pymongo import MongoClient
+import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+from app.metrics import Counter, Gauge, Histogram
 import os
 
 mongo_host = os.getenv('MONGO_HOST', 'localhost')
 mongo_port = os.getenv('MONGO_PORT', '27017')
 mongo_db = os.getenv('MONGO_DB', 'BudgetManagment')
+mongo_use_transactions = os.getenv('MONGO_USE_TRANSACTIONS', 'false').lower() == 'true'
+mongo_max_pool_size = int(os.getenv('MONGO_MAX_POOL_SIZE', '100'))
+mongo_min_pool_size = int(os.getenv('MONGO_MIN_POOL_SIZE', '0'))
+mongo_wait_queue_timeout_ms = int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', '0'))
+mongo_server_selection_timeout_ms = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', '30000'))
+mongo_compressors = os.getenv('MONGO_COMPRESSORS', '')
+mongo_write_concern = os.getenv('MONGO_WRITE_CONCERN', '')
+mongo_warmup_connections = int(os.getenv('MONGO_WARMUP_CONNECTIONS', '0'))
 
-client = AsyncIOMotorClient(f'mongodb://{mongo_host}:{mongo_port}')
-my_db = client[mongo_db]
+pool_connections_open = Gauge('mongo_pool_connections_open', 'Open connections in the MongoDB pool')
+pool_connections_in_use = Gauge('mongo_pool_connections_in_use', 'MongoDB connections currently checked out')
+pool_checkout_seconds = Histogram('mongo_pool_checkout_seconds', 'Time spent waiting to check out a MongoDB connection')
+pool_checkout_failures = Counter('mongo_pool_checkout_failures_total', 'Failed MongoDB connection checkouts')
 
+client = None
+my_db = None
 
-users = my_db['users']
-expenses = my_db['expenses']
-revenues = my_db['revenues']
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """
+    Exports connection pool usage so the pool can be sized against the number of uvicorn workers.
+    """
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pool_connections_open.inc()
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pool_connections_open.dec()
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        pool_checkout_failures.inc(reason=str(event.reason))
+        if getattr(event, 'duration', None) is not None:
+            pool_checkout_seconds.observe(event.duration)
+
+    def connection_checked_out(self, event):
+        pool_connections_in_use.inc()
+        if getattr(event, 'duration', None) is not None:
+            pool_checkout_seconds.observe(event.duration)
+
+    def connection_checked_in(self, event):
+        pool_connections_in_use.dec()
+
+
+def create_client():
+    """
+    Builds the Motor client from the MONGO_* environment variables.
+
+    Returns:
+        AsyncIOMotorClient: The configured client. No connection is opened until it is used.
+    """
+    options = {
+        'maxPoolSize': mongo_max_pool_size,
+        'minPoolSize': mongo_min_pool_size,
+        'serverSelectionTimeoutMS': mongo_server_selection_timeout_ms,
+        'event_listeners': [PoolMetricsListener()],
+    }
+    if mongo_wait_queue_timeout_ms:
+        options['waitQueueTimeoutMS'] = mongo_wait_queue_timeout_ms
+    if mongo_compressors:
+        options['compressors'] = mongo_compressors
+    if mongo_write_concern:
+        options['w'] = int(mongo_write_concern) if mongo_write_concern.isdigit() else mongo_write_concern
+    return AsyncIOMotorClient(f'mongodb://{mongo_host}:{mongo_port}', **options)
+
+
+def get_db():
+    """
+    Returns the application database, creating the client on first use outside the app lifespan
+    (for example in scripts and tests).
+
+    Returns:
+        AsyncIOMotorDatabase: The database handle.
+    """
+    global client, my_db
+    if my_db is None:
+        client = create_client()
+        my_db = client[mongo_db]
+    return my_db
+
+
+def get_client():
+    """
+    Returns the Motor client, creating it on first use.
+
+    Returns:
+        AsyncIOMotorClient: The client.
+    """
+    get_db()
+    return client
+
+
+async def connect():
+    """
+    Creates the client, checks that the server is reachable and warms up the connection pool.
+
+    MONGO_WARMUP_CONNECTIONS concurrent pings are issued so that many connections are already
+    open before the first request arrives.
+    """
+    get_db()
+    await client.admin.command('ping')
+    if mongo_warmup_connections > 1:
+        await asyncio.gather(*(client.admin.command('ping') for _ in range(mongo_warmup_connections)))
+
+
+def close():
+    """
+    Closes the client and its connection pool.
+    """
+    global client, my_db
+    if client is not None:
+        client.close()
+    client = None
+    my_db = None
@@ -1,143 +1,436 @@
-from app.db.db_connector import my_db
+from contextlib import asynccontextmanager
+from datetime import datetime
+from app.db import repository
+from app.db.db_metrics import instrumented
 from app.utils import to_json
 
+LEDGER_EVENTS_COLLECTION = "ledger_events"
 
-async def get_all(collection_name):
+
+@asynccontextmanager
+async def transaction():
+    """
+    Runs the enclosed writes in a MongoDB multi-document transaction when MONGO_USE_TRANSACTIONS is set.
+
+    Transactions require a replica set or sharded cluster, so they are opt-in. Without them (and
+    with the in-memory repository) the yielded session is None and every write is applied on its own.
+
+    Yields:
+        AsyncIOMotorClientSession: The session to pass to the db functions, or None.
+    """
+    async with repository.get().transaction() as session:
+        yield session
+
+
+def _without_object_id(projection):
+    """
+    Adds "_id": 0 to a projection unless it asks for _id explicitly.
+
+    Documents are identified by their numeric "id", so the ObjectId is left out at the query level
+    and read results can be returned as they come, without a pass to stringify it.
+    """
+    if projection is None:
+        return {"_id": 0}
+    if "_id" in projection:
+        return projection
+    return {**projection, "_id": 0}
+
+
+def _find_page(query, collection_name, limit=None, after=None, projection=None):
+    """
+    Finds one keyset page of documents ordered by ID.
+
+    Args:
+        query (dict): The filter to apply.
+        collection_name (str): The name of the collection in the database.
+        limit (int, optional): The maximum number of documents to return.
+        after (int, optional): Only documents with an ID greater than this are returned.
+        projection (dict, optional): The fields to return.
+
+    Returns:
+        AsyncIterator: The documents of the page.
     """
-    Retrieves all documents from a specified collection in the database.
+    if after is not None:
+        query = {**query, "id": {"$gt": after}}
+    sort = [("id", 1)] if limit is not None or after is not None else None
+    return repository.get().find(collection_name, query, projection=_without_object_id(projection), sort=sort,
+                                 limit=limit)
+
+
+@instrumented
+async def get_all(collection_name, limit=None, after=None, projection=None):
+    """
+    Retrieves documents from a specified collection in the database, optionally one page at a time.
 
     Args:
         collection_name (str): The name of the collection in the database.
+        limit (int, optional): The maximum number of documents to return.
+        after (int, optional): Only documents with an ID greater than this are returned.
+        projection (dict, optional): The fields to return.
 
     Returns:
         list: A list containing dictionaries of retrieved documents.
     """
     try:
-        cursor = my_db[collection_name].find({})
-        results = await cursor.to_list(length=None)
-        return to_json(results)
+        return [document async for document in _find_page({}, collection_name, limit, after, projection)]
     except Exception as e:
         raise RuntimeError(f"Error retrieving documents from collection {collection_name}: {e}")
 
 
-async def get_by_id(object_id, collection_name):
+@instrumented
+async def get_by_id(object_id, collection_name, session=None):
     """
     Retrieves a document by its ID from a specified collection in the database.
 
     Args:
         object_id (any): The ID of the document to retrieve.
         collection_name (str): The name of the collection in the database.
+        session (AsyncIOMotorClientSession, optional): The transaction session to run in.
 
     Returns:
         dict: A dictionary containing the retrieved document.
     """
     try:
-        element = await my_db[collection_name].find_one({"id": object_id})
+        element = await repository.get().get_by_id(collection_name, object_id, projection={"_id": 0},
+                                                   session=session)
         if element is None:
             raise ValueError("Element not found")
-        return to_json(element)
+        return element
     except Exception as e:
         raise RuntimeError(f"Error retrieving document: {e}")
 
 
-async def add(document, collection_name):
+@instrumented
+async def get_by_field(field, value, collection_name, projection=None):
+    """
+    Retrieves a single document by the value of a field, typically an indexed one.
+
+    Args:
+        field (str): The name of the field to match.
+        value (any): The value the field must be equal to.
+        collection_name (str): The name of the collection in the database.
+        projection (dict, optional): The fields to return.
+
+    Returns:
+        dict: A dictionary containing the retrieved document, or None if no document matches.
+    """
+    try:
+        return await repository.get().find_one(collection_name, {field: value},
+                                               projection=_without_object_id(projection))
+    except Exception as e:
+        raise RuntimeError(f"Error retrieving document by {field}: {e}")
+
+
+@instrumented
+async def find_one(query, collection_name, projection=None, sort=None, session=None):
+    """
+    Retrieves the first document matching a query.
+
+    Args:
+        query (dict): The filter the document must match.
+        collection_name (str): The name of the collection in the database.
+        projection (dict, optional): The fields to return.
+        sort (list, optional): (field, direction) pairs deciding which match comes first.
+        session (AsyncIOMotorClientSession, optional): The transaction session to run in.
+
+    Returns:
+        dict: The retrieved document, or None if no document matches.
+    """
+    try:
+        return await repository.get().find_one(collection_name, query, projection=_without_object_id(projection),
+                                               sort=sort, session=session)
+    except Exception as e:
+        raise RuntimeError(f"Error retrieving document: {e}")
+
+
+@instrumented
+async def add(document, collection_name, session=None):
     """
     Adds a document to a specified collection in the database.
 
     Args:
         document (dict): The document to be added.
         collection_name (str): The name of the collection in the database.
+        session (AsyncIOMotorClientSession, optional): The transaction session to run in.
 
     Returns:
         dict: A dictionary containing the inserted ID.
     """
     try:
-        result = await my_db[collection_name].insert_one(document)
-        return {"inserted_id": str(result.inserted_id)}
+        inserted_id = await repository.get().insert(collection_name, document, session=session)
+        return {"inserted_id": str(inserted_id)}
     except Exception as e:
         raise RuntimeError(f"Error adding document to collection {collection_name}: {e}")
 
 
-async def update(document, collection_name):
+@instrumented
+async def add_many(documents, collection_name, session=None):
     """
-    Updates a document in the specified collection.
+    Adds several documents to a specified collection in a single insert_many round trip.
+
+    Args:
+        documents (list): The documents to be added.
+        collection_name (str): The name of the collection in the database.
+        session (AsyncIOMotorClientSession, optional): The transaction session to run in.
+
+    Returns:
+        int: The number of documents inserted.
+    """
+    try:
+        return await repository.get().insert_many(collection_name, documents, session=session)
+    except Exception as e:
+        raise RuntimeError(f"Error adding documents to collection {collection_name}: {e}")
+
+
+@instrumented
+async def update(document, collection_name, session=None, return_document=None):
+    """
+    Updates a document in the specified collection in a single round trip.
 
     Args:
         document (dict): The updated document.
         collection_name (str): The name of the collection in the database.
+        session (AsyncIOMotorClientSession, optional): The transaction session to run in.
+        return_document (str, optional): "before" or "after" to return the document as it was before
+            or after the update instead of a message.
 
     Returns:
-        str: A message indicating the success of the update.
+        str: A message indicating the success of the update, when return_document is not given.
+        dict: The requested image of the document without '_id', or None if no document has the given ID.
     """
     try:
-        existing_document = await get_by_id(document['id'], collection_name)
-        if existing_document:
-            new_document = {key: value for key, value in document.items() if key != '_id'}
-            await my_db[collection_name].update_one({"id": document['id']}, {"$set": new_document})
+        new_document = {key: value for key, value in document.items() if key != '_id'}
+        result = await repository.get().update(collection_name, {"id": document['id']}, new_document,
+                                               return_document=return_document, projection={"_id": 0},
+                                               session=session)
+        if return_document is not None:
+            return result
+        if result:
             return f"Document with ID {document['id']} updated successfully."
-        else:
-            return f"No document found with ID {document['id']}."
+        return f"No document found with ID {document['id']}."
+    except Exception as e:
+        raise RuntimeError(f"Error updating document: {e}")
+
+@instrumented
+async def update_by_query(query, fields, collection_name, session=None, upsert=False):
+    """
+    Sets fields on the document matching a query, e.g. only if it is still at an expected version.
+
+    Args:
+        query (dict): The filter the document must match.
+        fields (dict): The fields to set.
+        collection_name (str): The name of the collection in the database.
+        session (AsyncIOMotorClientSession, optional): The transaction session to run in.
+        upsert (bool): Whether to create the document when nothing matches.
+
+    Returns:
+        bool: True if a document was updated or created, False if nothing matched.
+    """
+    try:
+        return await repository.get().update(collection_name, query, fields, upsert=upsert, session=session)
     except Exception as e:
         raise RuntimeError(f"Error updating document: {e}")
 
+
+@instrumented
+async def inc(object_id, increments, collection_name, session=None, return_document=None):
+    """
+    Atomically increments numeric fields of a document in a single round trip.
+
+    Args:
+        object_id (any): The ID of the document to update.
+        increments (dict): The amount to add to each field, e.g. {"balance": -10.0}.
+        collection_name (str): The name of the collection in the database.
+        session (AsyncIOMotorClientSession, optional): The transaction session to run in.
+        return_document (str, optional): "before" or "after" to return the document as it was before
+            or after the update instead of whether it matched.
+
+    Returns:
+        bool: True if a document was updated, False if no document has the given ID, when
+            return_document is not given.
+        dict: The requested image of the document without '_id', or None if no document has the given ID.
+    """
+    try:
+        return await repository.get().inc(collection_name, {"id": object_id}, increments,
+                                          return_document=return_document, projection={"_id": 0}, session=session)
+    except Exception as e:
+        raise RuntimeError(f"Error incrementing document: {e}")
+
+
+@instrumented
+async def upsert_inc(query, increments, collection_name, session=None):
+    """
+    Atomically increments numeric fields of the document matching a query, creating it if needed.
+
+    The equality fields of the query are stored on a newly created document.
+
+    Args:
+        query (dict): The fields identifying the document, e.g. {"user_id": 1, "year": 2024, "month": 1}.
+        increments (dict): The amount to add to each field.
+        collection_name (str): The name of the collection in the database.
+        session (AsyncIOMotorClientSession, optional): The transaction session to run in.
+    """
+    try:
+        await repository.get().inc(collection_name, query, increments, upsert=True, session=session)
+    except Exception as e:
+        raise RuntimeError(f"Error incrementing document: {e}")
+
+
+async def inc_balance(user_id, delta, session=None, reason=None):
+    """
+    Adds delta to a user's balance with a single $inc, so concurrent changes are never lost.
+
+    The same update bumps the user's ledger_version, which identifies the state of the user's
+    expenses and revenues (for example for caching charts). Call it after the expenses, revenues
+    and monthly summaries it accounts for are written, so whoever sees the new version also sees
+    the new data. The change is then appended to the ledger_events collection under that version,
+    so the balance can be rebuilt and checked.
+
+    Args:
+        user_id (int): The ID of the user.
+        delta (float): The amount to add; negative for expenses.
+        session (AsyncIOMotorClientSession, optional): The transaction session to run in.
+        reason (dict, optional): What caused the change, e.g. {"kind": "expense", "action": "create", "id": 7}.
+
+    Returns:
+        dict: The user's balance and ledger_version after the change.
+
+    Raises:
+        ValueError: If the user is not found.
+    """
+    user = await inc(user_id, {"balance": delta, "ledger_version": 1}, collection_name="users", session=session,
+                     return_document="after")
+    if user is None:
+        raise ValueError("User not found")
+    await add({"user_id": user_id, "version": user["ledger_version"], "delta": delta, "reason": reason,
+               "created_at": datetime.now()}, collection_name=LEDGER_EVENTS_COLLECTION, session=session)
+    return {"balance": user["balance"], "ledger_version": user["ledger_version"]}
+
+
+@instrumented
 async def last_id(collection_name):
     """
     Retrieves the last ID from a specified collection in the database.
 
+    Only the document with the highest ID is fetched, so this is no longer used on the insert
+    path; new IDs come from app.db.id_allocator.
+
     Args:
         collection_name (str): The name of the collection in the database.
 
     Returns:
-        int: The last ID found in the collection.
+        int: The last ID found in the collection, or -1 if the collection is empty.
     """
     try:
-        all_collection = await get_all(collection_name)
-        if not all_collection:
+        last = await repository.get().find_one(collection_name, {}, projection={"id": 1}, sort=[("id", -1)])
+        if last is None:
             return -1
-        max_id = max(item.get('id', 0) for item in all_collection)
-        return max_id
+        return last.get('id', 0)
     except Exception as e:
         raise RuntimeError(f"Error retrieving last ID: {e}")
 
 
-async def get_all_by_user_id(user_id, collection_name):
+@instrumented
+async def get_all_by_user_id(user_id, collection_name, limit=None, after=None, projection=None):
     """
-    Retrieves all items belonging to a specific user ID from a specified collection in the database.
+    Retrieves items belonging to a specific user ID from a specified collection in the database,
+    optionally one page at a time.
 
     Args:
         user_id (any): The ID of the user.
         collection_name (str): The name of the collection in the database.
+        limit (int, optional): The maximum number of items to return.
+        after (int, optional): Only items with an ID greater than this are returned.
+        projection (dict, optional): The fields to return.
 
     Returns:
         list: A list containing dictionaries of retrieved items.
     """
     try:
-        all_items = await my_db[collection_name].find({"user_id": user_id}).to_list(length=None)
-        for item in all_items:
-            item["_id"] = str(item["_id"])
-        return all_items
+        page = _find_page({"user_id": user_id}, collection_name, limit, after, projection)
+        return [item async for item in page]
     except Exception as e:
         raise RuntimeError(f"Error retrieving items by user ID: {e}")
 
 
-async def delete(document_id, collection_name):
+@instrumented
+async def iter_by_user_id(user_id, collection_name, batch_size=500, projection=None, sort_field="id",
+                          start=None, end=None, dates=None):
+    """
+    Iterates over all items belonging to a specific user without loading them into memory at once.
+
+    Args:
+        user_id (any): The ID of the user.
+        collection_name (str): The name of the collection in the database.
+        batch_size (int): The number of documents fetched from the server per round trip.
+        projection (dict, optional): The fields to return.
+        sort_field (str): The field the items are ordered by.
+        start (datetime, optional): Only items dated at or after this.
+        end (datetime, optional): Only items dated at or before this.
+        dates (list, optional): Only items dated exactly at one of these.
+
+    Yields:
+        dict: The retrieved items, one at a time.
+    """
+    try:
+        query = {}
+        if start is not None or end is not None:
+            query["date"] = {key: value for key, value in (("$gte", start), ("$lte", end)) if value is not None}
+        if dates is not None:
+            query["date"] = {**query.get("date", {}), "$in": list(dates)}
+        items = repository.get().find_by_user(collection_name, user_id, query,
+                                              projection=_without_object_id(projection), sort=[(sort_field, 1)],
+                                              batch_size=batch_size)
+        async for item in items:
+            yield item
+    except Exception as e:
+        raise RuntimeError(f"Error iterating items by user ID: {e}")
+
+
+@instrumented
+async def aggregate(pipeline, collection_name):
+    """
+    Runs an aggregation pipeline on a specified collection in the database.
+
+    Args:
+        pipeline (list): The aggregation stages.
+        collection_name (str): The name of the collection in the database.
+
+    Returns:
+        list: A list containing dictionaries of the aggregated results.
+    """
+    try:
+        results = await repository.get().aggregate(collection_name, pipeline)
+        return to_json(results)
+    except Exception as e:
+        raise RuntimeError(f"Error aggregating collection {collection_name}: {e}")
+
+
+@instrumented
+async def delete(document_id, collection_name, session=None, return_document=False):
     """
     Deletes a document from a specified collection in the database by its ID.
 
     Args:
         document_id (any): The ID of the document to delete.
         collection_name (str): The name of the collection in the database.
+        session (AsyncIOMotorClientSession, optional): The transaction session to run in.
+        return_document (bool): Whether to return the deleted document instead of a message, so a
+            caller can undo its effects knowing no concurrent delete removed it first.
 
     Returns:
-        str: A message indicating the success of the deletion.
+        str: A message indicating the success of the deletion, when return_document is not set.
+        dict: The deleted document without '_id', or None if no document has the given ID.
 
     Raises:
         RuntimeError: If there is an error during the deletion process.
     """
     try:
-        result = await my_db[collection_name].delete_one({"id": document_id})
-        print(result)
-        if result is not None:
+        if return_document:
+            return await repository.get().delete(collection_name, {"id": document_id}, return_document=True,
+                                                 projection={"_id": 0}, session=session)
+        deleted_count = await repository.get().delete(collection_name, {"id": document_id}, session=session)
+        if deleted_count:
             return f"Document with ID {document_id} deleted successfully."
         else:
             return f"No document found with ID {document_id}."
@@ -145,5 +438,23 @@ async def delete(document_id, collection_name):
         raise RuntimeError(f"Error deleting document: {e}")
 
 
+@instrumented
+async def delete_many(query, collection_name, session=None):
+    """
+    Deletes every document matching a query from a specified collection in one round trip.
+
+    Args:
+        query (dict): The filter selecting the documents to delete, e.g. {"user_id": 1}.
+        collection_name (str): The name of the collection in the database.
+        session (AsyncIOMotorClientSession, optional): The transaction session to run in.
 
+    Returns:
+        int: The number of deleted documents.
 
+    Raises:
+        RuntimeError: If there is an error during the deletion process.
+    """
+    try:
+        return await repository.get().delete_many(collection_name, query, session=session)
+    except Exception as e:
+        raise RuntimeError(f"Error deleting documents from collection {collection_name}: {e}")
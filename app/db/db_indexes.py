@@ -0,0 +1,141 @@
+import asyncio
+import datetime
+import logging
+import os
+import sys
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+from app.db import db_connector
+
+logger = logging.getLogger(__name__)
+
+explain_on_startup = os.getenv('MONGO_EXPLAIN_QUERIES', 'false').lower() == 'true'
+
+# (collection, keys, options) for every index the db_functions queries rely on.
+INDEXES = [
+    ("users", [("id", ASCENDING)], {"unique": True, "name": "id_unique"}),
+    ("users", [("user_name", ASCENDING)], {"unique": True, "name": "user_name_unique"}),
+    ("expenses", [("id", ASCENDING)], {"unique": True, "name": "id_unique"}),
+    ("expenses", [("user_id", ASCENDING), ("date", ASCENDING)], {"name": "user_id_date"}),
+    ("expenses", [("user_id", ASCENDING), ("id", ASCENDING)], {"name": "user_id_id"}),
+    ("revenues", [("id", ASCENDING)], {"unique": True, "name": "id_unique"}),
+    ("revenues", [("user_id", ASCENDING), ("date", ASCENDING)], {"name": "user_id_date"}),
+    ("revenues", [("user_id", ASCENDING), ("id", ASCENDING)], {"name": "user_id_id"}),
+    ("jobs", [("id", ASCENDING)], {"unique": True, "name": "id_unique"}),
+    ("monthly_summaries", [("user_id", ASCENDING), ("year", ASCENDING), ("month", ASCENDING)],
+     {"unique": True, "name": "user_id_year_month_unique"}),
+    ("ledger_events", [("user_id", ASCENDING), ("version", ASCENDING)],
+     {"unique": True, "name": "user_id_version_unique"}),
+    ("balance_snapshots", [("user_id", ASCENDING), ("version", ASCENDING)],
+     {"unique": True, "name": "user_id_version_unique"}),
+    ("transactions", [("kind", ASCENDING), ("id", ASCENDING)], {"unique": True, "name": "kind_id_unique"}),
+    ("transactions", [("user_id", ASCENDING), ("date", ASCENDING)], {"name": "user_id_date"}),
+    ("transactions", [("user_id", ASCENDING), ("kind", ASCENDING), ("id", ASCENDING)], {"name": "user_id_kind_id"}),
+    ("transactions", [("user_id", ASCENDING), ("kind", ASCENDING), ("date", ASCENDING)],
+     {"name": "user_id_kind_date"}),
+    ("transaction_tombstones", [("kind", ASCENDING), ("id", ASCENDING)], {"name": "kind_id"}),
+]
+
+
+def _query_shapes():
+    """
+    Returns one representative query per shape issued by db_functions: (name, collection, filter, sort).
+    """
+    month_start = datetime.datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    shapes = [
+        ("get_by_id", "users", {"id": 1}, None),
+        ("get_by_field user_name", "users", {"user_name": "user"}, None),
+        ("get_all page", "users", {"id": {"$gt": 1}}, [("id", ASCENDING)]),
+        ("last_id", "users", {}, [("id", DESCENDING)]),
+    ]
+    for collection_name in ("expenses", "revenues"):
+        shapes += [
+            ("get_by_id", collection_name, {"id": 1}, None),
+            ("last_id", collection_name, {}, [("id", DESCENDING)]),
+            ("get_all_by_user_id page", collection_name, {"user_id": 1, "id": {"$gt": 1}}, [("id", ASCENDING)]),
+            ("iter_by_user_id by date", collection_name, {"user_id": 1}, [("date", ASCENDING)]),
+            ("iter_by_user_id date range", collection_name, {"user_id": 1, "date": {"$gte": month_start}},
+             [("date", ASCENDING)]),
+            ("aggregate monthly $match", collection_name, {"user_id": 1, "date": {"$gte": month_start}}, None),
+            ("delete_many by user", collection_name, {"user_id": 1}, None),
+        ]
+    shapes += [
+        ("get_summary", "monthly_summaries", {"user_id": 1, "year": month_start.year, "month": month_start.month}, None),
+        ("get_user_totals $match", "monthly_summaries", {"user_id": 1}, None),
+        ("rebuild_balance snapshot", "balance_snapshots", {"user_id": 1, "version": {"$lte": 10}},
+         [("version", DESCENDING)]),
+        ("rebuild_balance tail $match", "ledger_events", {"user_id": 1, "version": {"$gt": 5, "$lte": 10}}, None),
+        ("ledger_store get_by_id", "transactions", {"id": 1, "kind": "expense"}, None),
+        ("ledger_store page", "transactions", {"user_id": 1, "id": {"$gt": 1}, "kind": "expense"}, [("id", ASCENDING)]),
+        ("ledger_store by date", "transactions", {"user_id": 1, "kind": "expense"}, [("date", ASCENDING)]),
+        ("iter_ledger", "transactions", {"user_id": 1}, [("date", ASCENDING)]),
+    ]
+    return shapes
+
+
+async def create_indexes():
+    """
+    Creates the indexes the application relies on.
+
+    create_index is a no-op when an identical index already exists, so this is safe to run on
+    every startup. A failure (for example duplicate values left over from before a unique index
+    existed) is logged instead of preventing the application from starting.
+    """
+    for collection_name, keys, options in INDEXES:
+        try:
+            await db_connector.get_db()[collection_name].create_index(keys, **options)
+        except OperationFailure as e:
+            logger.error("Error creating index %s on %s: %s", options['name'], collection_name, e)
+
+
+def _stages(plan):
+    """
+    Yields every stage name in an explain plan, however deeply it is nested.
+    """
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            yield plan['stage']
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _stages(item)
+
+
+async def explain_queries():
+    """
+    Runs explain() on each db_functions query shape and reports the ones that scan a whole collection.
+
+    Returns:
+        list: One dictionary per query shape with its name, collection, winning plan stages and
+        whether it does a COLLSCAN.
+    """
+    report = []
+    for name, collection_name, query, sort in _query_shapes():
+        cursor = db_connector.get_db()[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = await cursor.explain()
+        stages = list(_stages(plan.get('queryPlanner', {}).get('winningPlan', {})))
+        report.append({"query": name, "collection": collection_name, "stages": stages,
+                       "collscan": 'COLLSCAN' in stages})
+    return report
+
+
+def print_explain_report(report):
+    for entry in report:
+        status = "COLLSCAN" if entry['collscan'] else "ok"
+        print(f"{status:8} {entry['collection']:10} {entry['query']:28} {' > '.join(entry['stages'])}")
+
+
+async def _main(argv):
+    await create_indexes()
+    if '--explain' in argv:
+        report = await explain_queries()
+        print_explain_report(report)
+        return 1 if any(entry['collscan'] for entry in report) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
@@ -0,0 +1,126 @@
+import contextvars
+import functools
+import inspect
+import time
+import bson
+from app.metrics import Counter, Histogram
+
+db_operations = Counter('db_operations_total', 'Database operations issued, by operation and collection')
+db_operation_seconds = Histogram('db_operation_seconds', 'Database operation latency, by operation and collection')
+db_bytes_returned = Counter('db_bytes_returned_total', 'Estimated BSON bytes of documents returned, by collection')
+db_errors = Counter('db_errors_total', 'Database operations that raised, by operation and collection')
+
+# Returned sizes are estimated from a sample of the documents, so measuring them does not cost
+# a second serialization of every result: at most SIZE_SAMPLES documents of a list, and every
+# SIZE_SAMPLE_EVERY-th document of a stream.
+SIZE_SAMPLES = 8
+SIZE_SAMPLE_EVERY = 16
+
+_request_stats = contextvars.ContextVar('db_request_stats', default=None)
+
+
+class RequestStats:
+    """
+    The database work done while serving one HTTP request.
+    """
+
+    __slots__ = ('operations', 'seconds', 'bytes')
+
+    def __init__(self):
+        self.operations = 0
+        self.seconds = 0.0
+        self.bytes = 0
+
+
+def start_request():
+    """
+    Starts collecting database statistics for the current request context.
+
+    Returns:
+        RequestStats: The statistics object, filled in as db_functions are called.
+    """
+    stats = RequestStats()
+    _request_stats.set(stats)
+    return stats
+
+
+def _document_size(document):
+    if not isinstance(document, dict):
+        return 0
+    try:
+        return len(bson.encode(document))
+    except Exception:
+        return 0
+
+
+def _result_size(result):
+    if isinstance(result, dict):
+        return _document_size(result)
+    if isinstance(result, list) and result:
+        step = max(1, len(result) // SIZE_SAMPLES)
+        sample = result[::step][:SIZE_SAMPLES]
+        return sum(_document_size(item) for item in sample) * len(result) // len(sample)
+    return 0
+
+
+def _record(operation, collection_name, elapsed, size, failed=False):
+    db_operations.inc(operation=operation, collection=collection_name)
+    db_operation_seconds.observe(elapsed, operation=operation, collection=collection_name)
+    if size:
+        db_bytes_returned.inc(size, collection=collection_name)
+    if failed:
+        db_errors.inc(operation=operation, collection=collection_name)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.operations += 1
+        stats.seconds += elapsed
+        stats.bytes += size
+
+
+def instrumented(fn):
+    """
+    Records the count, latency and returned bytes of a db function, per collection and per request.
+
+    The collection is taken from the function's collection_name argument. Async generators are
+    timed from the first to the last document they yield. Returned bytes are estimated from a
+    sample of the documents.
+    """
+    signature = inspect.signature(fn)
+    operation = fn.__name__
+
+    def _collection(args, kwargs):
+        bound = signature.bind_partial(*args, **kwargs)
+        return bound.arguments.get('collection_name', 'unknown')
+
+    if inspect.isasyncgenfunction(fn):
+        @functools.wraps(fn)
+        async def generator_wrapper(*args, **kwargs):
+            collection_name = _collection(args, kwargs)
+            started = time.perf_counter()
+            size = 0
+            count = 0
+            failed = True
+            try:
+                async for item in fn(*args, **kwargs):
+                    if count % SIZE_SAMPLE_EVERY == 0:
+                        size += _document_size(item) * SIZE_SAMPLE_EVERY
+                    count += 1
+                    yield item
+                failed = False
+            finally:
+                _record(operation, collection_name, time.perf_counter() - started, size, failed)
+        return generator_wrapper
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        collection_name = _collection(args, kwargs)
+        started = time.perf_counter()
+        result = None
+        failed = True
+        try:
+            result = await fn(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            _record(operation, collection_name, time.perf_counter() - started, _result_size(result), failed)
+    return wrapper
@@ -0,0 +1,97 @@
+import asyncio
+import os
+from app.db import db_functions, ledger_store, repository
+from app.db.db_metrics import instrumented
+
+COUNTERS_COLLECTION = 'counters'
+ID_BLOCK_SIZE = int(os.getenv('ID_BLOCK_SIZE', '1'))
+
+_reserved_blocks = {}
+_block_locks = {}
+
+
+@instrumented
+async def _inc_counter(name, count, upsert=False, collection_name=COUNTERS_COLLECTION):
+    return await repository.get().inc(collection_name, {"_id": name}, {"seq": count}, upsert=upsert,
+                                      return_document="after")
+
+
+@instrumented
+async def _raise_counter(name, value, collection_name=COUNTERS_COLLECTION):
+    await repository.get().set_max(collection_name, {"_id": name}, {"seq": value}, upsert=True)
+
+
+async def reserve_ids(collection_name, count=1):
+    """
+    Atomically reserves a contiguous block of IDs for a specified collection.
+
+    The counter document is incremented with a single find-and-modify, so concurrent
+    workers and processes never receive overlapping blocks. A missing counter is first seeded
+    from the collection's highest ID, so the allocator is safe on existing data even before
+    app.db.migrations has run.
+
+    Args:
+        collection_name (str): The name of the collection the IDs are allocated for.
+        count (int): The number of IDs to reserve.
+
+    Returns:
+        int: The first ID of the reserved block.
+    """
+    if count < 1:
+        raise ValueError("count must be at least 1")
+    try:
+        counter = await _inc_counter(collection_name, count)
+        if counter is None:
+            await seed_counter(collection_name)
+            counter = await _inc_counter(collection_name, count, upsert=True)
+        return counter['seq'] - count + 1
+    except Exception as e:
+        raise RuntimeError(f"Error reserving IDs for collection {collection_name}: {e}")
+
+
+async def seed_counter(collection_name):
+    """
+    Raises the counter of a collection to the collection's highest ID.
+
+    Uses $max, so it is idempotent, never moves a counter backwards and is safe while other
+    workers are allocating IDs (or seeding the same counter).
+
+    Args:
+        collection_name (str): The name of the collection the IDs are allocated for.
+
+    Returns:
+        int: The highest ID found in the collection, 0 if it is empty.
+    """
+    if collection_name in ledger_store.VIEWS:
+        max_id = await ledger_store.last_id(collection_name)
+    else:
+        max_id = await db_functions.last_id(collection_name)
+    max_id = max(max_id, 0)
+    await _raise_counter(collection_name, max_id)
+    return max_id
+
+
+async def next_id(collection_name):
+    """
+    Allocates the next ID for a specified collection.
+
+    When ID_BLOCK_SIZE is greater than one, a block of IDs is reserved per process and handed
+    out locally until it is exhausted, which saves a round trip on most inserts. IDs stay unique
+    across workers but may leave gaps when a process exits with part of its block unused.
+
+    Args:
+        collection_name (str): The name of the collection the ID is allocated for.
+
+    Returns:
+        int: The allocated ID.
+    """
+    if ID_BLOCK_SIZE <= 1:
+        return await reserve_ids(collection_name)
+    lock = _block_locks.setdefault(collection_name, asyncio.Lock())
+    async with lock:
+        next_value, end = _reserved_blocks.get(collection_name, (0, 0))
+        if next_value >= end:
+            next_value = await reserve_ids(collection_name, ID_BLOCK_SIZE)
+            end = next_value + ID_BLOCK_SIZE
+        _reserved_blocks[collection_name] = (next_value + 1, end)
+        return next_value
@@ -0,0 +1,475 @@
+import os
+from app.db import db_functions, repository
+from app.db.db_metrics import instrumented
+
+# split: expenses and revenues live in their own collections (the original layout).
+# dual: writes go to both layouts while the transactions collection is being backfilled.
+# unified: both are stored in the transactions collection with a signed amount and a kind.
+LEDGER_STORAGE = os.getenv('LEDGER_STORAGE', 'split').lower()
+STORAGE_MODES = ("split", "dual", "unified")
+if LEDGER_STORAGE not in STORAGE_MODES:
+    raise ValueError(f"LEDGER_STORAGE must be one of {', '.join(STORAGE_MODES)}, got {LEDGER_STORAGE!r}")
+
+TRANSACTIONS_COLLECTION = "transactions"
+# In dual storage, the (kind, id) of every expense and revenue deleted while the transactions
+# collection is being backfilled, so the backfill does not bring them back. migrate_transactions
+# deletes them when it completes.
+TOMBSTONES_COLLECTION = "transaction_tombstones"
+
+# The expense and revenue views over the transactions collection.
+VIEWS = {
+    "expenses": {"kind": "expense", "amount_field": "total_expense", "description_field": "description_expense",
+                 "sign": -1},
+    "revenues": {"kind": "revenue", "amount_field": "total_revenue", "description_field": "description_revenue",
+                 "sign": 1},
+}
+
+
+def _reads_unified():
+    return LEDGER_STORAGE == "unified"
+
+
+def _writes_split():
+    return LEDGER_STORAGE in ("split", "dual")
+
+
+def _writes_unified():
+    return LEDGER_STORAGE in ("dual", "unified")
+
+
+def _writes_dual():
+    return LEDGER_STORAGE == "dual"
+
+
+def to_transaction(collection_name, document):
+    """
+    Converts an expense or revenue document (or some of its fields) to the transactions layout.
+
+    Args:
+        collection_name (str): "expenses" or "revenues".
+        document (dict): The document or fields in the expense/revenue layout.
+
+    Returns:
+        dict: The same fields with a signed "amount", a "description" and the "kind".
+    """
+    view = VIEWS[collection_name]
+    transaction = {"kind": view["kind"]}
+    for key, value in document.items():
+        if key == "_id":
+            continue
+        if key == view["amount_field"]:
+            transaction["amount"] = view["sign"] * value
+        elif key == view["description_field"]:
+            transaction["description"] = value
+        else:
+            transaction[key] = value
+    return transaction
+
+
+def from_transaction(collection_name, transaction):
+    """
+    Converts a transactions document back to the expense or revenue layout.
+
+    Args:
+        collection_name (str): "expenses" or "revenues".
+        transaction (dict): The document in the transactions layout.
+
+    Returns:
+        dict: The document as the expense or revenue services expect it.
+    """
+    if transaction is None:
+        return None
+    view = VIEWS[collection_name]
+    document = {}
+    for key, value in transaction.items():
+        if key == "amount":
+            document[view["amount_field"]] = view["sign"] * value
+        elif key == "description":
+            document[view["description_field"]] = value
+        elif key not in ("kind", "_id"):
+            document[key] = value
+    return document
+
+
+def _query(collection_name, query):
+    return {**query, "kind": VIEWS[collection_name]["kind"]}
+
+
+def _projection(collection_name, projection):
+    if projection is None:
+        return {"_id": 0}
+    view = VIEWS[collection_name]
+    names = {view["amount_field"]: "amount", view["description_field"]: "description"}
+    return {"_id": 0, **{names.get(key, key): value for key, value in projection.items() if key != "_id"}}
+
+
+@instrumented
+async def _find_transactions(query, projection, sort=None, limit=None, batch_size=None,
+                             collection_name=TRANSACTIONS_COLLECTION):
+    transactions = repository.get().find(TRANSACTIONS_COLLECTION, query, projection=projection, sort=sort,
+                                         limit=limit, batch_size=batch_size)
+    async for transaction in transactions:
+        yield transaction
+
+
+def _find_view(collection_name, query, projection=None, sort=None, limit=None, batch_size=None):
+    transactions = _find_transactions(_query(collection_name, query), _projection(collection_name, projection),
+                                      sort, limit, batch_size, collection_name=collection_name)
+    return (from_transaction(collection_name, transaction) async for transaction in transactions)
+
+
+@instrumented
+async def _write_transactions(collection_name, operation, *args, **kwargs):
+    return await getattr(repository.get(), operation)(TRANSACTIONS_COLLECTION, *args, **kwargs)
+
+
+async def get_by_id(object_id, collection_name, session=None):
+    """
+    Retrieves an expense or revenue by its ID from the configured storage.
+
+    Args:
+        object_id (int): The ID of the document to retrieve.
+        collection_name (str): "expenses" or "revenues".
+        session (AsyncIOMotorClientSession, optional): The transaction session to run in.
+
+    Returns:
+        dict: The document in the expense/revenue layout.
+
+    Raises:
+        RuntimeError: If the document is not found or cannot be read.
+    """
+    if not _reads_unified():
+        return await db_functions.get_by_id(object_id, collection_name, session=session)
+    transaction = await db_functions.find_one(_query(collection_name, {"id": object_id}), TRANSACTIONS_COLLECTION,
+                                              projection={"_id": 0}, session=session)
+    if transaction is None:
+        raise RuntimeError("Error retrieving document: Element not found")
+    return from_transaction(collection_name, transaction)
+
+
+async def last_id(collection_name):
+    """
+    Retrieves the highest expense or revenue ID in the configured storage.
+
+    Args:
+        collection_name (str): "expenses" or "revenues".
+
+    Returns:
+        int: The highest ID, or -1 if there are no documents.
+    """
+    if not _reads_unified():
+        return await db_functions.last_id(collection_name)
+    last = await db_functions.find_one(_query(collection_name, {}), TRANSACTIONS_COLLECTION, projection={"id": 1},
+                                       sort=[("id", -1)])
+    return -1 if last is None else last.get("id", 0)
+
+
+async def get_all_by_user_id(user_id, collection_name, limit=None, after=None, projection=None):
+    """
+    Retrieves a user's expenses or revenues ordered by ID, optionally one keyset page at a time.
+
+    Args:
+        user_id (int): The ID of the user.
+        collection_name (str): "expenses" or "revenues".
+        limit (int, optional): The maximum number of items to return.
+        after (int, optional): Only items with an ID greater than this are returned.
+        projection (dict, optional): The fields to return, in the expense/revenue layout.
+
+    Returns:
+        list: The documents in the expense/revenue layout.
+    """
+    if not _reads_unified():
+        return await db_functions.get_all_by_user_id(user_id, collection_name, limit=limit, after=after,
+                                                     projection=projection)
+    query = {"user_id": user_id} if after is None else {"user_id": user_id, "id": {"$gt": after}}
+    sort = [("id", 1)] if limit is not None or after is not None else None
+    try:
+        return [document async for document in _find_view(collection_name, query, projection, sort, limit)]
+    except Exception as e:
+        raise RuntimeError(f"Error retrieving items by user ID: {e}")
+
+
+async def iter_by_user_id(user_id, collection_name, batch_size=500, projection=None, sort_field="id",
+                          start=None, end=None, dates=None):
+    """
+    Iterates over a user's expenses or revenues without loading them into memory at once.
+
+    Args:
+        user_id (int): The ID of the user.
+        collection_name (str): "expenses" or "revenues".
+        batch_size (int): The number of documents fetched from the server per round trip.
+        projection (dict, optional): The fields to return, in the expense/revenue layout.
+        sort_field (str): The field the items are ordered by.
+        start (datetime, optional): Only items dated at or after this.
+        end (datetime, optional): Only items dated at or before this.
+        dates (list, optional): Only items dated exactly at one of these.
+
+    Yields:
+        dict: The documents in the expense/revenue layout, one at a time.
+    """
+    if not _reads_unified():
+        async for document in db_functions.iter_by_user_id(user_id, collection_name, batch_size=batch_size,
+                                                           projection=projection, sort_field=sort_field,
+                                                           start=start, end=end, dates=dates):
+            yield document
+        return
+    query = {"user_id": user_id}
+    if start is not None or end is not None:
+        query["date"] = {key: value for key, value in (("$gte", start), ("$lte", end)) if value is not None}
+    if dates is not None:
+        query["date"] = {**query.get("date", {}), "$in": list(dates)}
+    async for document in _find_view(collection_name, query, projection, [(sort_field, 1)], batch_size=batch_size):
+        yield document
+
+
+async def iter_ledger(user_id, batch_size=500):
+    """
+    Iterates over all of a user's expenses and revenues ordered by date.
+
+    In unified storage this is a single query on the (user_id, date) index; otherwise the two
+    collections are read side by side and merged.
+
+    Args:
+        user_id (int): The ID of the user.
+        batch_size (int): The number of documents fetched from the server per round trip.
+
+    Yields:
+        tuple: The view name ("expenses" or "revenues") and the document in that layout.
+    """
+    if _reads_unified():
+        async for transaction in _find_transactions({"user_id": user_id}, {"_id": 0}, [("date", 1)],
+                                                    batch_size=batch_size):
+            collection_name = "expenses" if transaction["kind"] == "expense" else "revenues"
+            yield collection_name, from_transaction(collection_name, transaction)
+        return
+
+    expenses = iter_by_user_id(user_id, "expenses", batch_size=batch_size, projection={"_id": 0}, sort_field="date")
+    revenues = iter_by_user_id(user_id, "revenues", batch_size=batch_size, projection={"_id": 0}, sort_field="date")
+    expense = await anext(expenses, None)
+    revenue = await anext(revenues, None)
+    while expense is not None or revenue is not None:
+        if revenue is None or (expense is not None and expense["date"] <= revenue["date"]):
+            yield "expenses", expense
+            expense = await anext(expenses, None)
+        else:
+            yield "revenues", revenue
+            revenue = await anext(revenues, None)
+
+
+async def add(document, collection_name, session=None):
+    """
+    Adds an expense or revenue to the configured storage.
+
+    Args:
+        document (dict): The document in the expense/revenue layout.
+        collection_name (str): "expenses" or "revenues".
+        session (AsyncIOMotorClientSession, optional): The transaction session to run in.
+
+    Returns:
+        dict: A dictionary containing the inserted ID.
+    """
+    result = None
+    if _writes_split():
+        result = await db_functions.add(document, collection_name, session=session)
+    if _writes_unified():
+        inserted_id = await _write_transactions(collection_name, "insert", to_transaction(collection_name, document),
+                                                session=session)
+        result = result or {"inserted_id": str(inserted_id)}
+    return result
+
+
+async def add_many(documents, collection_name, session=None):
+    """
+    Adds several expenses or revenues to the configured storage in one round trip per layout.
+
+    Args:
+        documents (list): The documents in the expense/revenue layout.
+        collection_name (str): "expenses" or "revenues".
+        session (AsyncIOMotorClientSession, optional): The transaction session to run in.
+
+    Returns:
+        int: The number of documents inserted.
+    """
+    inserted = len(documents)
+    if _writes_split():
+        inserted = await db_functions.add_many(documents, collection_name, session=session)
+    if _writes_unified():
+        await _write_transactions(collection_name, "insert_many",
+                                  [to_transaction(collection_name, document) for document in documents],
+                                  session=session)
+    return inserted
+
+
+async def update(document, collection_name, session=None, return_document=None):
+    """
+    Updates an expense or revenue in the configured storage.
+
+    Args:
+        document (dict): The updated document in the expense/revenue layout.
+        collection_name (str): "expenses" or "revenues".
+        session (AsyncIOMotorClientSession, optional): The transaction session to run in.
+        return_document (str, optional): "before" or "after" to return that image of the document.
+
+    Returns:
+        str: A message indicating the success of the update, when return_document is not given.
+        dict: The requested image in the expense/revenue layout, or None if no document has the given ID.
+    """
+    if _writes_dual():
+        return await _update_dual(document, collection_name, session, return_document)
+    result = None
+    if _writes_split():
+        result = await db_functions.update(document, collection_name, session=session,
+                                           return_document=return_document)
+    if _writes_unified():
+        image = await _write_transactions(collection_name, "update", _query(collection_name, {"id": document['id']}),
+                                          to_transaction(collection_name, document), projection={"_id": 0},
+                                          return_document=return_document, session=session)
+        if not _writes_split():
+            if return_document is not None:
+                return from_transaction(collection_name, image)
+            if not image:
+                return f"No document found with ID {document['id']}."
+            return f"Document with ID {document['id']} updated successfully."
+    return result
+
+
+async def _update_dual(document, collection_name, session, return_document):
+    """
+    Updates the expense or revenue and writes its whole new image to the transactions collection.
+
+    The transaction is upserted rather than updated, so a document the backfill has not copied yet
+    is copied now with its current fields (the backfill only inserts missing transactions and would
+    otherwise keep the stale copy it read before the update).
+    """
+    image = await db_functions.update(document, collection_name, session=session,
+                                      return_document="before" if return_document == "before" else "after")
+    if image is None:
+        return None if return_document is not None else f"No document found with ID {document['id']}."
+    current = {**image, **document} if return_document == "before" else image
+    await _write_transactions(collection_name, "update", _query(collection_name, {"id": document['id']}),
+                              to_transaction(collection_name, current), upsert=True, session=session)
+    # A delete racing with this update may have removed the transaction before the upsert recreated it.
+    await remove_tombstoned(collection_name, [document['id']], session=session)
+    if return_document is not None:
+        return image
+    return f"Document with ID {document['id']} updated successfully."
+
+
+async def _write_tombstones(collection_name, document_ids, session=None):
+    if document_ids:
+        kind = VIEWS[collection_name]["kind"]
+        await db_functions.add_many([{"kind": kind, "id": document_id} for document_id in document_ids],
+                                    TOMBSTONES_COLLECTION, session=session)
+
+
+async def remove_tombstoned(collection_name, document_ids, session=None):
+    """
+    Deletes the transactions of expenses or revenues that were deleted while dual storage was on.
+
+    Called after copying documents to the transactions collection: a document read from the
+    expenses or revenues collection just before it was deleted must not survive in the copy.
+
+    Args:
+        collection_name (str): "expenses" or "revenues".
+        document_ids (list): The IDs of the documents just copied.
+        session (AsyncIOMotorClientSession, optional): The transaction session to run in.
+
+    Returns:
+        int: The number of transactions deleted.
+    """
+    query = _query(collection_name, {"id": {"$in": list(document_ids)}})
+    tombstoned = [tombstone["id"] async for tombstone in
+                  repository.get().find(TOMBSTONES_COLLECTION, query, projection={"_id": 0, "id": 1})]
+    if not tombstoned:
+        return 0
+    return await _write_transactions(collection_name, "delete_many",
+                                     _query(collection_name, {"id": {"$in": tombstoned}}), session=session)
+
+
+async def delete(document_id, collection_name, session=None, return_document=False):
+    """
+    Deletes an expense or revenue from the configured storage by its ID.
+
+    Args:
+        document_id (int): The ID of the document to delete.
+        collection_name (str): "expenses" or "revenues".
+        session (AsyncIOMotorClientSession, optional): The transaction session to run in.
+        return_document (bool): Whether to return the deleted document instead of a message.
+
+    Returns:
+        str: A message indicating the success of the deletion, when return_document is not set.
+        dict: The deleted document in the expense/revenue layout, or None if no document has the given ID.
+    """
+    if _writes_dual():
+        # The tombstone goes first, so a backfill copying the document concurrently either sees it
+        # or has finished its copy before the transaction is deleted below.
+        await _write_tombstones(collection_name, [document_id], session=session)
+    result = None
+    if _writes_split():
+        result = await db_functions.delete(document_id, collection_name, session=session,
+                                           return_document=return_document)
+    if _writes_unified():
+        deleted = await _write_transactions(collection_name, "delete", _query(collection_name, {"id": document_id}),
+                                            return_document=return_document, projection={"_id": 0},
+                                            session=session)
+        if not _writes_split():
+            if return_document:
+                return from_transaction(collection_name, deleted)
+            if deleted:
+                return f"Document with ID {document_id} deleted successfully."
+            return f"No document found with ID {document_id}."
+    return result
+
+
+async def delete_many(query, collection_name, session=None):
+    """
+    Deletes every expense or revenue matching a query from the configured storage.
+
+    Args:
+        query (dict): The filter selecting the documents to delete, e.g. {"user_id": 1}.
+        collection_name (str): "expenses" or "revenues".
+        session (AsyncIOMotorClientSession, optional): The transaction session to run in.
+
+    Returns:
+        int: The number of deleted documents.
+    """
+    if _writes_dual():
+        document_ids = [document["id"] async for document in
+                        repository.get().find(collection_name, query, projection={"_id": 0, "id": 1})]
+        await _write_tombstones(collection_name, document_ids, session=session)
+    deleted_count = None
+    if _writes_split():
+        deleted_count = await db_functions.delete_many(query, collection_name, session=session)
+    if _writes_unified():
+        deleted = await _write_transactions(collection_name, "delete_many", _query(collection_name, query),
+                                            session=session)
+        if deleted_count is None:
+            deleted_count = deleted
+    return deleted_count
+
+
+async def aggregate(pipeline, collection_name):
+    """
+    Runs an aggregation pipeline, written against the expense/revenue layout, on the configured storage.
+
+    In unified storage the kind is added to the leading $match (so it still uses the indexes) and
+    the expense/revenue amount and description fields are derived before the remaining stages.
+
+    Args:
+        pipeline (list): The aggregation stages.
+        collection_name (str): "expenses" or "revenues".
+
+    Returns:
+        list: A list containing dictionaries of the aggregated results.
+    """
+    if not _reads_unified():
+        return await db_functions.aggregate(pipeline, collection_name)
+    view = VIEWS[collection_name]
+    stages = list(pipeline)
+    match = stages.pop(0)["$match"] if stages and "$match" in stages[0] else {}
+    view_stages = [
+        {"$match": _query(collection_name, match)},
+        {"$addFields": {view["amount_field"]: {"$multiply": ["$amount", view["sign"]]},
+                        view["description_field"]: "$description"}},
+    ]
+    return await db_functions.aggregate(view_stages + stages, TRANSACTIONS_COLLECTION)
@@ -0,0 +1,173 @@
+import asyncio
+import sys
+from app.db import db_functions, ledger_store, repository
+from app.db.id_allocator import seed_counter
+from app.services import ledger_service
+from app.services.summary_service import MONTHLY_SUMMARIES_COLLECTION, SUMMARY_FIELDS
+
+ID_COLLECTIONS = ("users", "expenses", "revenues")
+
+
+async def seed_counters():
+    """
+    Seeds the ID counters from the current maximum ID of each collection.
+
+    Uses $max so the migration is idempotent and never moves a counter backwards, which makes it
+    safe to re-run while workers are already allocating IDs. The allocator also seeds a missing
+    counter on first use, so running this ahead of a deployment is optional.
+
+    Returns:
+        dict: The seeded maximum ID per collection.
+    """
+    return {collection_name: await seed_counter(collection_name) for collection_name in ID_COLLECTIONS}
+
+
+async def rebuild_monthly_summaries(user_id=None):
+    """
+    Rebuilds the monthly summaries from the stored expenses and revenues.
+
+    The totals are computed inside MongoDB with one aggregation per collection. Each summary is
+    then overwritten in place with $set (upserted if missing) and only the summaries of months
+    that no longer have any expense or revenue are deleted, so the summaries are never empty
+    while it runs and it is safe to re-run. A write landing between the aggregation and the $set
+    of its month can still be lost, so run it while no expenses or revenues are being written
+    (for example before the first deployment that maintains the summaries).
+
+    Args:
+        user_id (int, optional): Only rebuild this user's summaries.
+
+    Returns:
+        int: The number of monthly summaries written.
+    """
+    match = {} if user_id is None else {"user_id": user_id}
+    summaries = {}
+    for collection_name, (amount_field, total_field, count_field) in SUMMARY_FIELDS.items():
+        pipeline = [
+            {"$match": match},
+            {"$group": {"_id": {"user_id": "$user_id", "year": {"$year": "$date"}, "month": {"$month": "$date"}},
+                        "total": {"$sum": f"${amount_field}"}, "count": {"$sum": 1}}},
+        ]
+        for row in await ledger_store.aggregate(pipeline, collection_name):
+            key = (row["_id"]["user_id"], row["_id"]["year"], row["_id"]["month"])
+            summary = summaries.setdefault(key, {"user_id": key[0], "year": key[1], "month": key[2],
+                                                 "total_expense": 0, "total_revenue": 0,
+                                                 "expense_count": 0, "revenue_count": 0})
+            summary[total_field] = row["total"]
+            summary[count_field] = row["count"]
+    for (summary_user_id, year, month), summary in summaries.items():
+        await db_functions.update_by_query({"user_id": summary_user_id, "year": year, "month": month}, summary,
+                                           collection_name=MONTHLY_SUMMARIES_COLLECTION, upsert=True)
+    stale = [summary["_id"] async for summary in
+             repository.get().find(MONTHLY_SUMMARIES_COLLECTION, match,
+                                   projection={"_id": 1, "user_id": 1, "year": 1, "month": 1})
+             if (summary["user_id"], summary["year"], summary["month"]) not in summaries]
+    if stale:
+        await db_functions.delete_many({"_id": {"$in": stale}}, collection_name=MONTHLY_SUMMARIES_COLLECTION)
+    return len(summaries)
+
+
+async def seed_balance_snapshots():
+    """
+    Records an opening balance snapshot for every user that has none yet.
+
+    Balances changed before the ledger existed have no events, so the current balance is taken
+    as the starting point at the user's current ledger_version. Run it once, before the first
+    deployment that writes ledger events; users that already have a snapshot are skipped.
+
+    Returns:
+        int: The number of snapshots written.
+    """
+    written = 0
+    after = None
+    while True:
+        users = await db_functions.get_all("users", limit=500, after=after,
+                                           projection={"_id": 0, "id": 1, "balance": 1, "ledger_version": 1})
+        for user in users:
+            existing = await db_functions.find_one({"user_id": user["id"]},
+                                                   collection_name=ledger_service.BALANCE_SNAPSHOTS_COLLECTION)
+            if existing is None:
+                await ledger_service.write_snapshot(user["id"], user.get("ledger_version", 0), user.get("balance", 0))
+                written += 1
+        if len(users) < 500:
+            return written
+        after = users[-1]["id"]
+
+
+async def migrate_transactions(batch_size=1000):
+    """
+    Backfills the transactions collection from the expenses and revenues collections.
+
+    Meant to run online: first deploy with LEDGER_STORAGE=dual so every new write reaches both
+    layouts, then run this, check the result with verify_transactions, and switch to
+    LEDGER_STORAGE=unified. Only transactions missing on (kind, id) are inserted, so the backfill
+    never overwrites a transaction already written (and kept current) by dual writes, and it can be
+    re-run after an interruption. A copy made from a document that was updated after it was read is
+    overwritten by the update, which upserts the whole transaction in dual mode; a copy of a document
+    deleted meanwhile is removed again through the tombstone the delete leaves. Once every document
+    is copied the tombstones are no longer needed and are deleted.
+
+    Args:
+        batch_size (int): The number of documents copied per bulk write.
+
+    Returns:
+        dict: The number of documents copied per collection.
+    """
+    async def copy(collection_name, transactions):
+        copied[collection_name] += await repository.get().insert_missing(
+            ledger_store.TRANSACTIONS_COLLECTION, transactions, ("kind", "id"))
+        await ledger_store.remove_tombstoned(collection_name, [transaction["id"] for transaction in transactions])
+
+    copied = {}
+    for collection_name in ledger_store.VIEWS:
+        copied[collection_name] = 0
+        transactions = []
+        async for document in repository.get().find(collection_name, {}, projection={"_id": 0}, sort=[("id", 1)],
+                                                    batch_size=batch_size):
+            transactions.append(ledger_store.to_transaction(collection_name, document))
+            if len(transactions) >= batch_size:
+                await copy(collection_name, transactions)
+                transactions = []
+        if transactions:
+            await copy(collection_name, transactions)
+    await db_functions.delete_many({}, collection_name=ledger_store.TOMBSTONES_COLLECTION)
+    return copied
+
+
+async def verify_transactions():
+    """
+    Compares the count and total amount of the expenses and revenues with the transactions collection.
+
+    Returns:
+        dict: Per collection, the count and total in both layouts and whether they agree.
+    """
+    report = {}
+    for collection_name, view in ledger_store.VIEWS.items():
+        split = await db_functions.aggregate(
+            [{"$group": {"_id": None, "count": {"$sum": 1}, "total": {"$sum": f"${view['amount_field']}"}}}],
+            collection_name)
+        unified = await db_functions.aggregate(
+            [{"$match": {"kind": view["kind"]}},
+             {"$group": {"_id": None, "count": {"$sum": 1},
+                         "total": {"$sum": {"$multiply": ["$amount", view["sign"]]}}}}],
+            ledger_store.TRANSACTIONS_COLLECTION)
+        split = split[0] if split else {"count": 0, "total": 0}
+        unified = unified[0] if unified else {"count": 0, "total": 0}
+        report[collection_name] = {
+            "count": split["count"], "transactions_count": unified["count"],
+            "total": split["total"], "transactions_total": unified["total"],
+            "consistent": split["count"] == unified["count"] and abs(split["total"] - unified["total"]) < 0.005,
+        }
+    return report
+
+
+if __name__ == '__main__':
+    if '--rebuild-summaries' in sys.argv:
+        print(asyncio.run(rebuild_monthly_summaries()))
+    elif '--seed-balance-snapshots' in sys.argv:
+        print(asyncio.run(seed_balance_snapshots()))
+    elif '--migrate-transactions' in sys.argv:
+        print(asyncio.run(migrate_transactions()))
+    elif '--verify-transactions' in sys.argv:
+        print(asyncio.run(verify_transactions()))
+    else:
+        print(asyncio.run(seed_counters()))
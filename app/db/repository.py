@@ -0,0 +1,534 @@
+import asyncio
+import os
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from app.db import db_connector
+
+# motor: documents are stored in MongoDB (the default).
+# memory: documents are kept in process, for tests and benchmarks that should not need a mongod.
+REPOSITORY_BACKEND = os.getenv('REPOSITORY_BACKEND', 'motor').lower()
+BACKENDS = ("motor", "memory")
+if REPOSITORY_BACKEND not in BACKENDS:
+    raise ValueError(f"REPOSITORY_BACKEND must be one of {', '.join(BACKENDS)}, got {REPOSITORY_BACKEND!r}")
+
+_repository = None
+
+
+class Repository(ABC):
+    """
+    The storage operations db_functions, id_allocator and ledger_store are built on.
+
+    Every method takes the collection name first. Queries use the MongoDB filter syntax, sorts are
+    lists of (field, direction) pairs and return_document is "before" or "after" (for delete, whether
+    to return the deleted document instead of the number deleted). set_max raises fields to the given
+    values like MongoDB's $max, and insert_missing inserts only the documents whose key_fields match
+    no stored document.
+
+    Backends implement every abstract operation; connect, close, transaction, get_by_id and
+    find_by_user have defaults built on them. find is an async generator.
+    """
+
+    async def connect(self):
+        pass
+
+    def close(self):
+        pass
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield None
+
+    async def get_by_id(self, collection_name, object_id, projection=None, session=None):
+        return await self.find_one(collection_name, {"id": object_id}, projection=projection, session=session)
+
+    @abstractmethod
+    async def find_one(self, collection_name, query, projection=None, sort=None, session=None):
+        ...
+
+    @abstractmethod
+    def find(self, collection_name, query, projection=None, sort=None, limit=None, batch_size=None):
+        ...
+
+    def find_by_user(self, collection_name, user_id, query=None, **options):
+        return self.find(collection_name, {"user_id": user_id, **(query or {})}, **options)
+
+    @abstractmethod
+    async def insert(self, collection_name, document, session=None):
+        ...
+
+    @abstractmethod
+    async def insert_many(self, collection_name, documents, session=None):
+        ...
+
+    @abstractmethod
+    async def insert_missing(self, collection_name, documents, key_fields, session=None):
+        ...
+
+    @abstractmethod
+    async def update(self, collection_name, query, fields, upsert=False, return_document=None, projection=None,
+                     session=None):
+        ...
+
+    @abstractmethod
+    async def inc(self, collection_name, query, increments, upsert=False, return_document=None, projection=None,
+                  session=None):
+        ...
+
+    @abstractmethod
+    async def set_max(self, collection_name, query, values, upsert=False, session=None):
+        ...
+
+    @abstractmethod
+    async def delete(self, collection_name, query, return_document=False, projection=None, session=None):
+        ...
+
+    @abstractmethod
+    async def delete_many(self, collection_name, query, session=None):
+        ...
+
+    @abstractmethod
+    async def aggregate(self, collection_name, pipeline):
+        ...
+
+
+class MotorRepository(Repository):
+    """
+    Stores documents in MongoDB through the db_connector client.
+    """
+
+    async def connect(self):
+        await db_connector.connect()
+
+    def close(self):
+        db_connector.close()
+
+    @asynccontextmanager
+    async def transaction(self):
+        if not db_connector.mongo_use_transactions:
+            yield None
+            return
+        async with await db_connector.get_client().start_session() as session:
+            async with session.start_transaction():
+                yield session
+
+    async def find_one(self, collection_name, query, projection=None, sort=None, session=None):
+        return await db_connector.get_db()[collection_name].find_one(query, projection=projection, sort=sort,
+                                                                     session=session)
+
+    async def find(self, collection_name, query, projection=None, sort=None, limit=None, batch_size=None):
+        cursor = db_connector.get_db()[collection_name].find(query, projection=projection)
+        if sort is not None:
+            cursor = cursor.sort(sort)
+        if limit is not None:
+            cursor = cursor.limit(limit)
+        if batch_size is not None:
+            cursor = cursor.batch_size(batch_size)
+        async for document in cursor:
+            yield document
+
+    async def insert(self, collection_name, document, session=None):
+        result = await db_connector.get_db()[collection_name].insert_one(document, session=session)
+        return result.inserted_id
+
+    async def insert_many(self, collection_name, documents, session=None):
+        result = await db_connector.get_db()[collection_name].insert_many(documents, session=session)
+        return len(result.inserted_ids)
+
+    async def insert_missing(self, collection_name, documents, key_fields, session=None):
+        operations = [UpdateOne({field: document[field] for field in key_fields}, {"$setOnInsert": document},
+                                upsert=True) for document in documents]
+        if not operations:
+            return 0
+        result = await db_connector.get_db()[collection_name].bulk_write(operations, ordered=False, session=session)
+        return result.upserted_count
+
+    async def _modify(self, collection_name, query, update, upsert, return_document, projection, session):
+        collection = db_connector.get_db()[collection_name]
+        if return_document is not None:
+            return await collection.find_one_and_update(
+                query, update, projection=projection, upsert=upsert,
+                return_document=ReturnDocument.AFTER if return_document == "after" else ReturnDocument.BEFORE,
+                session=session)
+        result = await collection.update_one(query, update, upsert=upsert, session=session)
+        return result.matched_count > 0 or result.upserted_id is not None
+
+    async def update(self, collection_name, query, fields, upsert=False, return_document=None, projection=None,
+                     session=None):
+        return await self._modify(collection_name, query, {"$set": fields}, upsert, return_document, projection,
+                                  session)
+
+    async def inc(self, collection_name, query, increments, upsert=False, return_document=None, projection=None,
+                  session=None):
+        return await self._modify(collection_name, query, {"$inc": increments}, upsert, return_document, projection,
+                                  session)
+
+    async def set_max(self, collection_name, query, values, upsert=False, session=None):
+        return await self._modify(collection_name, query, {"$max": values}, upsert, None, None, session)
+
+    async def delete(self, collection_name, query, return_document=False, projection=None, session=None):
+        collection = db_connector.get_db()[collection_name]
+        if return_document:
+            return await collection.find_one_and_delete(query, projection=projection, session=session)
+        result = await collection.delete_one(query, session=session)
+        return result.deleted_count
+
+    async def delete_many(self, collection_name, query, session=None):
+        result = await db_connector.get_db()[collection_name].delete_many(query, session=session)
+        return result.deleted_count
+
+    async def aggregate(self, collection_name, pipeline):
+        return await db_connector.get_db()[collection_name].aggregate(pipeline).to_list(length=None)
+
+
+_MISSING = object()
+
+
+def _is_operator_dict(value):
+    return isinstance(value, dict) and bool(value) and all(key.startswith("$") for key in value)
+
+
+def _compare(compare):
+    def check(value, operand):
+        if value is _MISSING or value is None:
+            return False
+        try:
+            return compare(value, operand)
+        except TypeError:
+            return False
+    return check
+
+
+_QUERY_OPERATORS = {
+    "$eq": lambda value, operand: (None if value is _MISSING else value) == operand,
+    "$ne": lambda value, operand: (None if value is _MISSING else value) != operand,
+    "$gt": _compare(lambda value, operand: value > operand),
+    "$gte": _compare(lambda value, operand: value >= operand),
+    "$lt": _compare(lambda value, operand: value < operand),
+    "$lte": _compare(lambda value, operand: value <= operand),
+    "$in": lambda value, operand: (None if value is _MISSING else value) in operand,
+    "$exists": lambda value, operand: (value is not _MISSING) == bool(operand),
+}
+
+
+def _matches(document, query):
+    for field, condition in query.items():
+        value = document.get(field, _MISSING)
+        if _is_operator_dict(condition):
+            if not all(_QUERY_OPERATORS[operator](value, operand) for operator, operand in condition.items()):
+                return False
+        elif (None if value is _MISSING else value) != condition:
+            return False
+    return True
+
+
+def _project(document, projection):
+    if not projection:
+        return dict(document)
+    included = {field for field, value in projection.items() if value and field != "_id"}
+    if included:
+        keep_id = projection.get("_id", 1)
+        return {field: value for field, value in document.items()
+                if field in included or (field == "_id" and keep_id)}
+    excluded = {field for field, value in projection.items() if not value}
+    return {field: value for field, value in document.items() if field not in excluded}
+
+
+def _sort(documents, sort):
+    documents = list(documents)
+    for field, direction in reversed(sort):
+        documents.sort(key=lambda document: (document.get(field) is not None, document.get(field)),
+                       reverse=direction < 0)
+    return documents
+
+
+def _multiply(values):
+    if any(value is None for value in values):
+        return None
+    product = 1
+    for value in values:
+        product *= value
+    return product
+
+
+_EXPRESSION_OPERATORS = {
+    "$multiply": _multiply,
+    "$year": lambda date: date.year,
+    "$month": lambda date: date.month,
+    "$dayOfMonth": lambda date: date.day,
+    "$dateToString": lambda spec: spec["date"].strftime(spec["format"]),
+}
+
+
+def _evaluate(expression, document):
+    if isinstance(expression, str) and expression.startswith("$"):
+        return document.get(expression[1:])
+    if isinstance(expression, list):
+        return [_evaluate(item, document) for item in expression]
+    if isinstance(expression, dict):
+        if len(expression) == 1 and next(iter(expression)).startswith("$"):
+            operator, operand = next(iter(expression.items()))
+            return _EXPRESSION_OPERATORS[operator](_evaluate(operand, document))
+        return {key: _evaluate(value, document) for key, value in expression.items()}
+    return expression
+
+
+def _accumulate(operator, values):
+    if operator == "$sum":
+        return sum(value for value in values if isinstance(value, (int, float)))
+    values = [value for value in values if value is not None]
+    if not values:
+        return None
+    return max(values) if operator == "$max" else min(values)
+
+
+def _group(documents, spec):
+    groups = {}
+    for document in documents:
+        key = _evaluate(spec["_id"], document)
+        hashable = tuple(sorted(key.items())) if isinstance(key, dict) else key
+        groups.setdefault(hashable, (key, []))[1].append(document)
+    results = []
+    for key, members in groups.values():
+        result = {"_id": key}
+        for field, accumulator in spec.items():
+            if field == "_id":
+                continue
+            operator, expression = next(iter(accumulator.items()))
+            result[field] = _accumulate(operator, [_evaluate(expression, member) for member in members])
+        results.append(result)
+    return results
+
+
+class _MemoryCollection:
+    """
+    The documents of one collection, keyed by _id, with secondary indexes on id and user_id.
+    """
+
+    INDEXED_FIELDS = ("id", "user_id")
+
+    def __init__(self):
+        self.documents = {}
+        self.indexes = {field: {} for field in self.INDEXED_FIELDS}
+
+    def _index(self, document):
+        for field, index in self.indexes.items():
+            if field in document:
+                index.setdefault(document[field], {})[document["_id"]] = None
+
+    def _unindex(self, document):
+        for field, index in self.indexes.items():
+            if field in document:
+                keys = index.get(document[field])
+                if keys is not None:
+                    keys.pop(document["_id"], None)
+                    if not keys:
+                        del index[document[field]]
+
+    def insert(self, document):
+        document.setdefault("_id", ObjectId())
+        stored = dict(document)
+        self.documents[stored["_id"]] = stored
+        self._index(stored)
+        return stored["_id"]
+
+    def remove(self, document):
+        self._unindex(document)
+        del self.documents[document["_id"]]
+
+    def replace_fields(self, document, fields):
+        reindex = any(field in self.indexes for field in fields)
+        if reindex:
+            self._unindex(document)
+        document.update(fields)
+        if reindex:
+            self._index(document)
+
+    def _candidates(self, query):
+        if "_id" in query and not _is_operator_dict(query["_id"]):
+            return [query["_id"]] if query["_id"] in self.documents else []
+        for field, index in self.indexes.items():
+            value = query.get(field, _MISSING)
+            if value is not _MISSING and not _is_operator_dict(value):
+                return list(index.get(value, ()))
+        return list(self.documents)
+
+    def find(self, query):
+        for key in self._candidates(query):
+            document = self.documents[key]
+            if _matches(document, query):
+                yield document
+
+
+class MemoryRepository(Repository):
+    """
+    Keeps documents in process memory, indexed by id and user_id.
+
+    Every operation yields to the event loop once before it runs, as a round trip to MongoDB would,
+    so concurrent requests interleave between a read and the write that follows it and lost updates
+    show up here too. Only the query, update and aggregation operators the application uses are supported.
+    Transactions are not isolated (the yielded session is None, as without MONGO_USE_TRANSACTIONS)
+    and unique indexes are not enforced.
+    """
+
+    def __init__(self):
+        self.collections = {}
+
+    def _collection(self, collection_name):
+        collection = self.collections.get(collection_name)
+        if collection is None:
+            collection = self.collections[collection_name] = _MemoryCollection()
+        return collection
+
+    def clear(self):
+        self.collections.clear()
+
+    def _find(self, collection_name, query, sort=None):
+        documents = self._collection(collection_name).find(query)
+        return _sort(documents, sort) if sort else documents
+
+    async def find_one(self, collection_name, query, projection=None, sort=None, session=None):
+        await asyncio.sleep(0)
+        document = next(iter(self._find(collection_name, query, sort)), None)
+        return None if document is None else _project(document, projection)
+
+    async def find(self, collection_name, query, projection=None, sort=None, limit=None, batch_size=None):
+        await asyncio.sleep(0)
+        documents = list(self._find(collection_name, query, sort))
+        for document in documents[:limit] if limit is not None else documents:
+            yield _project(document, projection)
+
+    async def insert(self, collection_name, document, session=None):
+        await asyncio.sleep(0)
+        return self._collection(collection_name).insert(document)
+
+    async def insert_many(self, collection_name, documents, session=None):
+        await asyncio.sleep(0)
+        collection = self._collection(collection_name)
+        for document in documents:
+            collection.insert(document)
+        return len(documents)
+
+    async def insert_missing(self, collection_name, documents, key_fields, session=None):
+        await asyncio.sleep(0)
+        collection = self._collection(collection_name)
+        inserted = 0
+        for document in documents:
+            if next(iter(collection.find({field: document[field] for field in key_fields})), None) is None:
+                collection.insert(dict(document))
+                inserted += 1
+        return inserted
+
+    def _modify(self, collection_name, query, changes, upsert, return_document, projection):
+        collection = self._collection(collection_name)
+        document = next(iter(collection.find(query)), None)
+        if document is None:
+            if not upsert:
+                return None if return_document is not None else False
+            document = {field: value for field, value in query.items() if not _is_operator_dict(value)}
+            collection.insert(document)
+            document = collection.documents[document["_id"]]
+            before = None
+        else:
+            before = dict(document)
+        collection.replace_fields(document, changes(document))
+        if return_document is None:
+            return True
+        image = document if return_document == "after" else before
+        return None if image is None else _project(image, projection)
+
+    async def update(self, collection_name, query, fields, upsert=False, return_document=None, projection=None,
+                     session=None):
+        await asyncio.sleep(0)
+        return self._modify(collection_name, query, lambda document: fields, upsert, return_document, projection)
+
+    async def inc(self, collection_name, query, increments, upsert=False, return_document=None, projection=None,
+                  session=None):
+        def changes(document):
+            return {field: document.get(field, 0) + amount for field, amount in increments.items()}
+        await asyncio.sleep(0)
+        return self._modify(collection_name, query, changes, upsert, return_document, projection)
+
+    async def set_max(self, collection_name, query, values, upsert=False, session=None):
+        def changes(document):
+            return {field: value if field not in document else max(document[field], value)
+                    for field, value in values.items()}
+        await asyncio.sleep(0)
+        return self._modify(collection_name, query, changes, upsert, None, None)
+
+    async def delete(self, collection_name, query, return_document=False, projection=None, session=None):
+        await asyncio.sleep(0)
+        collection = self._collection(collection_name)
+        document = next(iter(collection.find(query)), None)
+        if document is None:
+            return None if return_document else 0
+        collection.remove(document)
+        return _project(document, projection) if return_document else 1
+
+    async def delete_many(self, collection_name, query, session=None):
+        await asyncio.sleep(0)
+        collection = self._collection(collection_name)
+        documents = list(collection.find(query))
+        for document in documents:
+            collection.remove(document)
+        return len(documents)
+
+    async def aggregate(self, collection_name, pipeline):
+        await asyncio.sleep(0)
+        stages = list(pipeline)
+        query = stages.pop(0)["$match"] if stages and "$match" in stages[0] else {}
+        documents = [dict(document) for document in self._collection(collection_name).find(query)]
+        for stage in stages:
+            (name, spec), = stage.items()
+            if name == "$match":
+                documents = [document for document in documents if _matches(document, spec)]
+            elif name == "$group":
+                documents = _group(documents, spec)
+            elif name == "$addFields":
+                documents = [{**document, **{field: _evaluate(expression, document)
+                                             for field, expression in spec.items()}} for document in documents]
+            elif name == "$sort":
+                documents = _sort(documents, list(spec.items()))
+            elif name == "$limit":
+                documents = documents[:spec]
+            else:
+                raise ValueError(f"Unsupported aggregation stage {name}")
+        return documents
+
+
+def create_repository(backend=REPOSITORY_BACKEND):
+    """
+    Builds the repository for a backend name.
+
+    Args:
+        backend (str): "motor" or "memory".
+
+    Returns:
+        Repository: The new repository.
+    """
+    return MemoryRepository() if backend == "memory" else MotorRepository()
+
+
+def get():
+    """
+    Returns the repository selected by REPOSITORY_BACKEND, creating it on first use.
+
+    Returns:
+        Repository: The repository every db function goes through.
+    """
+    global _repository
+    if _repository is None:
+        _repository = create_repository()
+    return _repository
+
+
+def set_repository(repository):
+    """
+    Replaces the repository, e.g. with a fresh MemoryRepository in tests and benchmarks.
+
+    Args:
+        repository (Repository): The repository to use from now on.
+    """
+    global _repository
+    _repository = repository
@@ -0,0 +1,78 @@
+import asyncio
+import os
+import time
+import weakref
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from app.metrics import Gauge, Histogram
+
+
+class BoundedExecutor:
+    """
+    Runs blocking or CPU bound functions off the event loop in a thread or process pool.
+
+    At most max_concurrency calls are handed to the pool at a time; the rest wait on the event
+    loop, and their number is exported as the <name>_queue_depth gauge. The time each call spends
+    in the pool is recorded in the <name>_run_seconds histogram.
+    """
+
+    def __init__(self, name, kind='thread', max_workers=None, max_concurrency=None):
+        if kind not in ('thread', 'process'):
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.name = name
+        self.kind = kind
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_concurrency = max_concurrency or self.max_workers
+        self.queue_depth = Gauge(f'{name}_queue_depth', f'Calls waiting for a {name} worker')
+        self.in_flight = Gauge(f'{name}_in_flight', f'Calls currently running in the {name} pool')
+        self.run_seconds = Histogram(f'{name}_run_seconds', f'Time spent running calls in the {name} pool')
+        self._executor = None
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            if self.kind == 'process':
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+        return self._executor
+
+    def _semaphore(self, loop):
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    async def run(self, fn, *args, **kwargs):
+        """
+        Runs fn(*args, **kwargs) in the pool once a concurrency slot is free.
+
+        Args:
+            fn (callable): The function to run. It must be picklable for process pools.
+
+        Returns:
+            any: The return value of fn.
+        """
+        loop = asyncio.get_running_loop()
+        self.queue_depth.inc()
+        queued = True
+        try:
+            async with self._semaphore(loop):
+                self.queue_depth.dec()
+                queued = False
+                self.in_flight.inc()
+                started = time.perf_counter()
+                try:
+                    return await loop.run_in_executor(self.executor, partial(fn, *args, **kwargs))
+                finally:
+                    self.in_flight.dec()
+                    self.run_seconds.observe(time.perf_counter() - started)
+        finally:
+            if queued:
+                self.queue_depth.dec()
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
@@ -1,14 +1,46 @@
 import uvicorn as uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.middleware.gzip import GZipMiddleware
+from app.db import db_indexes, repository
+from app.services import password_service
 from app.controllers.user_controller import user_router
 from app.controllers.expense_controller import expense_router
 from app.controllers.revenue_controller import revenue_router
+from app.controllers.job_controller import job_router
+from app.controllers.metrics_controller import metrics_router
+from app.controllers.summary_controller import summary_router
+from app.controllers.ledger_controller import ledger_router
+from app.middleware import RequestMetricsMiddleware
+from app.responses import DocumentResponse
 from app.visualization.graph_router import visualization_router
+from app.visualization.graph_functions import render_executor
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    store = repository.get()
+    await store.connect()
+    if isinstance(store, repository.MotorRepository):
+        await db_indexes.create_indexes()
+        if db_indexes.explain_on_startup:
+            db_indexes.print_explain_report(await db_indexes.explain_queries())
+    yield
+    password_service.executor.shutdown()
+    render_executor.shutdown()
+    store.close()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=DocumentResponse)
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+app.add_middleware(RequestMetricsMiddleware)
 app.include_router(user_router, prefix='/user')
 app.include_router(expense_router, prefix='/expense')
 app.include_router(revenue_router, prefix='/revenue')
+app.include_router(job_router, prefix='/jobs')
+app.include_router(metrics_router, prefix='/metrics')
+app.include_router(summary_router, prefix='/summary')
+app.include_router(ledger_router, prefix='/ledger')
 app.include_router(visualization_router, prefix='/visualization')
 
 
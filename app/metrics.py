@@ -0,0 +1,117 @@
+import threading
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REGISTRY = {}
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class Gauge:
+    """
+    A value that can go up and down, optionally split by labels.
+    """
+
+    def __init__(self, name, description):
+        self.name = name
+        self.description = description
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY[name] = self
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def value(self, **labels):
+        return self._values.get(_label_key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            return dict(self._values)
+
+
+class Counter(Gauge):
+    """
+    A value that only goes up, optionally split by labels.
+    """
+
+    def dec(self, amount=1, **labels):
+        raise ValueError("Counters can only be incremented")
+
+
+class Histogram:
+    """
+    Cumulative bucket counts, sum and count of observed values, optionally split by labels.
+    """
+
+    def __init__(self, name, description, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+        REGISTRY[name] = self
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def samples(self):
+        with self._lock:
+            return {key: {"buckets": list(series["buckets"]), "sum": series["sum"], "count": series["count"]}
+                    for key, series in self._series.items()}
+
+
+def _escape_label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(key, extra=()):
+    labels = list(key) + list(extra)
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label_value(value)}"' for name, value in labels) + '}'
+
+
+def render_prometheus():
+    """
+    Renders every registered metric in the Prometheus text exposition format.
+
+    Returns:
+        str: The exposition text.
+    """
+    lines = []
+    for name, metric in sorted(REGISTRY.items()):
+        lines.append(f'# HELP {name} {metric.description}')
+        if isinstance(metric, Histogram):
+            lines.append(f'# TYPE {name} histogram')
+            for key, series in metric.samples().items():
+                for bound, count in zip(metric.buckets, series["buckets"]):
+                    lines.append(f'{name}_bucket{_format_labels(key, [("le", bound)])} {count}')
+                lines.append(f'{name}_bucket{_format_labels(key, [("le", "+Inf")])} {series["count"]}')
+                lines.append(f'{name}_sum{_format_labels(key)} {series["sum"]}')
+                lines.append(f'{name}_count{_format_labels(key)} {series["count"]}')
+        else:
+            lines.append(f'# TYPE {name} {"counter" if isinstance(metric, Counter) else "gauge"}')
+            for key, value in metric.samples().items():
+                lines.append(f'{name}{_format_labels(key)} {value}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,45 @@
+import time
+from app.db import db_metrics
+from app.metrics import Counter, Histogram
+
+http_requests = Counter('http_requests_total', 'HTTP requests served, by method and status')
+http_request_seconds = Histogram('http_request_seconds', 'Time until the response headers were sent, by method')
+http_request_db_operations = Histogram('http_request_db_operations', 'Database operations per HTTP request',
+                                       buckets=(0, 1, 2, 3, 4, 6, 8, 12, 16, 32, 64, 128))
+
+
+class RequestMetricsMiddleware:
+    """
+    Collects per-request database statistics and reports them in a Server-Timing response header.
+
+    Written as a plain ASGI middleware so streaming responses pass through untouched. Database
+    work done after the headers are sent (for example while streaming an export) is still counted
+    in the metrics but cannot appear in the header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        stats = db_metrics.start_request()
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message['type'] == 'http.response.start':
+                elapsed = time.perf_counter() - started
+                server_timing = (f'db;dur={stats.seconds * 1000:.1f};'
+                                 f'desc="{stats.operations} ops, {stats.bytes} bytes", '
+                                 f'app;dur={elapsed * 1000:.1f}')
+                headers = list(message.get('headers', []))
+                headers.append((b'server-timing', server_timing.encode('latin-1')))
+                message['headers'] = headers
+                http_requests.inc(method=scope['method'], status=message['status'])
+                http_request_seconds.observe(elapsed, method=scope['method'])
+                http_request_db_operations.observe(stats.operations)
+            await send(message)
+
+        await self.app(scope, receive, send_with_timing)
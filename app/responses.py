@@ -0,0 +1,40 @@
+import orjson
+from bson import ObjectId
+from fastapi.responses import ORJSONResponse
+from app.utils import next_cursor
+
+
+def _default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class DocumentResponse(ORJSONResponse):
+    """
+    Serializes documents with orjson in a single pass.
+
+    datetimes are written as ISO 8601 by orjson itself and any remaining ObjectId as its string.
+    Endpoints returning a DocumentResponse directly also skip FastAPI's jsonable_encoder and
+    response model validation, which on large pages cost more than the query; their response_model
+    then only documents the schema.
+    """
+
+    def render(self, content):
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def page_response(items, limit):
+    """
+    Returns one keyset page of documents, with the X-Next-Cursor header set when more items may follow.
+
+    Args:
+        items (list): The documents of the page, ordered by ID.
+        limit (int): The page size that was requested.
+
+    Returns:
+        DocumentResponse: The serialized page.
+    """
+    cursor = next_cursor(items, limit)
+    headers = {'X-Next-Cursor': str(cursor)} if cursor is not None else None
+    return DocumentResponse(items, headers=headers)
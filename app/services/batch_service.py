@@ -0,0 +1,81 @@
+from pydantic import ValidationError
+from app.db import db_functions, id_allocator, ledger_store
+from app.services import summary_service, user_cache
+from app.utils import MAX_BATCH_SIZE
+
+
+def _validation_message(error):
+    return "; ".join(f"{'.'.join(str(part) for part in detail['loc'])}: {detail['msg']}" for detail in error.errors())
+
+
+async def create_batch(items, model, collection_name, amount_field, sign, is_valid_user=None):
+    """
+    Validates and inserts a batch of ledger entries, charging each user's balance once.
+
+    Every item is validated on its own, so one bad item is reported without rejecting the rest.
+    The valid items get a contiguous block of IDs, are written with a single insert_many, and
+    each affected user's balance is changed by the net amount of their items.
+
+    Args:
+        items (list): The raw items of the batch.
+        model (type): The pydantic model of an item, Expense or Revenue.
+        collection_name (str): The collection the items are added to.
+        amount_field (str): The field holding the item's amount.
+        sign (int): 1 if the amount is added to the balance, -1 if it is taken from it.
+        is_valid_user (callable, optional): Takes a user document and returns False if the user may
+            not receive items.
+
+    Returns:
+        dict: The number of inserted items, the ID given to each by item index, and the errors by item index.
+
+    Raises:
+        ValueError: If the batch is empty or larger than MAX_BATCH_SIZE.
+    """
+    if not items:
+        raise ValueError("The batch is empty")
+    if len(items) > MAX_BATCH_SIZE:
+        raise ValueError(f"A batch may contain at most {MAX_BATCH_SIZE} items")
+
+    errors = []
+    entries = []
+    for index, item in enumerate(items):
+        try:
+            entries.append((index, model.model_validate(item)))
+        except ValidationError as e:
+            errors.append({"index": index, "error": _validation_message(e)})
+
+    rejected_users = {}
+    for user_id in {entry.user_id for _, entry in entries}:
+        try:
+            user = await user_cache.get_user(user_id)
+        except Exception:
+            rejected_users[user_id] = "User not found"
+            continue
+        if is_valid_user is not None and not is_valid_user(user):
+            rejected_users[user_id] = "The user's balance does not allow new items"
+    for index, entry in entries:
+        if entry.user_id in rejected_users:
+            errors.append({"index": index, "error": rejected_users[entry.user_id]})
+    entries = [(index, entry) for index, entry in entries if entry.user_id not in rejected_users]
+
+    created = []
+    if entries:
+        first_id = await id_allocator.reserve_ids(collection_name, len(entries))
+        documents = []
+        deltas = {}
+        for offset, (_, entry) in enumerate(entries):
+            entry.id = first_id + offset
+            documents.append(entry.dict())
+            deltas[entry.user_id] = deltas.get(entry.user_id, 0) + sign * getattr(entry, amount_field)
+        async with db_functions.transaction() as session:
+            await ledger_store.add_many(documents, collection_name=collection_name, session=session)
+            await summary_service.apply_entries(collection_name, documents, session=session)
+            for user_id, delta in deltas.items():
+                await db_functions.inc_balance(user_id, delta, session=session,
+                                               reason={"kind": model.__name__.lower(), "action": "batch",
+                                                       "first_id": first_id, "count": len(entries)})
+        await user_cache.invalidate(*deltas)
+        created = [{"index": index, "id": entry.id} for index, entry in entries]
+
+    errors.sort(key=lambda error: error["index"])
+    return {"inserted": len(created), "created": created, "errors": errors}
@@ -1,8 +1,9 @@
-from app.db import db_functions
+from app.db import db_functions, id_allocator, ledger_store
+from app.services import batch_service, summary_service, user_cache
 from app.models.expense import Expense
 from datetime import datetime
-from app.services.user_service import update_user
-from app.models.user import User
+from app.utils import fields_projection
+from app.validators import is_valid_expense
 
 
 async def get_expense_by_id(expense_id: int):
@@ -20,7 +21,7 @@ async def get_expense_by_id(expense_id: int):
         Exception: If an error occurs during the retrieval process.
     """
     try:
-        expense = await db_functions.get_by_id(expense_id, collection_name="expenses")
+        expense = await ledger_store.get_by_id(expense_id, collection_name="expenses")
         if expense is None:
             raise ValueError("Expense not found")
         return expense
@@ -30,12 +31,15 @@ async def get_expense_by_id(expense_id: int):
         raise e
 
 
-async def get_all_expenses_by_user_id(user_id: int):
+async def get_all_expenses_by_user_id(user_id: int, limit: int = None, after: int = None, fields: list = None):
     """
-    Retrieve all expenses associated with a user by their ID.
+    Retrieve the expenses associated with a user by their ID, ordered by ID and optionally one page at a time.
 
     Args:
         user_id (int): The ID of the user.
+        limit (int, optional): The maximum number of expenses to return.
+        after (int, optional): Only expenses with an ID greater than this are returned.
+        fields (list, optional): The fields to return; all fields by default.
 
     Returns:
         list: A list containing dictionaries of retrieved expenses.
@@ -45,8 +49,9 @@ async def get_all_expenses_by_user_id(user_id: int):
         Exception: If an error occurs during the retrieval process.
     """
     try:
-        all_expenses = await db_functions.get_all_by_user_id(user_id, collection_name="expenses")
-        if not all_expenses:
+        all_expenses = await ledger_store.get_all_by_user_id(user_id, collection_name="expenses", limit=limit, after=after,
+                                                             projection=fields_projection(fields))
+        if not all_expenses and after is None:
             raise ValueError("Expenses not found")
         return all_expenses
     except ValueError as ve:
@@ -71,22 +76,46 @@ async def create_expense(user_id, new_expense: Expense):
         Exception: If an error occurs during the creation process.
     """
     try:
-        new_expense.id = await db_functions.last_id(collection_name="expenses") + 1
+        new_expense.id = await id_allocator.next_id("expenses")
         new_expense.user_id = user_id
-        user = await db_functions.get_by_id(user_id, collection_name="users")
-        if user is None:
-            raise ValueError("User not found")
-        user['balance'] -= new_expense.total_expense
-        await db_functions.update(user, collection_name="users")
-
         new_expense_dict = new_expense.dict()
-        return await db_functions.add(new_expense_dict, collection_name="expenses")
+        async with db_functions.transaction() as session:
+            result = await ledger_store.add(new_expense_dict, collection_name="expenses", session=session)
+            await summary_service.apply_entry("expenses", new_expense_dict, session=session)
+            try:
+                await db_functions.inc_balance(user_id, -new_expense.total_expense, session=session,
+                                               reason={"kind": "expense", "action": "create", "id": new_expense.id})
+            except ValueError:
+                if session is None:
+                    # Without a transaction to roll back, take the expense of a missing user out again.
+                    await ledger_store.delete(new_expense.id, collection_name="expenses")
+                    await summary_service.apply_entry("expenses", new_expense_dict, -1)
+                raise
+        await user_cache.invalidate(user_id)
+        return result
     except ValueError as ve:
         raise ve
     except Exception as e:
         raise e
 
 
+async def create_expenses_batch(items: list):
+    """
+    Create a batch of expenses, taking each user's net amount from their balance in one update.
+
+    Args:
+        items (list): The expenses to create, each validated as an Expense.
+
+    Returns:
+        dict: The number of created expenses, the ID of each by item index, and per-item errors.
+
+    Raises:
+        ValueError: If the batch is empty or too large.
+    """
+    return await batch_service.create_batch(items, Expense, "expenses", "total_expense", -1,
+                                            is_valid_user=lambda user: is_valid_expense(user['balance']))
+
+
 async def update_expense(expense_id: int, new_expense: Expense):
     """
     Update an existing expense.
@@ -96,46 +125,66 @@ async def update_expense(expense_id: int, new_expense: Expense):
         new_expense (Expense): The updated expense object.
 
     Returns:
-        dict: A dictionary containing the result of updating the expense.
+        dict: The updated expense.
 
     Raises:
+        ValueError: If the expense or its new user is not found.
         Exception: If an error occurs during the update process.
     """
     try:
-        existing_expense = await get_expense_by_id(expense_id)
-        last_user_id = existing_expense['user_id']
-        last_total_expense = existing_expense['total_expense']
-
-        user_data = await db_functions.get_by_id(last_user_id, "users")
-        user = User(**user_data)
-        user.balance += last_total_expense
-        await db_functions.update(user.dict(), "users")
-
-        new_user_data = await db_functions.get_by_id(new_expense.user_id, "users")
-        new_user = User(**new_user_data)
-        new_user.balance -= new_expense.total_expense
-        await db_functions.update(new_user.dict(), "users")
-
         new_expense.id = expense_id
         new_expense.date = datetime.now()
-        return await db_functions.update(new_expense.dict(), collection_name="expenses")
+        new_expense_dict = new_expense.dict()
+        async with db_functions.transaction() as session:
+            # Checked before anything is written: without a transaction, a failing inc_balance for the
+            # new user would leave the expense, the summaries and the old user's refund applied.
+            if await db_functions.find_one({"id": new_expense.user_id}, collection_name="users",
+                                           projection={"_id": 0, "id": 1}, session=session) is None:
+                raise ValueError("User not found")
+            # The pre-image carries the old user and amount, so the expense is not read separately.
+            existing_expense = await ledger_store.update(new_expense_dict, collection_name="expenses", session=session,
+                                                         return_document="before")
+            if existing_expense is None:
+                raise ValueError("Expense not found")
+            await summary_service.apply_entry("expenses", existing_expense, -1, session=session)
+            await summary_service.apply_entry("expenses", new_expense_dict, session=session)
+            await db_functions.inc_balance(existing_expense['user_id'], existing_expense['total_expense'], session=session,
+                                           reason={"kind": "expense", "action": "update", "id": expense_id})
+            await db_functions.inc_balance(new_expense.user_id, -new_expense.total_expense, session=session,
+                                           reason={"kind": "expense", "action": "update", "id": expense_id})
+        await user_cache.invalidate(existing_expense['user_id'], new_expense.user_id)
+        return {**existing_expense, **new_expense_dict}
     except Exception as e:
         raise e
 
 
 async def delete_expense(expense_id):
     """
-    Delete an expense by its ID.
+    Delete an expense by its ID and refund its amount to the user's balance.
 
     Args:
         expense_id (int): The ID of the expense to delete.
 
+    Returns:
+        str: A message indicating the success of the deletion.
+
     Raises:
-        ValueError: If an error occurs during the deletion process.
+        ValueError: If the expense is not found.
         Exception: If an error occurs during the deletion process.
     """
     try:
-        await db_functions.delete(expense_id, collection_name="expenses")
+        async with db_functions.transaction() as session:
+            # The refund is based on the document as it was deleted, so a concurrent update or a
+            # second delete of the same expense can never be refunded twice or at a stale amount.
+            expense = await ledger_store.delete(expense_id, collection_name="expenses", session=session,
+                                                return_document=True)
+            if expense is None:
+                raise ValueError("Expense not found")
+            await summary_service.apply_entry("expenses", expense, -1, session=session)
+            await db_functions.inc_balance(expense['user_id'], expense['total_expense'], session=session,
+                                           reason={"kind": "expense", "action": "delete", "id": expense_id})
+        await user_cache.invalidate(expense['user_id'])
+        return f"Document with ID {expense_id} deleted successfully."
     except ValueError as ve:
         raise ve
     except Exception as e:
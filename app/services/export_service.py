@@ -0,0 +1,95 @@
+import csv
+import io
+from datetime import datetime
+import orjson
+from app.db import ledger_store
+
+DEFAULT_EXPORT_BATCH_SIZE = 500
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+EXPENSE_FIELDS = ["id", "user_id", "total_expense", "date", "description_expense"]
+REVENUE_FIELDS = ["id", "user_id", "total_revenue", "date", "description_revenue"]
+LEDGER_FIELDS = ["kind", "id", "user_id", "amount", "date", "description"]
+
+COLLECTION_FIELDS = {"expenses": EXPENSE_FIELDS, "revenues": REVENUE_FIELDS}
+
+
+def _projection(fields):
+    return {**{field: 1 for field in fields}, "_id": 0}
+
+
+async def _encode_ndjson(rows):
+    async for row in rows:
+        yield orjson.dumps(row) + b"\n"
+
+
+async def _encode_csv(rows, fieldnames, batch_size):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction='ignore')
+    writer.writeheader()
+    pending = 0
+    async for row in rows:
+        writer.writerow({key: value.isoformat() if isinstance(value, datetime) else value
+                         for key, value in row.items()})
+        pending += 1
+        if pending >= batch_size:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue().encode('utf-8')
+
+
+def _encode(rows, fieldnames, export_format, batch_size):
+    if export_format == "csv":
+        return _encode_csv(rows, fieldnames, batch_size)
+    return _encode_ndjson(rows)
+
+
+def export_user_collection(user_id, collection_name, export_format="ndjson", batch_size=DEFAULT_EXPORT_BATCH_SIZE):
+    """
+    Streams every expense or revenue of a user as NDJSON or CSV, ordered by ID.
+
+    Args:
+        user_id (int): The ID of the user.
+        collection_name (str): "expenses" or "revenues".
+        export_format (str): "ndjson" or "csv".
+        batch_size (int): The number of documents fetched per round trip and CSV rows per chunk.
+
+    Returns:
+        AsyncIterator[bytes]: The encoded chunks, suitable for a StreamingResponse.
+    """
+    fields = COLLECTION_FIELDS[collection_name]
+    rows = ledger_store.iter_by_user_id(user_id, collection_name, batch_size=batch_size,
+                                        projection=_projection(fields))
+    return _encode(rows, fields, export_format, batch_size)
+
+
+async def _ledger_rows(user_id, batch_size):
+    async for collection_name, item in ledger_store.iter_ledger(user_id, batch_size=batch_size):
+        view = ledger_store.VIEWS[collection_name]
+        yield {
+            "kind": view["kind"],
+            "id": item.get("id"),
+            "user_id": item.get("user_id"),
+            "amount": view["sign"] * (item.get(view["amount_field"]) or 0),
+            "date": item.get("date"),
+            "description": item.get(view["description_field"]),
+        }
+
+
+def export_user_ledger(user_id, export_format="ndjson", batch_size=DEFAULT_EXPORT_BATCH_SIZE):
+    """
+    Streams a user's expenses and revenues as one ledger ordered by date.
+
+    Each row carries a kind ("expense" or "revenue") and a signed amount, negative for expenses.
+
+    Args:
+        user_id (int): The ID of the user.
+        export_format (str): "ndjson" or "csv".
+        batch_size (int): The number of documents fetched per round trip and CSV rows per chunk.
+
+    Returns:
+        AsyncIterator[bytes]: The encoded chunks, suitable for a StreamingResponse.
+    """
+    return _encode(_ledger_rows(user_id, batch_size), LEDGER_FIELDS, export_format, batch_size)
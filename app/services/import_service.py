@@ -0,0 +1,277 @@
+import asyncio
+import csv
+import hashlib
+import io
+import os
+import re
+import tempfile
+from datetime import datetime
+from pydantic import ValidationError
+from app.db import db_functions, id_allocator, ledger_store
+from app.models.expense import Expense
+from app.models.revenue import Revenue
+from app.services import job_service, summary_service, user_cache
+
+IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', '500'))
+IMPORT_FORMATS = ("csv", "ofx")
+MAX_REPORTED_ERRORS = 100
+
+_OFX_TAG = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+_DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%Y%m%d')
+
+
+def _parse_date(value):
+    value = value.strip()
+    for date_format in _DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format)
+        except ValueError:
+            pass
+    return datetime.fromisoformat(value)
+
+
+def _parse_amount(value):
+    if not value or not value.strip():
+        return 0.0
+    try:
+        return float(value.strip().replace(',', ''))
+    except ValueError:
+        raise ValueError(f"Invalid amount: {value.strip()!r}")
+
+
+def _csv_rows(stream):
+    """
+    Yields (row number, fields) for each row of a CSV statement with date, description and either a
+    signed amount or debit and credit columns. Header names are matched case-insensitively. The
+    values are yielded as text; they are parsed per row by _to_entry.
+    """
+    reader = csv.reader(stream)
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = [name.strip().lower() for name in header]
+    for row_number, row in enumerate(reader, start=2):
+        if not any(cell.strip() for cell in row):
+            continue
+        fields = dict(zip(columns, row))
+        yield row_number, {"date": fields.get('date', ''), "amount": fields.get('amount'),
+                           "credit": fields.get('credit'), "debit": fields.get('debit'),
+                           "description": fields.get('description') or fields.get('memo') or ''}
+
+
+def _ofx_rows(stream):
+    """
+    Yields (transaction number, fields) for each STMTTRN of an OFX statement, one line at a time.
+    Both SGML (unclosed tags) and XML OFX are accepted.
+    """
+    transaction = None
+    number = 0
+    for line in stream:
+        for closing, tag, value in _OFX_TAG.findall(line):
+            tag = tag.upper()
+            if tag == 'STMTTRN':
+                if not closing:
+                    transaction = {}
+                elif transaction is not None:
+                    number += 1
+                    yield number, {"date": transaction.get('DTPOSTED', '')[:8],
+                                   "amount": transaction.get('TRNAMT'),
+                                   "description": transaction.get('MEMO') or transaction.get('NAME') or ''}
+                    transaction = None
+            elif transaction is not None and not closing:
+                transaction[tag] = value.strip()
+
+
+def _to_entry(user_id, fields):
+    """
+    Maps a statement row to an Expense (negative amount) or a Revenue (positive amount).
+    """
+    if fields["amount"] and fields["amount"].strip():
+        amount = _parse_amount(fields["amount"])
+    else:
+        amount = _parse_amount(fields.get("credit")) - _parse_amount(fields.get("debit"))
+    if not amount:
+        raise ValueError("The amount is missing or zero")
+    date = _parse_date(fields["date"])
+    description = fields["description"].strip()
+    if amount < 0:
+        return Expense(id=0, user_id=user_id, total_expense=-amount, date=date, description_expense=description)
+    return Revenue(id=0, user_id=user_id, total_revenue=amount, date=date, description_revenue=description)
+
+
+def _dedup_key(user_id, date, amount, description):
+    return hashlib.sha1(f"{user_id}|{date.isoformat()}|{round(amount, 2)}|{description}".encode('utf-8')).hexdigest()
+
+
+def _entry_key(entry):
+    if isinstance(entry, Expense):
+        return _dedup_key(entry.user_id, entry.date, -entry.total_expense, entry.description_expense)
+    return _dedup_key(entry.user_id, entry.date, entry.total_revenue, entry.description_revenue)
+
+
+async def _existing_keys(user_id, dates):
+    """
+    Returns the dedup keys of the user's records dated exactly at one of the given dates, so the
+    lookup is bounded by the batch rather than by the date span it covers.
+    """
+    keys = set()
+    for collection_name, amount_field, description_field, sign in (
+            ("expenses", "total_expense", "description_expense", -1),
+            ("revenues", "total_revenue", "description_revenue", 1)):
+        projection = {"_id": 0, "date": 1, amount_field: 1, description_field: 1}
+        async for document in ledger_store.iter_by_user_id(user_id, collection_name, projection=projection,
+                                                           sort_field="date", dates=dates):
+            keys.add(_dedup_key(user_id, document["date"], sign * document[amount_field],
+                                document[description_field]))
+    return keys
+
+
+async def _write_batch(user_id, entries, stats):
+    """
+    Skips entries that already exist and inserts the rest with one insert_many per collection and
+    one balance update.
+    """
+    existing = await _existing_keys(user_id, sorted({entry.date for entry in entries}))
+    documents = {"expenses": [], "revenues": []}
+    delta = 0
+    for entry in entries:
+        key = _entry_key(entry)
+        if key in existing:
+            stats["duplicates"] += 1
+            continue
+        existing.add(key)
+        if isinstance(entry, Expense):
+            documents["expenses"].append(entry)
+            delta -= entry.total_expense
+        else:
+            documents["revenues"].append(entry)
+            delta += entry.total_revenue
+    if not documents["expenses"] and not documents["revenues"]:
+        return
+    for collection_name, batch in documents.items():
+        if batch:
+            first_id = await id_allocator.reserve_ids(collection_name, len(batch))
+            for offset, entry in enumerate(batch):
+                entry.id = first_id + offset
+    async with db_functions.transaction() as session:
+        for collection_name, batch in documents.items():
+            if batch:
+                batch_documents = [entry.dict() for entry in batch]
+                await ledger_store.add_many(batch_documents, collection_name=collection_name, session=session)
+                await summary_service.apply_entries(collection_name, batch_documents, session=session)
+        await db_functions.inc_balance(user_id, delta, session=session,
+                                       reason={"kind": "import", "action": "batch",
+                                               "expenses": len(documents["expenses"]), "revenues": len(documents["revenues"])})
+    await user_cache.invalidate(user_id)
+    stats["expenses"] += len(documents["expenses"])
+    stats["revenues"] += len(documents["revenues"])
+
+
+def _read_batch(user_id, rows, batch_size, stats):
+    """
+    Reads and parses rows until batch_size of them are valid or the statement ends. Runs in a worker
+    thread, so reading and parsing the file does not block the event loop.
+    """
+    entries = []
+    for row_number, fields in rows:
+        stats["rows"] += 1
+        try:
+            entries.append(_to_entry(user_id, fields))
+        except (ValueError, ValidationError) as e:
+            stats["invalid"] += 1
+            if len(stats["errors"]) < MAX_REPORTED_ERRORS:
+                stats["errors"].append({"row": row_number, "error": str(e)})
+        if len(entries) >= batch_size:
+            break
+    return entries
+
+
+async def import_statement(user_id, stream, statement_format, batch_size=None, report_progress=None):
+    """
+    Imports a bank statement into a user's expenses and revenues.
+
+    The statement is read row by row and written in batches of batch_size, so memory use does not
+    grow with the size of the file. Each batch is read and parsed in a worker thread. Rows matching an existing record of the user on date, amount
+    and description (including rows imported earlier in the same file) are skipped.
+
+    Args:
+        user_id (int): The ID of the user.
+        stream (TextIO): The statement text.
+        statement_format (str): "csv" or "ofx".
+        batch_size (int, optional): The number of rows written per batch; IMPORT_BATCH_SIZE by default.
+        report_progress (Callable, optional): An async function called with the counters after each batch.
+
+    Returns:
+        dict: The number of rows read, expenses and revenues created, duplicates skipped, invalid rows,
+        and the first MAX_REPORTED_ERRORS errors by row number.
+
+    Raises:
+        ValueError: If the format is not supported.
+    """
+    if statement_format not in IMPORT_FORMATS:
+        raise ValueError(f"Unsupported statement format: {statement_format}")
+    batch_size = batch_size or IMPORT_BATCH_SIZE
+    rows = _csv_rows(stream) if statement_format == "csv" else _ofx_rows(stream)
+    stats = {"rows": 0, "expenses": 0, "revenues": 0, "duplicates": 0, "invalid": 0, "errors": []}
+    while True:
+        entries = await asyncio.to_thread(_read_batch, user_id, rows, batch_size, stats)
+        if entries:
+            await _write_batch(user_id, entries, stats)
+        if len(entries) < batch_size:
+            return stats
+        if report_progress is not None:
+            await report_progress(stats)
+
+
+async def import_statement_file(user_id, statement_file, statement_format, report_progress=None):
+    """
+    Imports a statement from a binary file, closing the file when done.
+
+    Args:
+        user_id (int): The ID of the user.
+        statement_file (BinaryIO): The uploaded statement, positioned at its start.
+        statement_format (str): "csv" or "ofx".
+        report_progress (Callable, optional): An async function called with the counters after each batch.
+
+    Returns:
+        dict: The import counters, as returned by import_statement.
+    """
+    with statement_file:
+        stream = io.TextIOWrapper(statement_file, encoding='utf-8-sig', errors='replace', newline='')
+        return await import_statement(user_id, stream, statement_format, report_progress=report_progress)
+
+
+async def start_import(user_id, chunks, statement_format):
+    """
+    Saves an uploaded statement to a temporary file as it arrives and imports it in a background job.
+
+    The job's progress holds the import counters after each batch and its result holds the final ones.
+
+    Args:
+        user_id (int): The ID of the user.
+        chunks (AsyncIterator[bytes]): The body of the upload.
+        statement_format (str): "csv" or "ofx".
+
+    Returns:
+        str: The ID of the import job.
+
+    Raises:
+        ValueError: If the format is not supported.
+    """
+    if statement_format not in IMPORT_FORMATS:
+        raise ValueError(f"Unsupported statement format: {statement_format}")
+    statement_file = tempfile.TemporaryFile()
+    try:
+        async for chunk in chunks:
+            statement_file.write(chunk)
+        statement_file.seek(0)
+    except BaseException:
+        statement_file.close()
+        raise
+
+    def run(job_id):
+        async def report_progress(stats):
+            await job_service.set_progress(job_id, stats)
+        return import_statement_file(user_id, statement_file, statement_format, report_progress=report_progress)
+
+    return await job_service.start_job("import_statement", run)
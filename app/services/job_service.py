@@ -0,0 +1,73 @@
+import asyncio
+import uuid
+from datetime import datetime
+from app.db import db_functions
+
+_running_tasks = set()
+
+
+async def _run_job(job_id, coroutine):
+    try:
+        result = await coroutine
+        await db_functions.update({"id": job_id, "status": "completed", "result": result,
+                                   "finished_at": datetime.now()}, collection_name="jobs")
+    except Exception as e:
+        await db_functions.update({"id": job_id, "status": "failed", "error": str(e),
+                                   "finished_at": datetime.now()}, collection_name="jobs")
+
+
+async def start_job(kind, coroutine):
+    """
+    Runs a coroutine as a background job whose status can be polled.
+
+    The job document lives in the "jobs" collection, so any worker can report its status,
+    while the work itself runs on the event loop of the worker that started it.
+
+    Args:
+        kind (str): A short name describing the job, e.g. "delete_user".
+        coroutine (Coroutine | Callable): The work to run, or a function that takes the job ID and
+            returns it, for work that reports its progress with set_progress.
+
+    Returns:
+        str: The ID of the job.
+    """
+    job_id = uuid.uuid4().hex
+    await db_functions.add({"id": job_id, "kind": kind, "status": "running", "progress": None,
+                            "result": None, "error": None, "created_at": datetime.now(),
+                            "finished_at": None}, collection_name="jobs")
+    if callable(coroutine):
+        coroutine = coroutine(job_id)
+    task = asyncio.create_task(_run_job(job_id, coroutine))
+    _running_tasks.add(task)
+    task.add_done_callback(_running_tasks.discard)
+    return job_id
+
+
+async def set_progress(job_id, progress):
+    """
+    Records the progress of a running job.
+
+    Args:
+        job_id (str): The ID of the job.
+        progress (any): The progress to report, e.g. a dict of counters.
+    """
+    await db_functions.update({"id": job_id, "progress": progress}, collection_name="jobs")
+
+
+async def get_job(job_id):
+    """
+    Retrieves the status of a background job.
+
+    Args:
+        job_id (str): The ID of the job.
+
+    Returns:
+        dict: The job's kind, status, progress, result or error, and timestamps.
+
+    Raises:
+        ValueError: If the job is not found.
+    """
+    job = await db_functions.get_by_field("id", job_id, "jobs", projection={"_id": 0})
+    if job is None:
+        raise ValueError("Job not found")
+    return job
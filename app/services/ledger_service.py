@@ -0,0 +1,191 @@
+import asyncio
+import os
+from datetime import datetime
+from app.db import db_functions
+from app.db.db_functions import LEDGER_EVENTS_COLLECTION
+from app.services import job_service, user_cache
+
+BALANCE_SNAPSHOTS_COLLECTION = "balance_snapshots"
+LEDGER_SNAPSHOT_INTERVAL = int(os.getenv('LEDGER_SNAPSHOT_INTERVAL', '1000'))
+LEDGER_RECONCILE_BATCH_SIZE = int(os.getenv('LEDGER_RECONCILE_BATCH_SIZE', '500'))
+LEDGER_RECONCILE_CONCURRENCY = int(os.getenv('LEDGER_RECONCILE_CONCURRENCY', '8'))
+MAX_REPORTED_MISMATCHES = 100
+
+
+async def write_snapshot(user_id, version, balance):
+    """
+    Records a user's balance as of a ledger version.
+
+    Args:
+        user_id (int): The ID of the user.
+        version (int): The ledger version the balance includes every event up to.
+        balance (float): The balance at that version.
+    """
+    await db_functions.update_by_query({"user_id": user_id, "version": version},
+                                       {"balance": balance, "created_at": datetime.now()},
+                                       collection_name=BALANCE_SNAPSHOTS_COLLECTION, upsert=True)
+
+
+async def rebuild_balance(user_id, up_to_version):
+    """
+    Rebuilds a user's balance from their latest snapshot and the ledger events after it.
+
+    Users without a snapshot start from a balance of 0 at version 0, which is only right for users
+    created with an opening snapshot (or before any balance change); "baseline" tells the cases apart.
+
+    Args:
+        user_id (int): The ID of the user.
+        up_to_version (int): The last ledger version to include.
+
+    Returns:
+        dict: The rebuilt balance, the snapshot version it started from, the number of events
+        replayed, whether every version up to up_to_version had an event, and whether a snapshot
+        was found to start from.
+    """
+    snapshot = await db_functions.find_one({"user_id": user_id, "version": {"$lte": up_to_version}},
+                                           collection_name=BALANCE_SNAPSHOTS_COLLECTION,
+                                           projection={"_id": 0, "version": 1, "balance": 1},
+                                           sort=[("version", -1)])
+    baseline = snapshot is not None
+    if not baseline:
+        snapshot = {"version": 0, "balance": 0}
+    pipeline = [
+        {"$match": {"user_id": user_id, "version": {"$gt": snapshot["version"], "$lte": up_to_version}}},
+        {"$group": {"_id": None, "delta": {"$sum": "$delta"}, "events": {"$sum": 1}}},
+    ]
+    tail = await db_functions.aggregate(pipeline, LEDGER_EVENTS_COLLECTION)
+    delta, events = (tail[0]["delta"], tail[0]["events"]) if tail else (0, 0)
+    return {"balance": snapshot["balance"] + delta, "snapshot_version": snapshot["version"], "events": events,
+            "complete": events == up_to_version - snapshot["version"], "baseline": baseline}
+
+
+async def check_balance(user_id):
+    """
+    Compares a user's stored balance with the balance rebuilt from the ledger.
+
+    Args:
+        user_id (int): The ID of the user.
+
+    Returns:
+        dict: The stored and ledger balances, the ledger version, and whether they agree.
+
+    Raises:
+        ValueError: If the user is not found.
+    """
+    user = await db_functions.find_one({"id": user_id}, collection_name="users",
+                                       projection={"_id": 0, "id": 1, "balance": 1, "ledger_version": 1})
+    if user is None:
+        raise ValueError("User not found")
+    return await _check_user(user)
+
+
+def _balances_match(stored, rebuilt):
+    return abs(stored - rebuilt) < 0.005
+
+
+async def _check_user(user):
+    version = user.get("ledger_version", 0)
+    rebuilt = await rebuild_balance(user["id"], version)
+    # A user with a balance but no snapshot predates the ledger (seed_balance_snapshots was not run for
+    # them), so the ledger cannot tell what their balance should be.
+    missing_baseline = not rebuilt["baseline"] and not _balances_match(user["balance"], 0)
+    return {"user_id": user["id"], "stored_balance": user["balance"], "ledger_balance": rebuilt["balance"],
+            "version": version, "snapshot_version": rebuilt["snapshot_version"], "events_replayed": rebuilt["events"],
+            "complete": rebuilt["complete"], "missing_baseline": missing_baseline,
+            "consistent": rebuilt["complete"] and not missing_baseline
+            and _balances_match(user["balance"], rebuilt["balance"])}
+
+
+async def _reconcile_user(user, fix, stats):
+    result = await _check_user(user)
+    stats["checked"] += 1
+    if result["missing_baseline"]:
+        stats["missing_baseline"] += 1
+    elif not result["complete"]:
+        stats["missing_events"] += 1
+    elif result["events_replayed"] >= LEDGER_SNAPSHOT_INTERVAL:
+        await write_snapshot(user["id"], result["version"], result["ledger_balance"])
+        stats["snapshots"] += 1
+    if result["consistent"]:
+        return
+    stats["mismatched"] += 1
+    if len(stats["mismatches"]) < MAX_REPORTED_MISMATCHES:
+        stats["mismatches"].append(result)
+    if fix and result["complete"] and not result["missing_baseline"]:
+        # Only overwrite the balance if no change landed since it was read.
+        if await db_functions.update_by_query({"id": user["id"], "ledger_version": user.get("ledger_version", 0)},
+                                              {"balance": result["ledger_balance"]}, collection_name="users"):
+            await user_cache.invalidate(user["id"])
+            stats["fixed"] += 1
+
+
+async def reconcile(fix=False, report_progress=None):
+    """
+    Checks every user's stored balance against the ledger and optionally repairs mismatches.
+
+    Users are read a page of LEDGER_RECONCILE_BATCH_SIZE at a time and up to
+    LEDGER_RECONCILE_CONCURRENCY of them are checked at once. Each check only replays the events
+    after the user's latest snapshot, and a new snapshot is written once that tail reaches
+    LEDGER_SNAPSHOT_INTERVAL events, so later runs stay fast as the ledger grows.
+
+    Args:
+        fix (bool): Whether to overwrite mismatched balances with the ledger balance. Users with
+            missing events, or with a balance but no snapshot to start from, are only reported.
+        report_progress (Callable, optional): An async function called with the counters after each page.
+
+    Returns:
+        dict: The number of users checked, mismatched, fixed, with missing events, without a
+        baseline snapshot, the snapshots written, and the first MAX_REPORTED_MISMATCHES mismatches.
+    """
+    stats = {"checked": 0, "mismatched": 0, "fixed": 0, "missing_events": 0, "missing_baseline": 0, "snapshots": 0,
+             "mismatches": []}
+    semaphore = asyncio.Semaphore(LEDGER_RECONCILE_CONCURRENCY)
+
+    async def reconcile_user(user):
+        async with semaphore:
+            await _reconcile_user(user, fix, stats)
+
+    after = None
+    while True:
+        users = await db_functions.get_all("users", limit=LEDGER_RECONCILE_BATCH_SIZE, after=after,
+                                           projection={"_id": 0, "id": 1, "balance": 1, "ledger_version": 1})
+        if not users:
+            break
+        await asyncio.gather(*(reconcile_user(user) for user in users))
+        if report_progress is not None:
+            await report_progress(stats)
+        if len(users) < LEDGER_RECONCILE_BATCH_SIZE:
+            break
+        after = users[-1]["id"]
+    return stats
+
+
+async def start_reconciliation(fix=False):
+    """
+    Starts a background job reconciling every user's balance with the ledger.
+
+    Args:
+        fix (bool): Whether to repair mismatched balances.
+
+    Returns:
+        str: The ID of the job, whose progress and result hold the reconciliation counters.
+    """
+    def run(job_id):
+        async def report_progress(stats):
+            await job_service.set_progress(job_id, stats)
+        return reconcile(fix, report_progress=report_progress)
+
+    return await job_service.start_job("reconcile_ledger", run)
+
+
+async def delete_user_ledger(user_id, session=None):
+    """
+    Deletes a user's ledger events and balance snapshots.
+
+    Args:
+        user_id (int): The ID of the user.
+        session (AsyncIOMotorClientSession, optional): The transaction session to run in.
+    """
+    await db_functions.delete_many({"user_id": user_id}, collection_name=LEDGER_EVENTS_COLLECTION, session=session)
+    await db_functions.delete_many({"user_id": user_id}, collection_name=BALANCE_SNAPSHOTS_COLLECTION,
+                                   session=session)
@@ -0,0 +1,63 @@
+import os
+import bcrypt
+from app.executors import BoundedExecutor
+
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))
+
+executor = BoundedExecutor(
+    'password_hashing',
+    kind=os.getenv('PASSWORD_HASH_EXECUTOR', 'thread'),
+    max_workers=int(os.getenv('PASSWORD_HASH_WORKERS', '4')),
+    max_concurrency=int(os.getenv('PASSWORD_HASH_CONCURRENCY', '0')) or None,
+)
+
+
+def _hash_password(password: str, rounds: int) -> str:
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+
+
+def _check_password(password: str, hashed_password: str) -> bool:
+    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+
+async def hash_password(password: str) -> str:
+    """
+    Hashes a password with the configured bcrypt cost factor without blocking the event loop.
+
+    Args:
+        password (str): The plain text password.
+
+    Returns:
+        str: The bcrypt hash.
+    """
+    return await executor.run(_hash_password, password, BCRYPT_ROUNDS)
+
+
+async def verify_password(password: str, hashed_password: str) -> bool:
+    """
+    Checks a password against a bcrypt hash without blocking the event loop.
+
+    Args:
+        password (str): The plain text password.
+        hashed_password (str): The stored bcrypt hash.
+
+    Returns:
+        bool: True if the password matches the hash, False otherwise.
+    """
+    return await executor.run(_check_password, password, hashed_password)
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    """
+    Check if a bcrypt hash was produced with a cost factor other than the configured one.
+
+    Args:
+        hashed_password (str): The stored bcrypt hash, e.g. "$2b$12$...".
+
+    Returns:
+        bool: True if the password should be rehashed, False otherwise.
+    """
+    try:
+        return int(hashed_password.split('$')[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
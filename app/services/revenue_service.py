@@ -1,7 +1,8 @@
-from app.db import db_functions
+from app.db import db_functions, id_allocator, ledger_store
+from app.services import batch_service, summary_service, user_cache
 from app.models.revenue import Revenue
 from datetime import datetime
-from app.models.user import User
+from app.utils import fields_projection
 
 
 async def get_revenue_by_id(revenue_id: int):
@@ -19,7 +20,7 @@ async def get_revenue_by_id(revenue_id: int):
         Exception: For any other unexpected error.
     """
     try:
-        revenue = await db_functions.get_by_id(revenue_id, collection_name="revenues")
+        revenue = await ledger_store.get_by_id(revenue_id, collection_name="revenues")
         if revenue is None:
             raise ValueError("Revenue not found")
         return revenue
@@ -29,12 +30,15 @@ async def get_revenue_by_id(revenue_id: int):
         raise e
 
 
-async def get_all_revenues_by_user_id(user_id: int):
+async def get_all_revenues_by_user_id(user_id: int, limit: int = None, after: int = None, fields: list = None):
     """
-    Retrieves all revenues for a specific user by their ID.
+    Retrieves the revenues for a specific user by their ID, ordered by ID and optionally one page at a time.
 
     Args:
         user_id (int): The ID of the user.
+        limit (int, optional): The maximum number of revenues to return.
+        after (int, optional): Only revenues with an ID greater than this are returned.
+        fields (list, optional): The fields to return; all fields by default.
 
     Returns:
         List[dict]: A list containing dictionaries of revenue details.
@@ -44,8 +48,9 @@ async def get_all_revenues_by_user_id(user_id: int):
         Exception: For any other unexpected error.
     """
     try:
-        all_revenues = await db_functions.get_all_by_user_id(user_id, collection_name="revenues")
-        if not all_revenues:
+        all_revenues = await ledger_store.get_all_by_user_id(user_id, collection_name="revenues", limit=limit, after=after,
+                                                             projection=fields_projection(fields))
+        if not all_revenues and after is None:
             raise ValueError("Revenues not found")
         return all_revenues
     except ValueError as ve:
@@ -70,23 +75,45 @@ async def create_revenue(user_id, new_revenue: Revenue):
         Exception: For any other unexpected error.
     """
     try:
-        new_revenue.id = await db_functions.last_id(collection_name="revenues") + 1
+        new_revenue.id = await id_allocator.next_id("revenues")
         new_revenue.user_id = user_id
-        user = await db_functions.get_by_id(user_id, collection_name="users")
-        if user is None:
-            raise ValueError("User not found")
-        user['balance'] += new_revenue.total_revenue
-        await db_functions.update(user, collection_name="users")
-
-        # Convert Revenue object to dictionary before adding to database
         new_revenue_dict = new_revenue.dict()
-        return await db_functions.add(new_revenue_dict, collection_name="revenues")
+        async with db_functions.transaction() as session:
+            result = await ledger_store.add(new_revenue_dict, collection_name="revenues", session=session)
+            await summary_service.apply_entry("revenues", new_revenue_dict, session=session)
+            try:
+                await db_functions.inc_balance(user_id, new_revenue.total_revenue, session=session,
+                                               reason={"kind": "revenue", "action": "create", "id": new_revenue.id})
+            except ValueError:
+                if session is None:
+                    # Without a transaction to roll back, take the revenue of a missing user out again.
+                    await ledger_store.delete(new_revenue.id, collection_name="revenues")
+                    await summary_service.apply_entry("revenues", new_revenue_dict, -1)
+                raise
+        await user_cache.invalidate(user_id)
+        return result
     except ValueError as ve:
         raise ve
     except Exception as e:
         raise e
 
 
+async def create_revenues_batch(items: list):
+    """
+    Creates a batch of revenues, adding each user's net amount to their balance in one update.
+
+    Args:
+        items (list): The revenues to create, each validated as a Revenue.
+
+    Returns:
+        dict: The number of created revenues, the ID of each by item index, and per-item errors.
+
+    Raises:
+        ValueError: If the batch is empty or too large.
+    """
+    return await batch_service.create_batch(items, Revenue, "revenues", "total_revenue", 1)
+
+
 async def update_revenue(revenue_id: int, new_revenue: Revenue):
     """
     Updates an existing revenue.
@@ -96,30 +123,35 @@ async def update_revenue(revenue_id: int, new_revenue: Revenue):
         new_revenue (Revenue): The updated revenue details.
 
     Returns:
-        str: A message indicating the success of the update.
+        dict: The updated revenue.
 
     Raises:
+        ValueError: If the revenue or its new user is not found.
         Exception: For any unexpected error.
     """
     try:
-        existing_revenue = await get_revenue_by_id(revenue_id)
-        last_user_id = existing_revenue['user_id']
-        last_total_revenue = existing_revenue['total_revenue']
-
-        user_data = await db_functions.get_by_id(last_user_id, "users")
-        user = User(**user_data)
-        user.balance -= last_total_revenue
-        await db_functions.update(user.dict(), "users")
-
-        new_user_data = await db_functions.get_by_id(new_revenue.user_id, "users")
-        new_user = User(**new_user_data)
-        new_user.balance += new_revenue.total_revenue
-        await db_functions.update(new_user.dict(), "users")
-
         new_revenue.id = revenue_id
         new_revenue.date = datetime.now()
-        updated_revenue = new_revenue.dict()
-        return await db_functions.update(updated_revenue, collection_name="revenues")
+        new_revenue_dict = new_revenue.dict()
+        async with db_functions.transaction() as session:
+            # Checked before anything is written: without a transaction, a failing inc_balance for the
+            # new user would leave the revenue, the summaries and the old user's refund applied.
+            if await db_functions.find_one({"id": new_revenue.user_id}, collection_name="users",
+                                           projection={"_id": 0, "id": 1}, session=session) is None:
+                raise ValueError("User not found")
+            # The pre-image carries the old user and amount, so the revenue is not read separately.
+            existing_revenue = await ledger_store.update(new_revenue_dict, collection_name="revenues", session=session,
+                                                         return_document="before")
+            if existing_revenue is None:
+                raise ValueError("Revenue not found")
+            await summary_service.apply_entry("revenues", existing_revenue, -1, session=session)
+            await summary_service.apply_entry("revenues", new_revenue_dict, session=session)
+            await db_functions.inc_balance(existing_revenue['user_id'], -existing_revenue['total_revenue'], session=session,
+                                           reason={"kind": "revenue", "action": "update", "id": revenue_id})
+            await db_functions.inc_balance(new_revenue.user_id, new_revenue.total_revenue, session=session,
+                                           reason={"kind": "revenue", "action": "update", "id": revenue_id})
+        await user_cache.invalidate(existing_revenue['user_id'], new_revenue.user_id)
+        return {**existing_revenue, **new_revenue_dict}
     except Exception as e:
         raise e
 
@@ -139,12 +171,18 @@ async def delete_revenue(revenue_id):
         Exception: For any other unexpected error.
     """
     try:
-        revenue = await get_revenue_by_id(revenue_id)
-        user_data = await db_functions.get_by_id(revenue['user_id'], collection_name="users")
-        user = User(**user_data)
-        user.balance -= revenue['total_revenue']
-        await update_user(revenue['user_id'], user, True)
-        return await db_functions.delete(revenue['id'], collection_name="revenues")
+        async with db_functions.transaction() as session:
+            # The deleted document decides the refund, so concurrent deletes or updates of the same
+            # revenue cannot take its amount off the balance twice or at a stale value.
+            revenue = await ledger_store.delete(revenue_id, collection_name="revenues", session=session,
+                                                return_document=True)
+            if revenue is None:
+                raise ValueError("Revenue not found")
+            await summary_service.apply_entry("revenues", revenue, -1, session=session)
+            await db_functions.inc_balance(revenue['user_id'], -revenue['total_revenue'], session=session,
+                                           reason={"kind": "revenue", "action": "delete", "id": revenue_id})
+        await user_cache.invalidate(revenue['user_id'])
+        return f"Document with ID {revenue_id} deleted successfully."
     except ValueError as ve:
         raise ve
     except Exception as e:
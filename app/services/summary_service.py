@@ -0,0 +1,108 @@
+from datetime import datetime
+from app.db import db_functions
+
+MONTHLY_SUMMARIES_COLLECTION = "monthly_summaries"
+
+# collection -> (amount field, summary total field, summary count field)
+SUMMARY_FIELDS = {
+    "expenses": ("total_expense", "total_expense", "expense_count"),
+    "revenues": ("total_revenue", "total_revenue", "revenue_count"),
+}
+
+
+def _month_key(user_id, date):
+    return {"user_id": user_id, "year": date.year, "month": date.month}
+
+
+async def apply_entries(collection_name, documents, sign=1, session=None):
+    """
+    Adds expenses or revenues to (sign=1) or removes them from (sign=-1) their users' monthly summaries.
+
+    Documents falling in the same user and month are folded into a single $inc.
+
+    Args:
+        collection_name (str): "expenses" or "revenues".
+        documents (list): The expense or revenue documents.
+        sign (int): 1 when the documents were added, -1 when they were removed.
+        session (AsyncIOMotorClientSession, optional): The transaction session to run in.
+    """
+    amount_field, total_field, count_field = SUMMARY_FIELDS[collection_name]
+    increments = {}
+    for document in documents:
+        key = tuple(_month_key(document['user_id'], document['date']).items())
+        total, count = increments.get(key, (0, 0))
+        increments[key] = (total + sign * document[amount_field], count + sign)
+    for key, (total, count) in increments.items():
+        await db_functions.upsert_inc(dict(key), {total_field: total, count_field: count},
+                                      collection_name=MONTHLY_SUMMARIES_COLLECTION, session=session)
+
+
+async def apply_entry(collection_name, document, sign=1, session=None):
+    """
+    Adds one expense or revenue to (sign=1) or removes it from (sign=-1) its user's monthly summary.
+
+    Args:
+        collection_name (str): "expenses" or "revenues".
+        document (dict): The expense or revenue document.
+        sign (int): 1 when the document was added, -1 when it was removed.
+        session (AsyncIOMotorClientSession, optional): The transaction session to run in.
+    """
+    await apply_entries(collection_name, [document], sign, session=session)
+
+
+async def delete_user_summaries(user_id, session=None):
+    """
+    Deletes every monthly summary of a user.
+
+    Args:
+        user_id (int): The ID of the user.
+        session (AsyncIOMotorClientSession, optional): The transaction session to run in.
+
+    Returns:
+        int: The number of summaries deleted.
+    """
+    return await db_functions.delete_many({"user_id": user_id}, collection_name=MONTHLY_SUMMARIES_COLLECTION,
+                                          session=session)
+
+
+async def get_summary(user_id, year=None, month=None):
+    """
+    Retrieves a user's totals for one month with a single indexed lookup.
+
+    Args:
+        user_id (int): The ID of the user.
+        year (int, optional): The year; the current year by default.
+        month (int, optional): The month, 1 to 12; the current month by default.
+
+    Returns:
+        dict: The month's total expense and revenue, their counts, and the net amount.
+    """
+    now = datetime.now()
+    query = {"user_id": user_id, "year": year or now.year, "month": month or now.month}
+    summary = await db_functions.find_one(query, collection_name=MONTHLY_SUMMARIES_COLLECTION,
+                                          projection={"_id": 0}) or {}
+    result = {**query, "total_expense": 0, "total_revenue": 0, "expense_count": 0, "revenue_count": 0}
+    result.update(summary)
+    result["net"] = result["total_revenue"] - result["total_expense"]
+    return result
+
+
+async def get_user_totals(user_id):
+    """
+    Sums a user's monthly summaries into all-time totals.
+
+    Args:
+        user_id (int): The ID of the user.
+
+    Returns:
+        tuple: The total expense and the total revenue.
+    """
+    pipeline = [
+        {"$match": {"user_id": user_id}},
+        {"$group": {"_id": None, "total_expense": {"$sum": "$total_expense"},
+                    "total_revenue": {"$sum": "$total_revenue"}}},
+    ]
+    result = await db_functions.aggregate(pipeline, MONTHLY_SUMMARIES_COLLECTION)
+    if not result:
+        return 0, 0
+    return result[0]["total_expense"], result[0]["total_revenue"]
@@ -0,0 +1,145 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from app.db import db_functions
+from app.metrics import Counter
+
+USER_CACHE_TTL_SECONDS = float(os.getenv('USER_CACHE_TTL_SECONDS', '5'))
+USER_CACHE_MAX_ENTRIES = int(os.getenv('USER_CACHE_MAX_ENTRIES', '10000'))
+
+user_cache_hits = Counter('user_cache_hits_total', 'User lookups served from the user cache')
+user_cache_misses = Counter('user_cache_misses_total', 'User lookups that went to the database')
+
+
+class CacheBackend:
+    """
+    Storage for cached user documents.
+
+    Implement this on top of a shared store (for example Redis) to let several workers share one
+    cache; writes made by one worker are then invalidated for all of them.
+    """
+
+    async def get(self, key):
+        raise NotImplementedError
+
+    async def set(self, key, value, ttl):
+        raise NotImplementedError
+
+    async def delete(self, key):
+        raise NotImplementedError
+
+    async def clear(self):
+        raise NotImplementedError
+
+
+class LocalCacheBackend(CacheBackend):
+    """
+    An in-process LRU cache with a TTL per entry. Also serves as the stand-in for a shared backend in tests.
+    """
+
+    def __init__(self, max_entries=USER_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    async def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    async def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_backend = LocalCacheBackend()
+# user ID -> the task loading the user; only users being loaded right now have an entry.
+_pending = {}
+
+
+def set_backend(backend):
+    """
+    Replaces the cache backend, e.g. with a shared one at startup.
+
+    Args:
+        backend (CacheBackend): The backend to use from now on.
+    """
+    global _backend
+    _backend = backend
+
+
+async def _load_user(user_id):
+    user = await db_functions.get_by_id(user_id, collection_name="users")
+    # Only cache the document if no write invalidated the user while it was being read;
+    # invalidate() detaches the load from _pending.
+    if _pending.get(user_id) is asyncio.current_task():
+        await _backend.set(user_id, user, USER_CACHE_TTL_SECONDS)
+    return user
+
+
+async def get_user(user_id):
+    """
+    Retrieves a user document through the cache.
+
+    Concurrent misses for the same user share a single database read.
+
+    Args:
+        user_id (int): The ID of the user.
+
+    Returns:
+        dict: A copy of the user document.
+
+    Raises:
+        RuntimeError: If the user cannot be retrieved, as db_functions.get_by_id does.
+    """
+    user = await _backend.get(user_id)
+    if user is not None:
+        user_cache_hits.inc()
+        return dict(user)
+    user_cache_misses.inc()
+    pending = _pending.get(user_id)
+    if pending is None:
+        pending = asyncio.ensure_future(_load_user(user_id))
+        _pending[user_id] = pending
+        pending.add_done_callback(lambda future: _pending.pop(user_id) if _pending.get(user_id) is future else None)
+    return dict(await asyncio.shield(pending))
+
+
+async def invalidate(*user_ids):
+    """
+    Drops users from the cache after they were written. Call it after the write has committed.
+
+    Args:
+        user_ids (int): The IDs of the users that changed.
+    """
+    for user_id in user_ids:
+        _pending.pop(user_id, None)
+        await _backend.delete(user_id)
+
+
+async def clear():
+    """
+    Empties the cache.
+    """
+    _pending.clear()
+    await _backend.clear()
@@ -1,19 +1,26 @@
-import bcrypt
-from app.db import db_functions
+from app.db import db_functions, id_allocator, ledger_store
 from app.models.user import User
+from app.services import job_service, ledger_service, password_service, summary_service, user_cache
+from app.utils import fields_projection
 from app import validators
 
 
-async def get_all_users():
+async def get_all_users(limit=None, after=None, fields=None):
     """
-    Retrieves all users.
+    Retrieves users ordered by ID, optionally one page at a time. Password hashes are never returned.
+
+    Args:
+        limit (int, optional): The maximum number of users to return.
+        after (int, optional): Only users with an ID greater than this are returned.
+        fields (list, optional): The fields to return; all fields except the password by default.
 
     Returns:
         list: A list containing dictionaries of user information.
     """
     try:
-        users = await db_functions.get_all(collection_name="users")
-        print(users)
+        projection = fields_projection([field for field in fields if field != 'password']) if fields else None
+        users = await db_functions.get_all(collection_name="users", limit=limit, after=after,
+                                           projection=projection or {"password": 0})
         if users is None:
             return ValueError('List users not found')
         return users
@@ -34,7 +41,7 @@ async def get_user_by_id(user_id):
         dict: A dictionary containing the user's information.
     """
     try:
-        user = await db_functions.get_by_id(user_id, collection_name="users")
+        user = await user_cache.get_user(user_id)
         if user is None:
             raise ValueError("User not found")
         return user
@@ -44,6 +51,20 @@ async def get_user_by_id(user_id):
         raise e
 
 
+async def check_user_exists(user_id):
+    """
+    Checks that a user exists, without loading their document.
+
+    Args:
+        user_id (int): The ID of the user.
+
+    Raises:
+        ValueError: If the user is not found.
+    """
+    if await db_functions.find_one({"id": user_id}, collection_name="users", projection={"_id": 0, "id": 1}) is None:
+        raise ValueError("User not found")
+
+
 async def create_user(new_user: User):
     """
     Creates a new user.
@@ -55,12 +76,15 @@ async def create_user(new_user: User):
         dict: A dictionary containing the result of adding the user.
     """
     try:
-        hashed_password = bcrypt.hashpw(new_user.password.encode('utf-8'), bcrypt.gensalt())
-        new_user.id = await db_functions.last_id(collection_name="users") + 1
+        hashed_password = await password_service.hash_password(new_user.password)
+        new_user.id = await id_allocator.next_id("users")
         new_user.balance = 0.0
-        new_user.password = hashed_password.decode('utf-8')
+        new_user.password = hashed_password
         user = new_user.dict()
-        return await db_functions.add(user, collection_name="users")
+        result = await db_functions.add(user, collection_name="users")
+        # The opening snapshot the ledger rebuilds this user's balance from.
+        await ledger_service.write_snapshot(new_user.id, 0, 0.0)
+        return result
     except Exception as e:
         raise e
 
@@ -77,13 +101,14 @@ async def login_user(user_name, user_password):
         list: A list of dictionaries containing user information.
     """
     try:
-        all_users = await db_functions.get_all("users")
-        if not all_users:
-            raise ValueError('List users not found')
-        for user in all_users:
-            if user['user_name'] == user_name and bcrypt.checkpw(user_password.encode('utf-8'), user['password'].encode('utf-8')):
-                return [user]
-        raise ValueError("User not found or invalid password")
+        user = await db_functions.get_by_field("user_name", user_name, collection_name="users")
+        if user is None or not await password_service.verify_password(user_password, user['password']):
+            raise ValueError("User not found or invalid password")
+        if password_service.needs_rehash(user['password']):
+            user['password'] = await password_service.hash_password(user_password)
+            await db_functions.update({"id": user['id'], "password": user['password']}, collection_name="users")
+            await user_cache.invalidate(user['id'])
+        return [user]
     except ValueError as ve:
         raise ve
     except Exception as e:
@@ -104,36 +129,52 @@ async def update_user(user_id: int, new_user: User):
         :param new_user:
     """
     try:
-        existing_user = await get_user_by_id(user_id)
-        new_user.balance = existing_user['balance']
-        hashed_password = bcrypt.hashpw(new_user.password.encode('utf-8'), bcrypt.gensalt())
-        new_user.password = hashed_password.decode('utf-8')
+        new_user.password = await password_service.hash_password(new_user.password)
         new_user.id = user_id
-        user = new_user.dict()
-        return await db_functions.update(user, collection_name="users")
+        # The balance is only changed through db_functions.inc_balance, never overwritten here.
+        user = new_user.dict(exclude={'balance'})
+        updated_user = await db_functions.update(user, collection_name="users", return_document="after")
+        await user_cache.invalidate(user_id)
+        if updated_user is None:
+            raise ValueError("User not found")
+        return f"Document with ID {user_id} updated successfully."
     except Exception as e:
         raise e
 
 
-async def delete_user(user_id):
+async def _delete_user_data(user_id, session=None):
+    revenues_deleted = await ledger_store.delete_many({"user_id": user_id}, collection_name="revenues", session=session)
+    expenses_deleted = await ledger_store.delete_many({"user_id": user_id}, collection_name="expenses", session=session)
+    await summary_service.delete_user_summaries(user_id, session=session)
+    await ledger_service.delete_user_ledger(user_id, session=session)
+    return {"revenues_deleted": revenues_deleted, "expenses_deleted": expenses_deleted}
+
+
+async def delete_user(user_id, background=False):
     """
-    Deletes a user from the system along with their associated revenues.
+    Deletes a user from the system along with their associated revenues and expenses.
 
     Args:
         user_id (any): The ID of the user to be deleted.
+        background (bool): If True, the user is deleted immediately and their revenues and expenses
+            are deleted by a background job.
 
     Returns:
-        dict: A dictionary containing the result of deleting the user.
+        str: A message indicating the success of the deletion, or
+        dict: The ID of the background job when background is True.
     """
     try:
         await get_user_by_id(user_id)
-        revenues_user = await db_functions.get_all_by_user_id(user_id, collection_name="revenues")
-        expense_user = await db_functions.get_all_by_user_id(user_id, collection_name="expenses")
-        for revenue in revenues_user:
-            await db_functions.delete(revenue['id'], collection_name="revenues")
-        for expense in expense_user:
-            await db_functions.delete(expense['id'], collection_name="expenses")
-        return await db_functions.delete(user_id, collection_name="users")
+        if background:
+            result = await db_functions.delete(user_id, collection_name="users")
+            await user_cache.invalidate(user_id)
+            job_id = await job_service.start_job("delete_user", _delete_user_data(user_id))
+            return {"message": result, "job_id": job_id}
+        async with db_functions.transaction() as session:
+            await _delete_user_data(user_id, session=session)
+            result = await db_functions.delete(user_id, collection_name="users", session=session)
+        await user_cache.invalidate(user_id)
+        return result
     except ValueError as ve:
         raise ve
     except Exception as e:
@@ -0,0 +1,42 @@
+import datetime
+import os
+
+# Run the service tests against the in-memory repository with cheap password hashing unless a
+# backend is chosen explicitly (REPOSITORY_BACKEND=motor runs them against a seeded MongoDB).
+os.environ.setdefault('REPOSITORY_BACKEND', 'memory')
+os.environ.setdefault('BCRYPT_ROUNDS', '4')
+
+import pytest_asyncio
+from app.db import db_functions, ledger_store, repository
+from app.services import summary_service, user_cache
+
+
+async def seed():
+    """
+    Stores user 1 with one expense and one revenue, which the service tests expect to exist.
+    """
+    now = datetime.datetime.now()
+    await db_functions.add({"id": 1, "user_name": "seed_user", "password": "", "email": "seed@example.com",
+                            "address": "1 Seed St", "phone": "0000000000", "balance": 1000.0,
+                            "ledger_version": 0}, collection_name="users")
+    expense = {"id": 1, "user_id": 1, "total_expense": 100.0, "date": now, "description_expense": "Seed Expense"}
+    revenue = {"id": 1, "user_id": 1, "total_revenue": 1100.0, "date": now, "description_revenue": "Seed Revenue"}
+    await ledger_store.add(expense, collection_name="expenses")
+    await ledger_store.add(revenue, collection_name="revenues")
+    await summary_service.apply_entry("expenses", expense)
+    await summary_service.apply_entry("revenues", revenue)
+
+
+@pytest_asyncio.fixture(autouse=True)
+async def memory_repository():
+    """
+    Gives every test a freshly seeded in-memory repository and an empty user cache.
+    """
+    if repository.REPOSITORY_BACKEND != "memory":
+        yield None
+        return
+    memory = repository.MemoryRepository()
+    repository.set_repository(memory)
+    await user_cache.clear()
+    await seed()
+    yield memory
@@ -0,0 +1,104 @@
+import datetime
+import pytest
+from app.db import db_functions, ledger_store
+from app.models.expense import Expense
+from app.services import expense_service
+from app.visualization import chart_cache
+from app.visualization.graph_router import _chart_response
+
+
+@pytest.fixture(autouse=True)
+def empty_chart_cache():
+    chart_cache.cache.clear()
+    yield
+    chart_cache.cache.clear()
+
+
+def counting_render(calls):
+    async def render(user_id, chart_format):
+        calls.append((user_id, chart_format))
+        return f"chart {len(calls)}".encode('utf-8')
+    return render
+
+
+async def create_expense(total):
+    await expense_service.create_expense(1, Expense(id=0, user_id=1, total_expense=total, date=datetime.datetime.now(),
+                                                    description_expense="Chart Expense"))
+
+
+@pytest.mark.asyncio
+async def test_get_or_render_hit_and_miss():
+    """
+    Test that a chart is rendered once per key and served from the cache afterwards.
+    """
+    calls = []
+    render = counting_render(calls)
+    key = await chart_cache.chart_key('bar', 1, 'png')
+    hits = chart_cache.chart_cache_hits.value()
+    assert await chart_cache.get_or_render(key, render, 1, 'png') == b"chart 1"
+    assert await chart_cache.get_or_render(key, render, 1, 'png') == b"chart 1"
+    assert len(calls) == 1
+    assert chart_cache.chart_cache_hits.value() == hits + 1
+    svg_key = await chart_cache.chart_key('bar', 1, 'svg')
+    assert await chart_cache.get_or_render(svg_key, render, 1, 'svg') == b"chart 2"
+
+
+@pytest.mark.asyncio
+async def test_chart_key_changes_after_write():
+    """
+    Test that writing an expense moves the user's charts to a new key, so the cached chart is not served.
+    """
+    calls = []
+    render = counting_render(calls)
+    before = await chart_cache.chart_key('bar', 1, 'png')
+    await chart_cache.get_or_render(before, render, 1, 'png')
+    await create_expense(5.0)
+    after = await chart_cache.chart_key('bar', 1, 'png')
+    assert after != before
+    assert chart_cache.chart_etag(after) != chart_cache.chart_etag(before)
+    assert await chart_cache.get_or_render(after, render, 1, 'png') == b"chart 2"
+
+
+@pytest.mark.asyncio
+async def test_ledger_version_bumped_after_data_is_written(monkeypatch):
+    """
+    Test that a chart key built while an expense is being written never pairs the new version with old data.
+    """
+    inc_balance = db_functions.inc_balance
+    seen = {}
+
+    async def observing_inc_balance(user_id, delta, session=None, reason=None):
+        seen["expense"] = await ledger_store.get_by_id(reason["id"], collection_name="expenses")
+        seen["version"] = await chart_cache.get_ledger_version(user_id)
+        return await inc_balance(user_id, delta, session=session, reason=reason)
+
+    monkeypatch.setattr(db_functions, "inc_balance", observing_inc_balance)
+    version = await chart_cache.get_ledger_version(1)
+    await create_expense(7.0)
+    assert seen["expense"]["total_expense"] == 7.0
+    assert seen["version"] == version
+    assert await chart_cache.get_ledger_version(1) == version + 1
+
+
+@pytest.mark.asyncio
+async def test_chart_response_etag_and_not_modified():
+    """
+    Test that a chart carries an ETag and a matching If-None-Match is answered with 304 without rendering.
+    """
+    calls = []
+    render = counting_render(calls)
+    response = await _chart_response('bar', render, 1, 'png', None)
+    assert response.status_code == 200
+    assert response.body == b"chart 1"
+    etag = response.headers['ETag']
+
+    not_modified = await _chart_response('bar', render, 1, 'png', f'"other", {etag}')
+    assert not_modified.status_code == 304
+    assert not_modified.headers['ETag'] == etag
+    assert len(calls) == 1
+
+    await create_expense(3.0)
+    changed = await _chart_response('bar', render, 1, 'png', etag)
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert len(calls) == 2
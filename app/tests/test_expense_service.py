@@ -0,0 +1,173 @@
+
+import asyncio
+import pytest
+from app.db import db_functions
+from app.services import expense_service, summary_service
+from app.services import user_service
+from app.models.expense import Expense
+from app.models.user import User
+import datetime
+
+
+@pytest.mark.asyncio
+async def test_get_expense_by_id():
+    """
+    Test retrieving an expense by its ID.
+    """
+    expense_id = 1
+    result = await expense_service.get_expense_by_id(expense_id)
+    assert result is not None
+    assert isinstance(result, dict)
+    assert result["id"] == expense_id
+
+
+@pytest.mark.asyncio
+async def test_get_all_expenses_by_user_id():
+    """
+    Test retrieving all expenses associated with a user by their ID.
+    """
+    user_id = 1
+    result = await expense_service.get_all_expenses_by_user_id(user_id)
+    assert result is not None
+    assert isinstance(result, list)
+
+
+@pytest.mark.asyncio
+async def test_create_expense():
+    """
+    Test creating a new expense.
+    """
+    user_id = 1
+    # Creating a new expense object
+    new_expense = Expense(
+        id=1,
+        user_id=user_id,
+        total_expense=100.0,
+        date=datetime.datetime.now(),
+        description_expense="Test Expense"
+    )
+    # Calling the create_expense function
+    result = await expense_service.create_expense(user_id, new_expense)
+    assert result is not None
+    assert isinstance(result, dict)
+
+
+@pytest.mark.asyncio
+async def test_update_expense():
+    """
+    Test updating an existing expense.
+    """
+    # Step 1: Creating a test user
+    user_id = 1
+    test_user = User(
+        id=user_id,
+        user_name="Test User in expense",
+        password="Test!7777777",
+        email="testuser@example.com",
+        address="test_user address",
+        phone="1234567890",
+        balance=1000.0,
+    )
+    await user_service.create_user(test_user)
+
+    # Step 2: Creating an initial expense
+    expense_id = 1
+    initial_expense = Expense(
+        id=expense_id,
+        user_id=user_id,
+        total_expense=50.0,
+        date=datetime.datetime.now(),
+        description_expense="Test Expense initial"
+    )
+    await expense_service.create_expense(user_id, initial_expense)
+
+    # Step 3: Updating the expense
+    updated_expense = Expense(
+        id=expense_id,
+        user_id=user_id,
+        total_expense=150.0,
+        date=datetime.datetime.now(),
+        description_expense="Test Expense updated"
+    )
+    # Calling the update_expense function
+    result = await expense_service.update_expense(expense_id, updated_expense)
+    assert result is not None
+    assert isinstance(result, dict)
+    assert result["total_expense"] == updated_expense.total_expense
+
+
+@pytest.mark.asyncio
+async def test_delete_expense():
+    """
+    Test deleting an expense by its ID.
+    """
+    expense_id = 1
+    # Calling the delete_expense function
+    result = await expense_service.delete_expense(expense_id)
+    assert result is not None
+
+
+@pytest.mark.asyncio
+async def test_update_expense_returns_updated_document_and_adjusts_balance():
+    """
+    Test that updating an expense returns the updated document and moves the balance by the difference.
+    """
+    updated_expense = Expense(
+        id=1,
+        user_id=1,
+        total_expense=150.0,
+        date=datetime.datetime.now(),
+        description_expense="Seed Expense updated"
+    )
+    result = await expense_service.update_expense(1, updated_expense)
+    assert result["id"] == 1
+    assert result["total_expense"] == 150.0
+    assert result["description_expense"] == "Seed Expense updated"
+    assert (await expense_service.get_expense_by_id(1))["total_expense"] == 150.0
+    assert (await user_service.get_user_by_id(1))["balance"] == 950.0
+
+
+@pytest.mark.asyncio
+async def test_update_returns_requested_image():
+    """
+    Test that db_functions.update returns the pre- or post-image in the same round trip, and None for a missing ID.
+    """
+    before = await db_functions.update({"id": 1, "total_expense": 20.0}, collection_name="expenses",
+                                       return_document="before")
+    assert before["total_expense"] == 100.0
+    after = await db_functions.update({"id": 1, "total_expense": 30.0}, collection_name="expenses",
+                                      return_document="after")
+    assert after["total_expense"] == 30.0
+    assert after["description_expense"] == "Seed Expense"
+    assert await db_functions.update({"id": 99, "total_expense": 1.0}, collection_name="expenses",
+                                     return_document="after") is None
+
+
+@pytest.mark.asyncio
+async def test_update_expense_to_unknown_user_changes_nothing():
+    """
+    Test that moving an expense to a user that does not exist fails before anything is written.
+    """
+    moved_expense = Expense(id=1, user_id=99, total_expense=150.0, date=datetime.datetime.now(),
+                            description_expense="Moved Expense")
+    with pytest.raises(ValueError, match="User not found"):
+        await expense_service.update_expense(1, moved_expense)
+    expense = await expense_service.get_expense_by_id(1)
+    assert (expense["user_id"], expense["total_expense"]) == (1, 100.0)
+    assert (await user_service.get_user_by_id(1))["balance"] == 1000.0
+    assert (await summary_service.get_summary(1))["total_expense"] == 100.0
+
+
+@pytest.mark.asyncio
+async def test_concurrent_deletes_refund_the_expense_once():
+    """
+    Test that two concurrent deletes of the same expense refund it once and the second one reports it missing.
+    """
+    results = await asyncio.gather(expense_service.delete_expense(1), expense_service.delete_expense(1),
+                                   return_exceptions=True)
+    assert sum(isinstance(result, str) for result in results) == 1
+    errors = [result for result in results if isinstance(result, Exception)]
+    assert len(errors) == 1 and isinstance(errors[0], ValueError) and str(errors[0]) == "Expense not found"
+    assert (await user_service.get_user_by_id(1))["balance"] == 1100.0
+    summary = await summary_service.get_summary(1)
+    assert (summary["total_expense"], summary["expense_count"]) == (0, 0)
@@ -0,0 +1,56 @@
+import csv
+import datetime
+import io
+import httpx
+import orjson
+import pytest
+from app.db import ledger_store
+from app.main import app
+from app.services import export_service
+
+
+async def collect(chunks):
+    return b"".join([chunk async for chunk in chunks])
+
+
+@pytest.mark.asyncio
+async def test_export_user_collection_csv():
+    """
+    Test streaming a user's revenues as CSV, one chunk per batch.
+    """
+    await ledger_store.add({"id": 2, "user_id": 1, "total_revenue": 50.0, "date": datetime.datetime(2024, 1, 2),
+                            "description_revenue": "Second Revenue"}, collection_name="revenues")
+    chunks = [chunk async for chunk in export_service.export_user_collection(1, "revenues", "csv", batch_size=1)]
+    assert len(chunks) == 3
+    rows = list(csv.DictReader(io.StringIO(b"".join(chunks).decode('utf-8'))))
+    assert [row["id"] for row in rows] == ["1", "2"]
+    assert rows[1] == {"id": "2", "user_id": "1", "total_revenue": "50.0", "date": "2024-01-02T00:00:00",
+                       "description_revenue": "Second Revenue"}
+
+
+@pytest.mark.asyncio
+async def test_export_user_ledger_ndjson():
+    """
+    Test streaming a user's expenses and revenues as one NDJSON ledger ordered by date with signed amounts.
+    """
+    await ledger_store.add({"id": 2, "user_id": 1, "total_expense": 5.0, "date": datetime.datetime(2024, 1, 2),
+                            "description_expense": "Old Expense"}, collection_name="expenses")
+    body = await collect(export_service.export_user_ledger(1))
+    rows = [orjson.loads(line) for line in body.splitlines()]
+    assert [(row["kind"], row["id"], row["amount"]) for row in rows] == [
+        ("expense", 2, -5.0), ("expense", 1, -100.0), ("revenue", 1, 1100.0)]
+    assert rows[0]["date"] == "2024-01-02T00:00:00"
+    assert set(rows[0]) == set(export_service.LEDGER_FIELDS)
+
+
+@pytest.mark.asyncio
+async def test_export_endpoints_reject_unknown_user():
+    """
+    Test that every export endpoint answers 400 for a user that does not exist instead of an empty file.
+    """
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        for path in ("/expense/user/{}/export", "/revenue/user/{}/export", "/user/{}/ledger/export"):
+            response = await client.get(path.format(99), params={"format": "csv"})
+            assert response.status_code == 400
+            assert response.json()["detail"] == "User not found"
+            assert (await client.get(path.format(1))).status_code == 200
@@ -0,0 +1,21 @@
+import datetime
+import pytest
+from app.db import ledger_store
+from app.visualization import graph_functions
+
+
+@pytest.mark.asyncio
+async def test_get_daily_totals():
+    """
+    Test summing a user's expenses per day, ordered by day and ignoring other users.
+    """
+    for expense_id, user_id, total, date in ((2, 1, 10.0, datetime.datetime(2024, 3, 2, 18)),
+                                             (3, 1, 5.5, datetime.datetime(2024, 3, 1, 9)),
+                                             (4, 1, 4.5, datetime.datetime(2024, 3, 1, 23)),
+                                             (5, 2, 99.0, datetime.datetime(2024, 3, 1, 12))):
+        await ledger_store.add({"id": expense_id, "user_id": user_id, "total_expense": total, "date": date,
+                                "description_expense": "Daily Expense"}, collection_name="expenses")
+    days, totals = await graph_functions.get_daily_totals(1, "expenses", "total_expense")
+    assert days[:2] == [datetime.date(2024, 3, 1), datetime.date(2024, 3, 2)]
+    assert totals[:2] == [10.0, 10.0]
+    assert days[2] == datetime.date.today() and totals[2] == 100.0
@@ -0,0 +1,40 @@
+import pytest
+from app.db import db_functions, id_allocator
+from app.db.id_allocator import COUNTERS_COLLECTION
+
+
+@pytest.mark.asyncio
+async def test_next_id_seeds_missing_counter():
+    """
+    Test that the first allocation continues after the highest existing ID when no counter exists yet.
+    """
+    await db_functions.add({"id": 41, "user_id": 1, "total_expense": 1.0}, collection_name="expenses")
+    assert await id_allocator.next_id("expenses") == 42
+    assert await id_allocator.next_id("expenses") == 43
+
+
+@pytest.mark.asyncio
+async def test_seed_counter_never_moves_backwards():
+    """
+    Test that seeding an existing counter keeps the IDs already handed out.
+    """
+    first_id = await id_allocator.reserve_ids("users", 10)
+    await id_allocator.seed_counter("users")
+    assert await id_allocator.reserve_ids("users") == first_id + 10
+
+
+@pytest.mark.asyncio
+async def test_next_id_across_block_boundaries(monkeypatch):
+    """
+    Test that block allocation hands out consecutive IDs and reserves a new block when one runs out.
+    """
+    monkeypatch.setattr(id_allocator, "ID_BLOCK_SIZE", 3)
+    monkeypatch.setattr(id_allocator, "_reserved_blocks", {})
+    ids = [await id_allocator.next_id("revenues") for _ in range(7)]
+    assert ids == list(range(2, 9))
+    counter = await db_functions.find_one({"_id": "revenues"}, collection_name=COUNTERS_COLLECTION)
+    assert counter["seq"] == 1 + 3 * 3
+
+    # Another process starts with an empty block and never reuses the IDs reserved above.
+    monkeypatch.setattr(id_allocator, "_reserved_blocks", {})
+    assert await id_allocator.next_id("revenues") == 11
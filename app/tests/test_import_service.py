@@ -0,0 +1,147 @@
+import asyncio
+import io
+import pytest
+from app.db import ledger_store
+from app.services import import_service, job_service, user_service
+
+MIXED_CSV = """date,description,amount
+2024-01-01,Coffee,-3.5
+2024-01-01,Salary,100
+2024-01-02,bad,abc
+not-a-date,Broken date,-1
+2024-01-03,Zero,0
+2024-01-01,Coffee,-3.5
+2024-01-04,Groceries,"-1,020.00"
+"""
+
+MIXED_OFX = """OFXHEADER:100
+<OFX>
+<BANKTRANLIST>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20240105120000
+<TRNAMT>-12.00
+<NAME>Books
+</STMTTRN>
+<STMTTRN>
+<TRNTYPE>CREDIT
+<DTPOSTED>20240106
+<TRNAMT>12x
+<NAME>Bad amount
+</STMTTRN>
+<STMTTRN>
+<TRNTYPE>CREDIT
+<DTPOSTED>20240107
+<TRNAMT>50.00
+<MEMO>Refund
+</STMTTRN>
+</BANKTRANLIST>
+</OFX>
+"""
+
+
+async def balance(user_id):
+    return (await user_service.get_user_by_id(user_id))["balance"]
+
+
+@pytest.mark.asyncio
+async def test_import_csv_skips_invalid_rows():
+    """
+    Test that invalid rows of a CSV statement are counted and reported while the rest of the file is imported.
+    """
+    stats = await import_service.import_statement(1, io.StringIO(MIXED_CSV), "csv", batch_size=2)
+    assert {key: value for key, value in stats.items() if key != "errors"} == {
+        "rows": 7, "expenses": 2, "revenues": 1, "duplicates": 1, "invalid": 3}
+    assert [error["row"] for error in stats["errors"]] == [4, 5, 6]
+    assert "Invalid amount" in stats["errors"][0]["error"]
+    assert await balance(1) == 1000 - 3.5 + 100 - 1020
+    expenses = await ledger_store.get_all_by_user_id(1, "expenses")
+    assert sorted(expense["description_expense"] for expense in expenses) == ["Coffee", "Groceries", "Seed Expense"]
+
+
+@pytest.mark.asyncio
+async def test_import_csv_debit_and_credit_columns():
+    """
+    Test a CSV statement with separate debit and credit columns.
+    """
+    statement = "Date,Memo,Debit,Credit\n02/01/2024,Rent,500,\n03/01/2024,Bonus,,75\n04/01/2024,Empty,,\n"
+    stats = await import_service.import_statement(1, io.StringIO(statement), "csv")
+    assert (stats["expenses"], stats["revenues"], stats["invalid"]) == (1, 1, 1)
+    assert await balance(1) == 1000 - 500 + 75
+
+
+@pytest.mark.asyncio
+async def test_import_ofx_skips_invalid_transactions():
+    """
+    Test that an OFX transaction with an invalid amount is reported while the others are imported.
+    """
+    stats = await import_service.import_statement(1, io.StringIO(MIXED_OFX), "ofx", batch_size=1)
+    assert (stats["rows"], stats["expenses"], stats["revenues"], stats["invalid"]) == (3, 1, 1, 1)
+    assert stats["errors"][0]["row"] == 2
+    assert await balance(1) == 1000 - 12 + 50
+
+
+@pytest.mark.asyncio
+async def test_import_skips_rows_already_imported():
+    """
+    Test that importing the same statement twice only creates its records once.
+    """
+    await import_service.import_statement(1, io.StringIO(MIXED_CSV), "csv")
+    stats = await import_service.import_statement(1, io.StringIO(MIXED_CSV), "csv")
+    assert (stats["expenses"], stats["revenues"], stats["duplicates"], stats["invalid"]) == (0, 0, 4, 3)
+    assert await balance(1) == 1000 - 3.5 + 100 - 1020
+
+
+@pytest.mark.asyncio
+async def test_import_dedup_reads_only_the_batch_dates(monkeypatch):
+    """
+    Test that the duplicate lookup of a batch spanning years reads only records on the batch's own dates.
+    """
+    history = "".join(f"2020-{month:02d}-{day:02d},Old {month}-{day},-1\n" for month in range(1, 13)
+                      for day in (1, 15))
+    await import_service.import_statement(1, io.StringIO("date,description,amount\n" + history), "csv")
+    iter_by_user_id = ledger_store.iter_by_user_id
+    read = []
+
+    async def counting_iter_by_user_id(*args, **kwargs):
+        async for document in iter_by_user_id(*args, **kwargs):
+            read.append(document)
+            yield document
+
+    monkeypatch.setattr(ledger_store, "iter_by_user_id", counting_iter_by_user_id)
+    statement = "date,description,amount\n2019-06-01,Before,-2\n2020-06-15,Old 6-15,-1\n2024-06-01,After,-2\n"
+    stats = await import_service.import_statement(1, io.StringIO(statement), "csv")
+    assert (stats["expenses"], stats["duplicates"]) == (2, 1)
+    assert len(read) == 1
+
+
+@pytest.mark.asyncio
+async def test_start_import_reports_progress_and_result(monkeypatch):
+    """
+    Test that an uploaded statement is imported by a job reporting its counters after each batch.
+    """
+    monkeypatch.setattr(import_service, "IMPORT_BATCH_SIZE", 2)
+    set_progress = job_service.set_progress
+    progress = []
+
+    async def recording_set_progress(job_id, stats):
+        progress.append({key: value for key, value in stats.items() if key != "errors"})
+        await set_progress(job_id, stats)
+
+    monkeypatch.setattr(job_service, "set_progress", recording_set_progress)
+
+    async def upload():
+        data = MIXED_CSV.encode('utf-8')
+        for start in range(0, len(data), 16):
+            yield data[start:start + 16]
+
+    job_id = await import_service.start_import(1, upload(), "csv")
+    assert (await job_service.get_job(job_id))["status"] == "running"
+    await asyncio.gather(*job_service._running_tasks)
+
+    job = await job_service.get_job(job_id)
+    assert job["status"] == "completed"
+    assert job["result"]["rows"] == 7
+    assert (job["result"]["expenses"], job["result"]["revenues"], job["result"]["duplicates"]) == (2, 1, 1)
+    assert [snapshot["rows"] for snapshot in progress] == [2, 7]
+    assert progress[0]["expenses"] + progress[0]["revenues"] == 2
@@ -0,0 +1,115 @@
+import asyncio
+import datetime
+import pytest
+from app.db import db_functions
+from app.models.expense import Expense
+from app.models.revenue import Revenue
+from app.models.user import User
+from app.services import expense_service, job_service, ledger_service, revenue_service, user_service
+
+
+async def write_entries():
+    """
+    Records user 1's seeded balance as the opening snapshot and changes it three times.
+    """
+    await ledger_service.write_snapshot(1, 0, 1000.0)
+    now = datetime.datetime.now()
+    await expense_service.create_expense(1, Expense(id=0, user_id=1, total_expense=30.0, date=now,
+                                                    description_expense="Ledger Expense"))
+    await revenue_service.create_revenue(1, Revenue(id=0, user_id=1, total_revenue=80.0, date=now,
+                                                    description_revenue="Ledger Revenue"))
+    await expense_service.delete_expense(1)
+
+
+@pytest.mark.asyncio
+async def test_balance_changes_are_recorded_in_the_ledger():
+    """
+    Test that every balance change appends an event, so the balance rebuilt from the ledger matches.
+    """
+    await write_entries()
+    result = await ledger_service.check_balance(1)
+    assert result["version"] == 3
+    assert result["events_replayed"] == 3
+    assert result["stored_balance"] == result["ledger_balance"] == 1000.0 - 30 + 80 + 100
+    assert result["consistent"]
+
+
+@pytest.mark.asyncio
+async def test_reconciliation_job_repairs_drifted_balance():
+    """
+    Test that the reconciliation job reports and repairs a balance that no longer matches the ledger.
+    """
+    await write_entries()
+    await db_functions.update_by_query({"id": 1}, {"balance": 5.0}, collection_name="users")
+    assert not (await ledger_service.check_balance(1))["consistent"]
+
+    job_id = await ledger_service.start_reconciliation(fix=True)
+    assert (await job_service.get_job(job_id))["status"] == "running"
+    await asyncio.gather(*job_service._running_tasks)
+    job = await job_service.get_job(job_id)
+    assert job["status"] == "completed"
+    assert {key: job["result"][key] for key in ("checked", "mismatched", "fixed", "missing_events")} == {
+        "checked": 1, "mismatched": 1, "fixed": 1, "missing_events": 0}
+    assert job["result"]["mismatches"][0]["stored_balance"] == 5.0
+    assert job["progress"]["checked"] == 1
+    assert (await ledger_service.check_balance(1))["stored_balance"] == 1150.0
+
+
+@pytest.mark.asyncio
+async def test_reconcile_snapshots_long_ledgers(monkeypatch):
+    """
+    Test that reconciling writes a snapshot once the replayed tail is long enough, so later checks replay nothing.
+    """
+    monkeypatch.setattr(ledger_service, "LEDGER_SNAPSHOT_INTERVAL", 2)
+    await write_entries()
+    stats = await ledger_service.reconcile()
+    assert (stats["snapshots"], stats["mismatched"]) == (1, 0)
+    result = await ledger_service.check_balance(1)
+    assert (result["snapshot_version"], result["events_replayed"]) == (3, 0)
+    assert result["consistent"]
+
+
+@pytest.mark.asyncio
+async def test_reconcile_reports_missing_events_without_fixing():
+    """
+    Test that a user whose ledger has a gap is reported but their balance is left alone.
+    """
+    await write_entries()
+    await db_functions.delete_many({"user_id": 1, "version": 2}, collection_name=db_functions.LEDGER_EVENTS_COLLECTION)
+    stats = await ledger_service.reconcile(fix=True)
+    assert (stats["missing_events"], stats["mismatched"], stats["fixed"]) == (1, 1, 0)
+    assert (await ledger_service.check_balance(1))["stored_balance"] == 1150.0
+
+
+@pytest.mark.asyncio
+async def test_reconcile_never_zeroes_a_user_without_baseline():
+    """
+    Test that a user whose balance predates the ledger (no snapshot) is reported and their balance kept.
+    """
+    await expense_service.create_expense(1, Expense(id=0, user_id=1, total_expense=30.0,
+                                                    date=datetime.datetime.now(),
+                                                    description_expense="Ledger Expense"))
+    result = await ledger_service.check_balance(1)
+    assert result["missing_baseline"]
+    assert not result["consistent"]
+
+    stats = await ledger_service.reconcile(fix=True)
+    assert (stats["missing_baseline"], stats["mismatched"], stats["fixed"]) == (1, 1, 0)
+    assert (await ledger_service.check_balance(1))["stored_balance"] == 970.0
+
+
+@pytest.mark.asyncio
+async def test_new_users_start_with_an_opening_snapshot():
+    """
+    Test that a user created through the service can be reconciled without a separate snapshot migration.
+    """
+    await user_service.create_user(User(id=0, user_name="ledger_user", password="Password1!",
+                                        email="ledger@example.com", address="1 Ledger St", phone="0501234567",
+                                        balance=0.0))
+    user = await db_functions.get_by_field("user_name", "ledger_user", "users")
+    await revenue_service.create_revenue(user["id"], Revenue(id=0, user_id=user["id"], total_revenue=80.0,
+                                                             date=datetime.datetime.now(),
+                                                             description_revenue="Ledger Revenue"))
+    result = await ledger_service.check_balance(user["id"])
+    assert (result["snapshot_version"], result["missing_baseline"]) == (0, False)
+    assert result["consistent"] and result["ledger_balance"] == 80.0
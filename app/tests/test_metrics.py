@@ -0,0 +1,43 @@
+import re
+import httpx
+import pytest
+from app.db import db_metrics, id_allocator
+from app.main import app
+
+SERVER_TIMING = re.compile(r'db;dur=[0-9.]+;desc="(\d+) ops, (\d+) bytes", app;dur=[0-9.]+')
+
+
+@pytest.mark.asyncio
+async def test_cold_counter_reservation_counts_each_call_once():
+    """
+    Test that reserving an ID from an unseeded counter counts each database call once, with no outer operation.
+    """
+    stats = db_metrics.start_request()
+    assert await id_allocator.reserve_ids("expenses") == 2
+    # The missed $inc, the highest-ID lookup, the $max seeding and the upserting $inc.
+    assert stats.operations == 4
+    assert await id_allocator.reserve_ids("expenses") == 3
+    assert stats.operations == 5
+
+
+@pytest.mark.asyncio
+async def test_server_timing_header_and_metrics_endpoint():
+    """
+    Test that responses report their database work in Server-Timing and that /metrics exposes the counters.
+    """
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/expense/1")
+        assert response.status_code == 200
+        timing = SERVER_TIMING.fullmatch(response.headers["server-timing"])
+        assert timing is not None
+        assert int(timing.group(1)) >= 1 and int(timing.group(2)) > 0
+
+        metrics = await client.get("/metrics")
+    assert metrics.status_code == 200
+    assert metrics.headers["content-type"].startswith("text/plain")
+    lines = metrics.text.splitlines()
+    assert "# TYPE db_operations_total counter" in lines
+    assert any(line.startswith('db_operations_total{collection="expenses",operation="get_by_id"} ')
+               for line in lines)
+    assert any(line.startswith('http_requests_total{method="GET",status="200"} ') for line in lines)
+    assert any(line.startswith('http_request_seconds_bucket{method="GET",le="+Inf"} ') for line in lines)
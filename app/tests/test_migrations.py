@@ -0,0 +1,72 @@
+import datetime
+import pytest
+from app.db import db_functions, ledger_store, migrations
+from app.models.expense import Expense
+from app.services import expense_service, summary_service
+from app.services.summary_service import MONTHLY_SUMMARIES_COLLECTION
+
+
+@pytest.mark.asyncio
+async def test_migrate_transactions_with_concurrent_update_and_delete(memory_repository, monkeypatch):
+    """
+    Test that an update and a delete made in dual mode while the backfill is copying a batch
+    end up in the transactions collection instead of the stale copy the backfill read.
+    """
+    now = datetime.datetime.now()
+    for expense_id in (2, 3, 4):
+        await ledger_store.add({"id": expense_id, "user_id": 1, "total_expense": 10.0 * expense_id, "date": now,
+                                "description_expense": f"Expense {expense_id}"}, collection_name="expenses")
+    monkeypatch.setattr(ledger_store, "LEDGER_STORAGE", "dual")
+
+    insert_missing = memory_repository.insert_missing
+    interleaved = []
+
+    async def insert_missing_after_writes(collection_name, documents, key_fields, session=None):
+        # The batch has been read from the expenses collection; write before it is copied.
+        if not interleaved:
+            interleaved.append(True)
+            await expense_service.update_expense(2, Expense(id=2, user_id=1, total_expense=25.0, date=now,
+                                                            description_expense="Updated Expense"))
+            await expense_service.delete_expense(3)
+        return await insert_missing(collection_name, documents, key_fields, session=session)
+
+    monkeypatch.setattr(memory_repository, "insert_missing", insert_missing_after_writes)
+    copied = await migrations.migrate_transactions(batch_size=10)
+
+    assert interleaved
+    # Expense 2 was already upserted by its update, and expense 3 was copied and then removed.
+    assert copied == {"expenses": 3, "revenues": 1}
+    monkeypatch.setattr(ledger_store, "LEDGER_STORAGE", "unified")
+    updated = await ledger_store.get_by_id(2, "expenses")
+    assert updated["total_expense"] == 25.0
+    assert updated["description_expense"] == "Updated Expense"
+    deleted = await memory_repository.find_one(ledger_store.TRANSACTIONS_COLLECTION, {"kind": "expense", "id": 3})
+    assert deleted is None
+    assert await memory_repository.find_one(ledger_store.TOMBSTONES_COLLECTION, {}) is None
+    report = await migrations.verify_transactions()
+    assert all(collection["consistent"] for collection in report.values())
+    assert report["expenses"]["count"] == 3
+
+
+@pytest.mark.asyncio
+async def test_rebuild_monthly_summaries_overwrites_in_place():
+    """
+    Test that rebuilding fixes drifted summaries, removes months without entries and keeps other users' summaries.
+    """
+    now = datetime.datetime.now()
+    month = {"user_id": 1, "year": now.year, "month": now.month}
+    await db_functions.update_by_query(month, {"total_expense": 999.0, "expense_count": 7},
+                                       collection_name=MONTHLY_SUMMARIES_COLLECTION)
+    await db_functions.add({"user_id": 1, "year": 2000, "month": 1, "total_expense": 5.0, "total_revenue": 0,
+                            "expense_count": 1, "revenue_count": 0}, collection_name=MONTHLY_SUMMARIES_COLLECTION)
+    await db_functions.add({"user_id": 2, "year": 2000, "month": 1, "total_expense": 5.0, "total_revenue": 0,
+                            "expense_count": 1, "revenue_count": 0}, collection_name=MONTHLY_SUMMARIES_COLLECTION)
+
+    assert await migrations.rebuild_monthly_summaries(user_id=1) == 1
+    summary = await summary_service.get_summary(1)
+    assert (summary["total_expense"], summary["expense_count"]) == (100.0, 1)
+    assert (summary["total_revenue"], summary["revenue_count"]) == (1100.0, 1)
+    assert await summary_service.get_summary(1, 2000, 1) == {
+        "user_id": 1, "year": 2000, "month": 1, "total_expense": 0, "total_revenue": 0,
+        "expense_count": 0, "revenue_count": 0, "net": 0}
+    assert (await summary_service.get_summary(2, 2000, 1))["total_expense"] == 5.0
@@ -0,0 +1,161 @@
+import asyncio
+import pytest
+import pytest_asyncio
+from app.db import db_connector, repository
+
+# A scratch collection, dropped before and after every test on MongoDB.
+COLLECTION = "repository_contract"
+
+DOCUMENTS = [
+    {"id": 1, "user_id": 1, "amount": 10.0},
+    {"id": 2, "user_id": 2, "amount": 20.0},
+    {"id": 3, "user_id": 1, "amount": 30.0},
+]
+
+
+@pytest_asyncio.fixture(params=["memory", "motor"])
+async def store(request):
+    """
+    Runs each contract test against both backends; the MongoDB one only with REPOSITORY_BACKEND=motor.
+    """
+    if request.param == "memory":
+        yield repository.MemoryRepository()
+        return
+    if repository.REPOSITORY_BACKEND != "motor":
+        pytest.skip("set REPOSITORY_BACKEND=motor to run the contract tests against MongoDB")
+    motor = repository.MotorRepository()
+    await motor.connect()
+    await db_connector.get_db().drop_collection(COLLECTION)
+    yield motor
+    await db_connector.get_db().drop_collection(COLLECTION)
+
+
+async def insert_documents(store):
+    await store.insert_many(COLLECTION, [dict(document) for document in DOCUMENTS])
+
+
+def test_repository_is_abstract():
+    """
+    Test that the base class cannot be used without implementing the storage operations.
+    """
+    with pytest.raises(TypeError):
+        repository.Repository()
+
+
+@pytest.mark.asyncio
+async def test_memory_repository_interleaves_operations():
+    """
+    Test that concurrent read-modify-writes on the memory backend interleave, so lost updates are detectable.
+    """
+    store = repository.MemoryRepository()
+    await store.insert(COLLECTION, {"id": 1, "balance": 0})
+
+    async def unsafe_increment():
+        document = await store.get_by_id(COLLECTION, 1)
+        await store.update(COLLECTION, {"id": 1}, {"balance": document["balance"] + 1})
+
+    await asyncio.gather(unsafe_increment(), unsafe_increment())
+    assert (await store.get_by_id(COLLECTION, 1))["balance"] == 1
+
+
+@pytest.mark.asyncio
+async def test_insert_and_find(store):
+    """
+    Test that inserted documents can be read back by query, ID and user, with projections, sorts and limits.
+    """
+    assert await store.insert_many(COLLECTION, [dict(DOCUMENTS[0]), dict(DOCUMENTS[1])]) == 2
+    assert await store.insert(COLLECTION, dict(DOCUMENTS[2])) is not None
+
+    assert await store.get_by_id(COLLECTION, 2, projection={"_id": 0}) == DOCUMENTS[1]
+    assert await store.find_one(COLLECTION, {"id": 4}) is None
+    assert await store.find_one(COLLECTION, {"amount": {"$gt": 15}}, projection={"_id": 0, "id": 1},
+                                sort=[("id", -1)]) == {"id": 3}
+    found = [document async for document in store.find(COLLECTION, {}, projection={"_id": 0}, sort=[("id", 1)],
+                                                        limit=2)]
+    assert found == DOCUMENTS[:2]
+    by_user = [document["id"] async for document in store.find_by_user(COLLECTION, 1, {"id": {"$gt": 1}})]
+    assert by_user == [3]
+
+
+@pytest.mark.asyncio
+async def test_update(store):
+    """
+    Test that update sets fields, returns the requested image and upserts only when asked to.
+    """
+    await insert_documents(store)
+    assert await store.update(COLLECTION, {"id": 1}, {"amount": 15.0}) is True
+    before = await store.update(COLLECTION, {"id": 1}, {"amount": 16.0}, return_document="before",
+                                projection={"_id": 0})
+    assert before == {"id": 1, "user_id": 1, "amount": 15.0}
+    after = await store.update(COLLECTION, {"id": 1}, {"note": "x"}, return_document="after", projection={"_id": 0})
+    assert after == {"id": 1, "user_id": 1, "amount": 16.0, "note": "x"}
+
+    assert await store.update(COLLECTION, {"id": 4}, {"amount": 1.0}) is False
+    assert await store.update(COLLECTION, {"id": 4}, {"amount": 1.0}, return_document="after") is None
+    upserted = await store.update(COLLECTION, {"id": 4}, {"amount": 1.0}, upsert=True, return_document="after",
+                                  projection={"_id": 0})
+    assert upserted == {"id": 4, "amount": 1.0}
+
+
+@pytest.mark.asyncio
+async def test_inc_and_set_max(store):
+    """
+    Test that inc adds to fields (creating them on upsert) and set_max never lowers a field.
+    """
+    await insert_documents(store)
+    after = await store.inc(COLLECTION, {"id": 2}, {"amount": 5.0}, return_document="after", projection={"_id": 0})
+    assert after["amount"] == 25.0
+    created = await store.inc(COLLECTION, {"id": 5}, {"seq": 3}, upsert=True, return_document="after",
+                              projection={"_id": 0})
+    assert created == {"id": 5, "seq": 3}
+
+    await store.set_max(COLLECTION, {"id": 5}, {"seq": 10})
+    await store.set_max(COLLECTION, {"id": 5}, {"seq": 7})
+    await store.set_max(COLLECTION, {"id": 6}, {"seq": 2}, upsert=True)
+    assert (await store.get_by_id(COLLECTION, 5))["seq"] == 10
+    assert (await store.get_by_id(COLLECTION, 6))["seq"] == 2
+
+
+@pytest.mark.asyncio
+async def test_insert_missing(store):
+    """
+    Test that insert_missing only inserts documents whose key matches nothing and leaves the others as stored.
+    """
+    await insert_documents(store)
+    inserted = await store.insert_missing(COLLECTION, [{"id": 1, "user_id": 1, "amount": 99.0},
+                                                       {"id": 4, "user_id": 1, "amount": 40.0}], ("id", "user_id"))
+    assert inserted == 1
+    assert (await store.get_by_id(COLLECTION, 1))["amount"] == 10.0
+    assert (await store.get_by_id(COLLECTION, 4))["amount"] == 40.0
+    assert await store.insert_missing(COLLECTION, [], ("id",)) == 0
+
+
+@pytest.mark.asyncio
+async def test_delete(store):
+    """
+    Test that delete removes one document (optionally returning it) and delete_many every match.
+    """
+    await insert_documents(store)
+    assert await store.delete(COLLECTION, {"id": 2}) == 1
+    assert await store.delete(COLLECTION, {"id": 2}) == 0
+    deleted = await store.delete(COLLECTION, {"id": 1}, return_document=True, projection={"_id": 0})
+    assert deleted == DOCUMENTS[0]
+    assert await store.delete(COLLECTION, {"id": 1}, return_document=True) is None
+
+    await insert_documents(store)
+    assert await store.delete_many(COLLECTION, {"user_id": 1}) == 3
+    assert [document["id"] async for document in store.find(COLLECTION, {})] == [2]
+
+
+@pytest.mark.asyncio
+async def test_aggregate(store):
+    """
+    Test that aggregate runs the match, group and sort stages the application uses.
+    """
+    await insert_documents(store)
+    totals = await store.aggregate(COLLECTION, [
+        {"$match": {"amount": {"$gte": 10}}},
+        {"$group": {"_id": "$user_id", "total": {"$sum": "$amount"}, "count": {"$sum": 1}}},
+        {"$sort": {"_id": 1}},
+    ])
+    assert totals == [{"_id": 1, "total": 40.0, "count": 2}, {"_id": 2, "total": 20.0, "count": 1}]
@@ -1,7 +1,9 @@
+import asyncio
 import pytest
 from app.models.user import User
-from app.services import revenue_service, user_service
+from app.services import revenue_service, summary_service, user_service
 from app.models.revenue import Revenue
+from app.utils import next_cursor
 import datetime
 
 
@@ -28,6 +30,26 @@ async def test_get_all_revenues_by_user_id():
     assert isinstance(result, list)
 
 
+@pytest.mark.asyncio
+async def test_get_all_revenues_by_user_id_paginated():
+    """
+    Test paging through a user's revenues by ID and returning only the requested fields.
+    """
+    user_id = 1
+    for total in (10.0, 20.0, 30.0):
+        await revenue_service.create_revenue(user_id, Revenue(id=0, user_id=user_id, total_revenue=total,
+                                                              date=datetime.datetime.now(),
+                                                              description_revenue="Paged Revenue"))
+    first_page = await revenue_service.get_all_revenues_by_user_id(user_id, limit=2)
+    assert [revenue["id"] for revenue in first_page] == [1, 2]
+    assert next_cursor(first_page, 2) == 2
+
+    second_page = await revenue_service.get_all_revenues_by_user_id(user_id, limit=2, after=2,
+                                                                     fields=["total_revenue"])
+    assert second_page == [{"id": 3, "total_revenue": 20.0}, {"id": 4, "total_revenue": 30.0}]
+    assert await revenue_service.get_all_revenues_by_user_id(user_id, limit=2, after=4) == []
+
+
 @pytest.mark.asyncio
 async def test_create_revenue():
     """
@@ -61,6 +83,26 @@ async def test_create_revenue():
     assert isinstance(result, dict)
 
 
+@pytest.mark.asyncio
+async def test_create_revenues_batch():
+    """
+    Test creating a batch of revenues with one invalid item.
+    """
+    user_id = 1
+    revenue = {
+        "id": 0,
+        "user_id": user_id,
+        "total_revenue": 10.0,
+        "date": datetime.datetime.now().isoformat(),
+        "description_revenue": "Batch Test Revenue"
+    }
+    result = await revenue_service.create_revenues_batch([revenue, {"user_id": user_id}, revenue])
+    assert result["inserted"] == 2
+    assert [item["index"] for item in result["created"]] == [0, 2]
+    assert result["created"][1]["id"] == result["created"][0]["id"] + 1
+    assert [error["index"] for error in result["errors"]] == [1]
+
+
 @pytest.mark.asyncio
 async def test_update_revenue():
     """
@@ -102,7 +144,8 @@ async def test_update_revenue():
     # Call the update_revenue function
     result = await revenue_service.update_revenue(revenue_id, updated_revenue)
     assert result is not None
-    assert isinstance(result, str)
+    assert isinstance(result, dict)
+    assert result["total_revenue"] == updated_revenue.total_revenue
 
 
 @pytest.mark.asyncio
@@ -114,3 +157,33 @@ async def test_delete_revenue():
     # Call the delete_revenue function
     result = await revenue_service.delete_revenue(revenue_id)
     assert result is not None
+
+
+@pytest.mark.asyncio
+async def test_update_revenue_to_unknown_user_changes_nothing():
+    """
+    Test that moving a revenue to a user that does not exist fails before anything is written.
+    """
+    moved_revenue = Revenue(id=1, user_id=99, total_revenue=150.0, date=datetime.datetime.now(),
+                            description_revenue="Moved Revenue")
+    with pytest.raises(ValueError, match="User not found"):
+        await revenue_service.update_revenue(1, moved_revenue)
+    revenue = await revenue_service.get_revenue_by_id(1)
+    assert (revenue["user_id"], revenue["total_revenue"]) == (1, 1100.0)
+    assert (await user_service.get_user_by_id(1))["balance"] == 1000.0
+    assert (await summary_service.get_summary(1))["total_revenue"] == 1100.0
+
+
+@pytest.mark.asyncio
+async def test_concurrent_deletes_take_the_revenue_off_once():
+    """
+    Test that two concurrent deletes of the same revenue take it off the balance once and the second one fails.
+    """
+    results = await asyncio.gather(revenue_service.delete_revenue(1), revenue_service.delete_revenue(1),
+                                   return_exceptions=True)
+    assert sum(isinstance(result, str) for result in results) == 1
+    errors = [result for result in results if isinstance(result, Exception)]
+    assert len(errors) == 1 and isinstance(errors[0], ValueError) and str(errors[0]) == "Revenue not found"
+    assert (await user_service.get_user_by_id(1))["balance"] == -100.0
+    summary = await summary_service.get_summary(1)
+    assert (summary["total_revenue"], summary["revenue_count"]) == (0, 0)
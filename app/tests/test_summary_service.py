@@ -0,0 +1,54 @@
+import datetime
+import pytest
+from app.models.expense import Expense
+from app.models.revenue import Revenue
+from app.services import expense_service, revenue_service, summary_service
+
+
+@pytest.mark.asyncio
+async def test_summaries_follow_creates_updates_and_deletes():
+    """
+    Test that the monthly summaries are kept up to date as expenses and revenues are written.
+    """
+    march = datetime.datetime(2024, 3, 5)
+    await expense_service.create_expense(1, Expense(id=0, user_id=1, total_expense=40.0, date=march,
+                                                    description_expense="March Expense"))
+    revenue = await revenue_service.create_revenue(1, Revenue(id=0, user_id=1, total_revenue=100.0, date=march,
+                                                              description_revenue="March Revenue"))
+    summary = await summary_service.get_summary(1, 2024, 3)
+    assert (summary["total_expense"], summary["expense_count"]) == (40.0, 1)
+    assert (summary["total_revenue"], summary["revenue_count"]) == (100.0, 1)
+    assert summary["net"] == 60.0
+
+    # Updating an expense dates it now, which moves it to the current month.
+    expense_id = (await expense_service.get_all_expenses_by_user_id(1))[-1]["id"]
+    await expense_service.update_expense(expense_id, Expense(id=expense_id, user_id=1, total_expense=25.0, date=march,
+                                                             description_expense="Moved Expense"))
+    summary = await summary_service.get_summary(1, 2024, 3)
+    assert (summary["total_expense"], summary["expense_count"]) == (0, 0)
+    current = await summary_service.get_summary(1)
+    assert (current["total_expense"], current["expense_count"]) == (125.0, 2)
+
+    revenue_id = (await revenue_service.get_all_revenues_by_user_id(1))[-1]["id"]
+    await revenue_service.delete_revenue(revenue_id)
+    summary = await summary_service.get_summary(1, 2024, 3)
+    assert (summary["total_revenue"], summary["revenue_count"]) == (0, 0)
+    assert await summary_service.get_user_totals(1) == (125.0, 1100.0)
+
+
+@pytest.mark.asyncio
+async def test_summaries_fold_batches_per_month():
+    """
+    Test that a batch adds each of its months to the summaries, and that months without entries read as zero.
+    """
+    expense = {"id": 0, "user_id": 1, "description_expense": "Batch Expense"}
+    await expense_service.create_expenses_batch([
+        {**expense, "total_expense": 10.0, "date": "2024-04-01T10:00:00"},
+        {**expense, "total_expense": 15.0, "date": "2024-04-30T10:00:00"},
+        {**expense, "total_expense": 7.0, "date": "2024-05-01T10:00:00"},
+    ])
+    april = await summary_service.get_summary(1, 2024, 4)
+    assert (april["total_expense"], april["expense_count"]) == (25.0, 2)
+    assert (await summary_service.get_summary(1, 2024, 5))["total_expense"] == 7.0
+    empty = await summary_service.get_summary(1, 2023, 1)
+    assert (empty["total_expense"], empty["total_revenue"], empty["net"]) == (0, 0, 0)
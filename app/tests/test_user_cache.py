@@ -0,0 +1,67 @@
+import asyncio
+import datetime
+import pytest
+from app.db import db_functions
+from app.models.revenue import Revenue
+from app.services import revenue_service, user_cache
+
+
+@pytest.mark.asyncio
+async def test_get_user_is_cached_until_invalidated_by_a_write():
+    """
+    Test that a cached user is served without a database read and reloaded after a write to them.
+    """
+    user = await user_cache.get_user(1)
+    hits = user_cache.user_cache_hits.value()
+    assert (await user_cache.get_user(1))["balance"] == user["balance"]
+    assert user_cache.user_cache_hits.value() == hits + 1
+
+    await revenue_service.create_revenue(1, Revenue(id=0, user_id=1, total_revenue=25.0,
+                                                    date=datetime.datetime.now(), description_revenue="Cached"))
+    assert (await user_cache.get_user(1))["balance"] == user["balance"] + 25.0
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_read(monkeypatch):
+    """
+    Test that concurrent lookups of an uncached user are served by a single database read.
+    """
+    get_by_id = db_functions.get_by_id
+    reads = []
+
+    async def counting_get_by_id(object_id, collection_name, session=None):
+        reads.append(object_id)
+        await asyncio.sleep(0)
+        return await get_by_id(object_id, collection_name, session=session)
+
+    monkeypatch.setattr(db_functions, "get_by_id", counting_get_by_id)
+    users = await asyncio.gather(*(user_cache.get_user(1) for _ in range(10)))
+    assert reads == [1]
+    assert all(user["id"] == 1 for user in users)
+    assert user_cache._pending == {}
+
+
+@pytest.mark.asyncio
+async def test_invalidate_during_load_does_not_cache_stale_user(monkeypatch):
+    """
+    Test that a user invalidated while being loaded is returned but not cached, and no state is kept for them.
+    """
+    get_by_id = db_functions.get_by_id
+    release = asyncio.Event()
+    reads = []
+
+    async def blocking_get_by_id(object_id, collection_name, session=None):
+        reads.append(object_id)
+        user = await get_by_id(object_id, collection_name, session=session)
+        await release.wait()
+        return user
+
+    monkeypatch.setattr(db_functions, "get_by_id", blocking_get_by_id)
+    load = asyncio.ensure_future(user_cache.get_user(1))
+    await asyncio.sleep(0)
+    await user_cache.invalidate(1)
+    release.set()
+    assert (await load)["id"] == 1
+    await user_cache.get_user(1)
+    assert reads == [1, 1]
+    assert user_cache._pending == {}
@@ -1,5 +1,8 @@
+import asyncio
+import datetime
 import pytest
-from app.services import user_service
+from app.db import db_functions, ledger_store
+from app.services import job_service, password_service, summary_service, user_service
 from app.models.user import User
 
 
@@ -67,6 +70,27 @@ async def test_login_user():
     assert result[0]["user_name"] == user_name
 
 
+@pytest.mark.asyncio
+async def test_login_rehashes_password_at_configured_cost(monkeypatch):
+    """
+    Test that logging in with a hash made at another bcrypt cost stores a new hash at the configured cost.
+    """
+    await user_service.create_user(User(id=0, user_name="rehash_user", password="Test1234!",
+                                        email="rehash@example.com", address="1 Hash St", phone="1234567890",
+                                        balance=0.0))
+    old_hash = (await db_functions.get_by_field("user_name", "rehash_user", "users"))["password"]
+    monkeypatch.setattr(password_service, "BCRYPT_ROUNDS", password_service.BCRYPT_ROUNDS + 1)
+
+    await user_service.login_user("rehash_user", "Test1234!")
+    new_hash = (await db_functions.get_by_field("user_name", "rehash_user", "users"))["password"]
+    assert new_hash != old_hash
+    assert not password_service.needs_rehash(new_hash)
+    assert await password_service.verify_password("Test1234!", new_hash)
+
+    await user_service.login_user("rehash_user", "Test1234!")
+    assert (await db_functions.get_by_field("user_name", "rehash_user", "users"))["password"] == new_hash
+
+
 @pytest.mark.asyncio
 async def test_update_user():
     """
@@ -102,3 +126,54 @@ async def test_delete_user():
     result = await user_service.delete_user(user_id)
     assert result is not None
     assert isinstance(result, str)
+
+
+async def add_other_user_data():
+    """
+    Stores user 2 with one expense, which deleting user 1 must leave alone.
+    """
+    await db_functions.add({"id": 2, "user_name": "other_user", "password": "", "email": "other@example.com",
+                            "address": "2 Other St", "phone": "0000000000", "balance": -5.0,
+                            "ledger_version": 0}, collection_name="users")
+    expense = {"id": 2, "user_id": 2, "total_expense": 5.0, "date": datetime.datetime.now(),
+               "description_expense": "Other Expense"}
+    await ledger_store.add(expense, collection_name="expenses")
+    await summary_service.apply_entry("expenses", expense)
+
+
+async def assert_user_data_deleted(user_id):
+    assert await ledger_store.get_all_by_user_id(user_id, "expenses") == []
+    assert await ledger_store.get_all_by_user_id(user_id, "revenues") == []
+    assert await summary_service.get_user_totals(user_id) == (0, 0)
+    assert await db_functions.get_by_field("id", user_id, "users") is None
+    assert [expense["id"] for expense in await ledger_store.get_all_by_user_id(2, "expenses")] == [2]
+    assert await summary_service.get_user_totals(2) == (5.0, 0)
+
+
+@pytest.mark.asyncio
+async def test_delete_user_cascades():
+    """
+    Test that deleting a user also deletes their expenses, revenues and summaries, and only theirs.
+    """
+    await add_other_user_data()
+    await user_service.delete_user(1)
+    await assert_user_data_deleted(1)
+
+
+@pytest.mark.asyncio
+async def test_delete_user_in_background():
+    """
+    Test that a background delete removes the user at once and reports the cascade through its job.
+    """
+    await add_other_user_data()
+    result = await user_service.delete_user(1, background=True)
+    job = await job_service.get_job(result["job_id"])
+    assert job["kind"] == "delete_user"
+    assert job["status"] == "running"
+
+    await asyncio.gather(*job_service._running_tasks)
+    job = await job_service.get_job(result["job_id"])
+    assert job["status"] == "completed"
+    assert job["result"] == {"revenues_deleted": 1, "expenses_deleted": 1}
+    assert job["finished_at"] is not None
+    await assert_user_data_deleted(1)
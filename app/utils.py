@@ -1,5 +1,9 @@
 from bson import ObjectId
 
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+MAX_BATCH_SIZE = 1000
+
 
 def to_json(data):
     if isinstance(data, list):
@@ -9,3 +13,52 @@ def to_json(data):
     if isinstance(data, ObjectId):
         return str(data)
     return data
+
+
+def fields_projection(fields):
+    """
+    Builds a MongoDB projection that returns only the requested fields plus the numeric ID.
+
+    Args:
+        fields (list): The names of the fields to return, or None for all fields.
+
+    Returns:
+        dict: The projection, or None if all fields should be returned.
+    """
+    if not fields:
+        return None
+    projection = {field: 1 for field in fields}
+    projection["id"] = 1
+    projection["_id"] = 0
+    return projection
+
+
+def next_cursor(items, limit):
+    """
+    Returns the cursor for the page after items, or None if items is the last page.
+
+    Args:
+        items (list): The documents of the current page, ordered by ID.
+        limit (int): The page size that was requested.
+
+    Returns:
+        int: The ID to pass as "after" to fetch the next page, or None.
+    """
+    if limit and len(items) == limit:
+        return items[-1]['id']
+    return None
+
+
+def parse_fields(fields):
+    """
+    Splits a comma separated "fields" query parameter into a list of field names.
+
+    Args:
+        fields (str): The raw query parameter, e.g. "id,total_expense,date".
+
+    Returns:
+        list: The field names, or None if no fields were requested.
+    """
+    if not fields:
+        return None
+    return [field.strip() for field in fields.split(',') if field.strip()]
@@ -1,6 +1,7 @@
 from fastapi import HTTPException
 from app.models.user import User
-from app.db.db_functions import get_by_id, get_all
+from app.db.db_functions import get_by_field
+from app.services import user_cache
 import re
 
 
@@ -142,7 +143,7 @@ async def validate_expense_dependency(user_id: int) -> bool:
     Returns:
         bool: True if the expense is valid, otherwise raises an HTTPException with status code 400.
     """
-    user = await get_by_id(user_id, "users")
+    user = await user_cache.get_user(user_id)
     if not is_valid_expense(user['balance']):
         raise HTTPException(status_code=400, detail="The expense is too great, it is not possible to enter a deficit of more than $100,000")
     return True
@@ -175,13 +176,8 @@ async def username_exists_in_database(username: str) -> bool:
     Returns:
         bool: True if the username exists in the database, False otherwise.
     """
-    users = await get_all("users")
-    if not users:
-        return False
-    for user in users:
-        if user['user_name'] == username:
-            return True
-    return False
+    user = await get_by_field("user_name", username, "users", projection={"_id": 0, "user_name": 1})
+    return user is not None
 
 
 async def validate_user_name_dependency(new_user: User) -> bool:
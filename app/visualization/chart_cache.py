@@ -0,0 +1,140 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from app.db import db_functions
+from app.metrics import Counter, Gauge
+from app.visualization.graph_functions import current_month_range
+
+CHART_CACHE_MAX_BYTES = int(os.getenv('CHART_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+
+chart_cache_hits = Counter('chart_cache_hits_total', 'Charts served from the chart cache')
+chart_cache_misses = Counter('chart_cache_misses_total', 'Charts rendered because they were not cached')
+chart_cache_bytes = Gauge('chart_cache_bytes', 'Bytes of rendered charts held in the chart cache')
+
+
+class ChartCache:
+    """
+    An LRU cache of rendered charts bounded by the total size of the cached images.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._charts = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            chart = self._charts.get(key)
+            if chart is not None:
+                self._charts.move_to_end(key)
+            return chart
+
+    def put(self, key, chart):
+        if len(chart) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._charts.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._charts[key] = chart
+            self._size += len(chart)
+            while self._size > self.max_bytes:
+                _, evicted = self._charts.popitem(last=False)
+                self._size -= len(evicted)
+            chart_cache_bytes.set(self._size)
+
+    def clear(self):
+        with self._lock:
+            self._charts.clear()
+            self._size = 0
+            chart_cache_bytes.set(0)
+
+
+cache = ChartCache(CHART_CACHE_MAX_BYTES)
+
+
+async def get_ledger_version(user_id):
+    """
+    Returns the ledger version of a user, bumped by every change to their expenses and revenues.
+
+    Args:
+        user_id (int): The ID of the user.
+
+    Returns:
+        int: The ledger version, 0 if the user has none or does not exist.
+    """
+    user = await db_functions.get_by_field("id", user_id, "users", projection={"_id": 0, "ledger_version": 1})
+    return user.get('ledger_version', 0) if user else 0
+
+
+async def chart_key(chart_type, user_id, chart_format, monthly=False):
+    """
+    Builds the cache key of a chart: (chart type, user ID, month, ledger version, format).
+
+    Args:
+        chart_type (str): The name of the chart.
+        user_id (int): The ID of the user.
+        chart_format (str): "png" or "svg".
+        monthly (bool): Whether the chart covers only the current month.
+
+    Returns:
+        tuple: The cache key.
+    """
+    month = current_month_range()[0].strftime('%Y-%m') if monthly else None
+    return chart_type, user_id, month, await get_ledger_version(user_id), chart_format
+
+
+def chart_etag(key):
+    """
+    Returns a strong ETag derived from a chart's cache key.
+
+    The ETag only depends on the key, so every worker produces the same ETag for the same
+    ledger state and a matching If-None-Match can be answered without rendering.
+
+    Args:
+        key (tuple): The cache key.
+
+    Returns:
+        str: The quoted ETag.
+    """
+    return '"' + hashlib.sha256(repr(key).encode('utf-8')).hexdigest()[:32] + '"'
+
+
+def etag_matches(etag, if_none_match):
+    """
+    Check if an If-None-Match header value matches an ETag.
+
+    Args:
+        etag (str): The current ETag.
+        if_none_match (str): The raw header value, possibly a comma separated list or "*".
+
+    Returns:
+        bool: True if the client's copy is current, False otherwise.
+    """
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates or f'W/{etag}' in candidates
+
+
+async def get_or_render(key, render, *args):
+    """
+    Returns the cached chart for key, rendering and caching it on a miss.
+
+    Args:
+        key (tuple): The cache key.
+        render (callable): The coroutine function that renders the chart.
+
+    Returns:
+        bytes: The rendered chart.
+    """
+    chart = cache.get(key)
+    if chart is not None:
+        chart_cache_hits.inc()
+        return chart
+    chart_cache_misses.inc()
+    chart = await render(*args)
+    cache.put(key, chart)
+    return chart
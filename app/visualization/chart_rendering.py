@@ -0,0 +1,116 @@
+import io
+
+CHART_MEDIA_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+
+
+def _figure(figsize):
+    """
+    Creates a figure, importing matplotlib on first use.
+
+    matplotlib is only loaded by a process that actually renders a chart; with the default process
+    pool that is a render worker, so the web workers never pay its import time and memory.
+
+    Args:
+        figsize (tuple): The width and height in inches.
+
+    Returns:
+        Figure: The new figure.
+    """
+    from matplotlib.figure import Figure
+    return Figure(figsize=figsize)
+
+
+def _to_bytes(figure, chart_format):
+    """
+    Renders a figure to PNG or SVG bytes.
+
+    Args:
+        figure (Figure): The figure to render.
+        chart_format (str): "png" or "svg".
+
+    Returns:
+        bytes: The encoded image.
+    """
+    if chart_format not in CHART_MEDIA_TYPES:
+        raise ValueError(f"Unsupported chart format: {chart_format}")
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    FigureCanvasAgg(figure)
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format=chart_format)
+    return buffer.getvalue()
+
+
+def render_revenue_expense_per_user(user_id, user_name, total_revenue, total_expense, chart_format="png"):
+    """
+    Renders a bar chart of a user's total revenue and total expense.
+
+    Returns:
+        bytes: The encoded image.
+    """
+    figure = _figure((12, 6))
+    ax = figure.subplots()
+
+    bar_width = 0.35
+    index = 0
+
+    ax.bar(index, total_revenue, bar_width, label='Total Revenue', color='green')
+    ax.bar(index + bar_width, total_expense, bar_width, label='Total Expense', color='yellow')
+
+    ax.set_xlabel('User')
+    ax.set_ylabel('Amount')
+    ax.set_title(f'Revenue and Expenses for User {user_id}')
+    ax.set_xticks([index + bar_width / 2], [user_name])
+
+    ax.legend()
+    ax.grid(True)
+    return _to_bytes(figure, chart_format)
+
+
+def render_pie_chart(user_id, total_expenses, total_revenues, chart_format="png"):
+    """
+    Renders a pie chart of the distribution of a user's expenses and revenues.
+
+    Returns:
+        bytes: The encoded image.
+    """
+    figure = _figure((8, 8))
+    ax = figure.subplots()
+
+    if total_expenses == 0 and total_revenues == 0:
+        ax.axis('off')
+        ax.set_title(f'User {user_id} dont have expenses and revenues')
+        return _to_bytes(figure, chart_format)
+
+    labels = ['Expenses', 'Revenues']
+    sizes = [total_expenses, total_revenues]
+    colors = ['red', 'green']
+    explode = (0.1, 0)  # explode Expenses slice
+
+    ax.pie(sizes, explode=explode, labels=labels, colors=colors, autopct='%1.1f%%', shadow=True, startangle=140)
+    ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
+
+    ax.set_title(f'Expense and Revenue Distribution for User {user_id}')
+    return _to_bytes(figure, chart_format)
+
+
+def render_revenue_expense_over_time(user_id, expense_days, expense_totals, revenue_days, revenue_totals,
+                                     chart_format="png"):
+    """
+    Renders a line chart of a user's daily total revenue and total expense.
+
+    Returns:
+        bytes: The encoded image.
+    """
+    figure = _figure((14, 7))
+    ax = figure.subplots()
+
+    ax.plot(expense_days, expense_totals, label='Total Expense', color='red')
+    ax.plot(revenue_days, revenue_totals, label='Total Revenue', color='blue')
+
+    ax.set_xlabel('Date')
+    ax.set_ylabel('Amount')
+    ax.set_title(f'Revenue and Expense Over Time for User {user_id}')
+
+    ax.legend()
+    ax.grid(True)
+    return _to_bytes(figure, chart_format)
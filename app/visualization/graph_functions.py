@@ -1,187 +1,125 @@
-import matplotlib.pyplot as plt
-import pandas as pd
-from app.db import db_functions
+import asyncio
+import os
+from app.db import db_functions, ledger_store
+from app.executors import BoundedExecutor
+from app.services import summary_service
+from app.visualization import chart_rendering
 import datetime
 
+render_executor = BoundedExecutor(
+    'chart_rendering',
+    kind=os.getenv('CHART_RENDER_EXECUTOR', 'process'),
+    max_workers=int(os.getenv('CHART_RENDER_WORKERS', '2')),
+    max_concurrency=int(os.getenv('CHART_RENDER_CONCURRENCY', '0')) or None,
+)
 
-async def filter_by_current_month(data_df):
-    """
-    Filters the given dataframe to include only the rows from the current month.
 
-    Args:
-        data_df (pd.DataFrame): The dataframe to be filtered.
+def current_month_range():
+    """
+    Returns the start of the current month and the start of the next month.
 
     Returns:
-        pd.DataFrame: A dataframe containing only the rows from the current month.
+        tuple: Two datetimes, usable as a half-open [start, end) date range.
     """
-    current_month = datetime.datetime.now().month
-    return data_df[data_df['date'].dt.month == current_month]
+    now = datetime.datetime.now()
+    start = datetime.datetime(now.year, now.month, 1)
+    if now.month == 12:
+        end = datetime.datetime(now.year + 1, 1, 1)
+    else:
+        end = datetime.datetime(now.year, now.month + 1, 1)
+    return start, end
 
 
-async def get_dataframes():
+async def get_daily_totals(user_id, collection_name, amount_field):
     """
-    Retrieves all users, expenses, and revenues data from the database and returns them as dataframes.
+    Sums an amount field per day over a user's documents inside MongoDB.
+
+    Args:
+        user_id (int): The ID of the user.
+        collection_name (str): "expenses" or "revenues".
+        amount_field (str): The field to sum, e.g. "total_expense".
 
     Returns:
-        tuple: A tuple containing three dataframes: users, expenses, and revenues.
+        tuple: The days and the matching totals, both ordered by day.
     """
-    try:
-        users = await db_functions.get_all("users")
-        expenses = await db_functions.get_all("expenses")
-        revenues = await db_functions.get_all("revenues")
-
-        if not all(isinstance(item, dict) for item in users):
-            raise ValueError("Invalid data format for users")
-        if not all(isinstance(item, dict) for item in expenses):
-            raise ValueError("Invalid data format for expenses")
-        if not all(isinstance(item, dict) for item in revenues):
-            raise ValueError("Invalid data format for revenues")
-
-        users_df = pd.DataFrame(users)
-        expenses_df = pd.DataFrame(expenses)
-        revenues_df = pd.DataFrame(revenues)
-
-        expenses_df['total_expense'] = expenses_df['total_expense'].fillna(0)
-        revenues_df['total_revenue'] = revenues_df['total_revenue'].fillna(0)
-
-        return users_df, expenses_df, revenues_df
-    except Exception as e:
-        print(f"Error in get_dataframes: {e}")
-        raise e
-
-
-async def plot_revenue_expense_per_user(user_id):
+    pipeline = [
+        {"$match": {"user_id": user_id}},
+        {"$group": {"_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$date"}},
+                    "total": {"$sum": f"${amount_field}"}}},
+        {"$sort": {"_id": 1}},
+    ]
+    result = await ledger_store.aggregate(pipeline, collection_name)
+    days = [datetime.datetime.strptime(row["_id"], "%Y-%m-%d").date() for row in result]
+    totals = [row["total"] for row in result]
+    return days, totals
+
+
+async def plot_revenue_expense_per_user(user_id, chart_format="png"):
     """
-    Plots a bar chart showing the total revenue and total expense for a specific user in the current month.
+    Renders a bar chart showing the total revenue and total expense for a specific user.
 
     Args:
         user_id (int): The ID of the user.
+        chart_format (str): "png" or "svg".
 
     Raises:
         ValueError: If the user with the specified ID is not found.
 
     Returns:
-            None: Displays a bar chart showing total revenue and expense for the specified user.
-
+        bytes: The rendered chart.
     """
     try:
-        users_df, expenses_df, revenues_df = await get_dataframes()
-        print(revenues_df)
-        expenses_sum = expenses_df.groupby('user_id')['total_expense'].sum().reset_index()
-        revenues_sum = revenues_df.groupby('user_id')['total_revenue'].sum().reset_index()
-
-        df = pd.merge(users_df, expenses_sum, left_on='id', right_on='user_id', how='left')
-        df = pd.merge(df, revenues_sum, left_on='id', right_on='user_id', how='left')
-
-        df['total_expense'] = df['total_expense'].fillna(0)
-        df['total_revenue'] = df['total_revenue'].fillna(0)
-
-        user_df = df[df['id'] == user_id]
-
-        if user_df.empty:
+        user = await db_functions.get_by_field("id", user_id, "users", projection={"_id": 0, "user_name": 1})
+        if user is None:
             raise ValueError(f"User with id {user_id} not found")
-
-        plt.figure(figsize=(12, 6))
-
-        bar_width = 0.35
-        index = user_df.index
-
-        plt.bar(index, user_df['total_revenue'], bar_width, label='Total Revenue', color='green')
-        plt.bar(index + bar_width, user_df['total_expense'], bar_width, label='Total Expense', color='yellow')
-
-        plt.xlabel('User')
-        plt.ylabel('Amount')
-        plt.title(f'Revenue and Expenses for User {user_id}')
-        plt.xticks(index + bar_width / 2, user_df['user_name'])
-
-        plt.legend()
-        plt.grid(True)
-
-        plt.show()
+        total_expense, total_revenue = await summary_service.get_user_totals(user_id)
+        return await render_executor.run(chart_rendering.render_revenue_expense_per_user, user_id,
+                                         user['user_name'], total_revenue, total_expense, chart_format)
     except Exception as e:
         print(f"Error in plot_revenue_expense_per_user: {e}")
         raise e
 
 
-async def plot_pie_chart(user_id):
+async def plot_pie_chart(user_id, chart_format="png"):
     """
-    Plots a pie chart showing the distribution of expenses and revenues for a specific user in the current month.
+    Renders a pie chart showing the distribution of expenses and revenues for a specific user in the current month.
 
     Args:
         user_id (int): The ID of the user.
+        chart_format (str): "png" or "svg".
 
     Returns:
-        None: Displays a pie chart showing the distribution of expenses and revenues for the specified user in the current month.
+        bytes: The rendered chart.
     """
     try:
-        users_df, expenses_df, revenues_df = await get_dataframes()
-
-        expenses_df = await filter_by_current_month(expenses_df)
-        revenues_df = await filter_by_current_month(revenues_df)
-
-        user_expenses = expenses_df[expenses_df['user_id'] == user_id]
-        user_revenues = revenues_df[revenues_df['user_id'] == user_id]
-
-        total_expenses = user_expenses['total_expense'].sum()
-        total_revenues = user_revenues['total_revenue'].sum()
-
-        # Check if both total_expenses and total_revenues are zero
-        if total_expenses == 0 and total_revenues == 0:
-            print("No expenses or revenues for this user in the current month.")
-            plt.figure(figsize=(8, 8))
-            plt.pie([], labels=[], colors=[], autopct='%1.1f%%', shadow=True, startangle=140)
-            plt.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
-            plt.title(f'User {user_id} dont have expenses and revenues')
-            plt.show()
-            return
-
-        labels = ['Expenses', 'Revenues']
-        sizes = [total_expenses, total_revenues]
-        colors = ['red', 'green']
-        explode = (0.1, 0)  # explode Expenses slice
-
-        plt.figure(figsize=(8, 8))
-        plt.pie(sizes, explode=explode, labels=labels, colors=colors, autopct='%1.1f%%', shadow=True, startangle=140)
-        plt.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
-
-        plt.title(f'Expense and Revenue Distribution for User {user_id}')
-
-        plt.show()
+        start, _ = current_month_range()
+        summary = await summary_service.get_summary(user_id, start.year, start.month)
+        total_expenses, total_revenues = summary["total_expense"], summary["total_revenue"]
+        return await render_executor.run(chart_rendering.render_pie_chart, user_id,
+                                         total_expenses, total_revenues, chart_format)
     except Exception as e:
         print(f"Error in plot_pie_chart: {e}")
         raise e
 
 
-async def plot_revenue_expense_over_time(user_id):
+async def plot_revenue_expense_over_time(user_id, chart_format="png"):
     """
-    Plots a line chart showing the total revenue and total expense over time for a specific user.
+    Renders a line chart showing the daily total revenue and total expense over time for a specific user.
 
     Args:
         user_id (int): The ID of the user.
+        chart_format (str): "png" or "svg".
 
     Returns:
-            None: Displays a line chart showing total revenue and expense over time for the specified user.
-
+        bytes: The rendered chart.
     """
     try:
-        users_df, expenses_df, revenues_df = await get_dataframes()
-
-        user_expenses = expenses_df[expenses_df['user_id'] == user_id]
-        user_revenues = revenues_df[revenues_df['user_id'] == user_id]
-
-        plt.figure(figsize=(14, 7))
-
-        plt.plot(user_expenses['date'], user_expenses['total_expense'], label='Total Expense', color='red')
-        plt.plot(user_revenues['date'], user_revenues['total_revenue'], label='Total Revenue', color='blue')
-
-        plt.xlabel('Date')
-        plt.ylabel('Amount')
-        plt.title(f'Revenue and Expense Over Time for User {user_id}')
-
-        plt.legend()
-        plt.grid(True)
-
-        plt.show()
+        (expense_days, expense_totals), (revenue_days, revenue_totals) = await asyncio.gather(
+            get_daily_totals(user_id, "expenses", "total_expense"),
+            get_daily_totals(user_id, "revenues", "total_revenue"),
+        )
+        return await render_executor.run(chart_rendering.render_revenue_expense_over_time, user_id,
+                                         expense_days, expense_totals, revenue_days, revenue_totals, chart_format)
     except Exception as e:
         print(f"Error in plot_revenue_expense_over_time: {e}")
-        raise e
\ No newline at end of file
+        raise e
@@ -1,24 +1,43 @@
-from fastapi import APIRouter, HTTPException
-from app.visualization import graph_functions
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+from app.visualization import chart_cache, graph_functions
+from app.visualization.chart_rendering import CHART_MEDIA_TYPES
 
 visualization_router = APIRouter()
 
+
+async def _chart_response(chart_type, render, user_id, chart_format, if_none_match, monthly=False):
+    """
+    Serves a chart from the chart cache, answering 304 when the client's ETag is still current.
+    """
+    key = await chart_cache.chart_key(chart_type, user_id, chart_format, monthly)
+    headers = {'ETag': chart_cache.chart_etag(key), 'Cache-Control': 'no-cache'}
+    if chart_cache.etag_matches(headers['ETag'], if_none_match):
+        return Response(status_code=304, headers=headers)
+    chart = await chart_cache.get_or_render(key, render, user_id, chart_format)
+    return Response(content=chart, media_type=CHART_MEDIA_TYPES[chart_format], headers=headers)
+
+
 @visualization_router.get('/plot_revenue_expense_per_user')
-async def plot_revenue_expense_per_user(user_id: int):
+async def plot_revenue_expense_per_user(user_id: int, format: str = Query('png', pattern='^(png|svg)$'),
+                                        if_none_match: Optional[str] = Header(None)):
     """
-    Endpoint to plot a bar chart showing the total revenue and total expense for a specific user in the current month.
+    Endpoint to render a bar chart showing the total revenue and total expense for a specific user in the current month.
 
     Args:
         user_id (int): The ID of the user.
+        format (str): "png" or "svg".
+        if_none_match (str, optional): The ETag of the client's cached copy.
 
     Raises:
         HTTPException: If the user with the specified ID is not found or any other error occurs.
 
     Returns:
-        None: Displays a bar chart showing total revenue and expense for the specified user in the current month.
+        Response: The bar chart as image/png or image/svg+xml, or 304 if the client's copy is current.
     """
     try:
-        return await graph_functions.plot_revenue_expense_per_user(user_id)
+        return await _chart_response('bar', graph_functions.plot_revenue_expense_per_user, user_id, format,
+                                     if_none_match)
     except ValueError as e:
         print(f"ValueError: {e}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -28,21 +47,25 @@ async def plot_revenue_expense_per_user(user_id: int):
 
 
 @visualization_router.get('/plot_revenue_expense_over_time')
-async def plot_revenue_expense_over_time(user_id: int):
+async def plot_revenue_expense_over_time(user_id: int, format: str = Query('png', pattern='^(png|svg)$'),
+                                         if_none_match: Optional[str] = Header(None)):
     """
-    Endpoint to plot a line chart showing the total revenue and total expense over time for a specific user.
+    Endpoint to render a line chart showing the total revenue and total expense over time for a specific user.
 
     Args:
         user_id (int): The ID of the user.
+        format (str): "png" or "svg".
+        if_none_match (str, optional): The ETag of the client's cached copy.
 
     Raises:
         HTTPException: If the user with the specified ID is not found or any other error occurs.
 
     Returns:
-        None: Displays a line chart showing total revenue and expense over time for the specified user.
+        Response: The line chart as image/png or image/svg+xml, or 304 if the client's copy is current.
     """
     try:
-        return await graph_functions.plot_revenue_expense_over_time(user_id)
+        return await _chart_response('over_time', graph_functions.plot_revenue_expense_over_time, user_id, format,
+                                     if_none_match)
     except ValueError as e:
         print(f"ValueError: {e}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -52,21 +75,25 @@ async def plot_revenue_expense_over_time(user_id: int):
 
 
 @visualization_router.get('/plot_pie_chart')
-async def plot_pie_chart(user_id: int):
+async def plot_pie_chart(user_id: int, format: str = Query('png', pattern='^(png|svg)$'),
+                         if_none_match: Optional[str] = Header(None)):
     """
-    Endpoint to plot a pie chart showing the distribution of expenses and revenues for a specific user in the current month.
+    Endpoint to render a pie chart showing the distribution of expenses and revenues for a specific user in the current month.
 
     Args:
         user_id (int): The ID of the user.
+        format (str): "png" or "svg".
+        if_none_match (str, optional): The ETag of the client's cached copy.
 
     Raises:
         HTTPException: If the user with the specified ID is not found or any other error occurs.
 
     Returns:
-        None: Displays a pie chart showing the distribution of expenses and revenues for the specified user in the current month.
+        Response: The pie chart as image/png or image/svg+xml, or 304 if the client's copy is current.
     """
     try:
-        return await graph_functions.plot_pie_chart(user_id)
+        return await _chart_response('pie', graph_functions.plot_pie_chart, user_id, format,
+                                     if_none_match, monthly=True)
     except ValueError as e:
         print(f"ValueError: {e}")
         raise HTTPException(status_code=400, detail=str(e))
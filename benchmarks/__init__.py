@@ -0,0 +1,8 @@
+"""
+Benchmarks for the HTTP and service hot paths.
+
+Run them with `python -m benchmarks --help`. The app is driven in process through httpx's ASGI
+transport against either the in-memory repository or a scratch MongoDB, and the latency
+percentiles and throughput of every scenario can be written to JSON and compared across commits
+with `python -m benchmarks.compare`.
+"""
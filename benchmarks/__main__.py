@@ -0,0 +1,121 @@
+import argparse
+import asyncio
+import datetime
+import json
+import platform
+import random
+import sys
+import time
+from benchmarks.environment import configure_environment, git_commit, prepare_database, shutdown
+from benchmarks.importtime import measure_startup, print_startup
+
+SCENARIOS = ("register", "login", "expense_create", "expense_list", "chart_bar", "chart_over_time", "chart_pie")
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Benchmark the HTTP hot paths in process through httpx's ASGI transport.")
+    parser.add_argument("--backend", choices=("memory", "motor"), default="memory",
+                        help="memory: the in-process repository; motor: the MongoDB at MONGO_HOST/MONGO_PORT/"
+                             "MONGO_DB, which should be a scratch database (e.g. a throwaway local mongod)")
+    parser.add_argument("--drop", action="store_true", help="drop MONGO_DB before seeding (motor backend only)")
+    parser.add_argument("--users", type=int, default=100, help="seeded users (default: %(default)s)")
+    parser.add_argument("--expenses", type=int, default=10000,
+                        help="seeded expenses, spread over the users (default: %(default)s, up to 1M is practical)")
+    parser.add_argument("--revenues", type=int, default=None, help="seeded revenues (default: expenses / 10)")
+    parser.add_argument("--requests", type=int, default=500, help="timed requests per scenario (default: %(default)s)")
+    parser.add_argument("--concurrency", type=int, default=10, help="requests in flight (default: %(default)s)")
+    parser.add_argument("--warmup", type=int, default=20, help="untimed requests per scenario (default: %(default)s)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help="comma separated scenarios to run (default: all of %(default)s)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for the data and request order")
+    parser.add_argument("--no-chart-cache", action="store_true",
+                        help="render every chart instead of serving repeats from the chart cache")
+    parser.add_argument("--bcrypt-rounds", type=int, default=None,
+                        help="override BCRYPT_ROUNDS, which dominates register and login")
+    parser.add_argument("--no-startup", action="store_true",
+                        help="skip the -X importtime startup report of the app")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    if args.revenues is None:
+        args.revenues = args.expenses // 10
+    return args
+
+
+def print_table(results):
+    header = f"{'scenario':<16}{'requests':>9}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'rps':>10}"
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        print(f"{result['name']:<16}{result['requests']:>9}{result['errors']:>8}{result['p50_ms']:>10.2f}"
+              f"{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}{result['rps']:>10.1f}")
+
+
+async def main(args):
+    import httpx
+    from app.db import ledger_store
+    from app.main import app
+    from benchmarks.runner import run_scenario, scenarios
+    from benchmarks.seed import seed_data
+
+    # Measured in fresh interpreters, so the imports above do not skew it.
+    startup = None if args.no_startup else measure_startup(runs=3)
+    rng = random.Random(args.seed)
+    await prepare_database(args.backend, args.drop)
+    started = time.perf_counter()
+    user_ids = await seed_data(args.users, args.expenses, args.revenues, rng)
+    seed_seconds = time.perf_counter() - started
+    print(f"Seeded {args.users} users, {args.expenses} expenses and {args.revenues} revenues "
+          f"into {args.backend} in {seed_seconds:.1f}s", file=sys.stderr)
+
+    factories = scenarios(user_ids, rng, first_new_user=max(user_ids) + 1)
+    results = []
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            for name in args.scenarios:
+                results.append(await run_scenario(client, name, factories[name], args.requests, args.concurrency,
+                                                  warmup=args.warmup))
+    finally:
+        shutdown()
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": args.backend,
+            "ledger_storage": ledger_store.LEDGER_STORAGE,
+            "users": args.users,
+            "expenses": args.expenses,
+            "revenues": args.revenues,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+            "seed": args.seed,
+            "chart_cache": not args.no_chart_cache,
+            "seed_seconds": round(seed_seconds, 3),
+        },
+        "startup": startup,
+        "results": results,
+    }
+    if startup is not None:
+        print_startup(startup)
+    print_table(results)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    arguments = parse_args(sys.argv[1:])
+    configure_environment(arguments.backend, chart_cache=not arguments.no_chart_cache,
+                          bcrypt_rounds=arguments.bcrypt_rounds)
+    asyncio.run(main(arguments))
@@ -0,0 +1,55 @@
+import json
+import sys
+
+METRICS = ("p50_ms", "p95_ms", "p99_ms", "rps")
+
+
+def compare(baseline, candidate):
+    """
+    Pairs up the scenarios of two benchmark reports and computes the relative change of each metric.
+
+    Args:
+        baseline (dict): The report of the reference run.
+        candidate (dict): The report of the run being evaluated.
+
+    Returns:
+        list: One row per scenario present in both reports, with each metric's baseline, candidate
+        and change in percent (positive means larger).
+    """
+    baseline_results = {result["name"]: result for result in baseline["results"]}
+    rows = []
+    for result in candidate["results"]:
+        before = baseline_results.get(result["name"])
+        if before is None:
+            continue
+        row = {"name": result["name"]}
+        for metric in METRICS:
+            old, new = before[metric], result[metric]
+            row[metric] = (old, new, round((new - old) / old * 100, 1) if old else None)
+        rows.append(row)
+    return rows
+
+
+def print_comparison(baseline, candidate):
+    print(f"baseline {baseline['meta'].get('commit')}  candidate {candidate['meta'].get('commit')}")
+    if baseline.get("startup") and candidate.get("startup"):
+        for metric, unit in (("import_ms", "ms"), ("max_rss_kib", "KiB")):
+            old, new = baseline["startup"][metric], candidate["startup"][metric]
+            change = f" {(new - old) / old * 100:+.0f}%" if old else ""
+            print(f"startup {metric}: {old} {unit} -> {new} {unit}{change}")
+    print(f"{'scenario':<16}" + "".join(f"{metric:>22}" for metric in METRICS))
+    for row in compare(baseline, candidate):
+        cells = []
+        for metric in METRICS:
+            old, new, change = row[metric]
+            cells.append(f"{old:>8.1f} -> {new:>8.1f} {'' if change is None else f'{change:+.0f}%':>5}"
+                         if metric == "rps" else
+                         f"{old:>7.2f} -> {new:>7.2f} {'' if change is None else f'{change:+.0f}%':>5}")
+        print(f"{row['name']:<16}" + "".join(f"{cell:>22}" for cell in cells))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python -m benchmarks.compare BASELINE.json CANDIDATE.json")
+    with open(sys.argv[1]) as baseline_file, open(sys.argv[2]) as candidate_file:
+        print_comparison(json.load(baseline_file), json.load(candidate_file))
@@ -0,0 +1,63 @@
+import os
+import subprocess
+
+
+def configure_environment(backend, chart_cache=True, bcrypt_rounds=None):
+    """
+    Sets the settings the app reads at import time, so this must run before app modules are imported.
+
+    Args:
+        backend (str): The repository backend, "memory" or "motor".
+        chart_cache (bool): Whether rendered charts may be served from the chart cache.
+        bcrypt_rounds (int, optional): Overrides BCRYPT_ROUNDS.
+    """
+    os.environ["REPOSITORY_BACKEND"] = backend
+    if not chart_cache:
+        os.environ["CHART_CACHE_MAX_BYTES"] = "0"
+    if bcrypt_rounds is not None:
+        os.environ["BCRYPT_ROUNDS"] = str(bcrypt_rounds)
+
+
+async def prepare_database(backend, drop=False):
+    """
+    Connects the repository and, for MongoDB, makes sure the database is a fresh one with the app's indexes.
+
+    Args:
+        backend (str): The repository backend, "memory" or "motor".
+        drop (bool): Whether to drop MONGO_DB first instead of refusing to use a non-empty database.
+    """
+    from app.db import db_connector, db_indexes, repository
+
+    await repository.get().connect()
+    if backend != "motor":
+        return
+    if drop:
+        await db_connector.get_client().drop_database(db_connector.mongo_db)
+    elif await db_connector.get_db()["users"].estimated_document_count():
+        raise SystemExit(f"Database {db_connector.mongo_db} is not empty; point MONGO_DB at a scratch "
+                         f"database or pass --drop")
+    await db_indexes.create_indexes()
+
+
+def shutdown():
+    """
+    Stops the app's executors and closes the repository.
+    """
+    from app.db import repository
+    from app.services import password_service
+    from app.visualization.graph_functions import render_executor
+
+    password_service.executor.shutdown()
+    render_executor.shutdown()
+    repository.get().close()
+
+
+def git_commit():
+    """
+    Returns the short hash of the checked out commit, or None outside a git checkout.
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
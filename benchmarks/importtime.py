@@ -0,0 +1,100 @@
+"""
+Startup-time report built on `python -X importtime`.
+
+Each run imports the app in a fresh interpreter and records the cumulative import time, the peak
+resident memory and the slowest modules. Heavy optional stacks (matplotlib, pandas, numpy) are
+flagged when they are loaded at startup. Run it with `python -m benchmarks.importtime`; it is also
+part of the `python -m benchmarks` report.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_PACKAGES = ("matplotlib", "pandas", "numpy")
+
+_SCRIPT = ("import resource, sys\n"
+           "import {module}\n"
+           "print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)\n"
+           "print(','.join(sorted({{name.split('.')[0] for name in sys.modules}})))\n")
+
+
+def parse_importtime(output):
+    """
+    Parses the stderr of `python -X importtime` into per-module timings.
+
+    Args:
+        output (str): The captured stderr.
+
+    Returns:
+        list: (module, self microseconds, cumulative microseconds) tuples in import order.
+    """
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        modules.append((fields[2].strip(), int(fields[0]), int(fields[1])))
+    return modules
+
+
+def _run_once(module):
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", _SCRIPT.format(module=module)],
+                               capture_output=True, text=True, cwd=ROOT, check=True)
+    max_rss, packages = completed.stdout.splitlines()[-2:]
+    return parse_importtime(completed.stderr), int(max_rss), set(packages.split(","))
+
+
+def measure_startup(module="app.main", runs=5, top=15):
+    """
+    Imports a module in fresh interpreters and reports how long it took and what it loaded.
+
+    Args:
+        module (str): The module to import, by default the FastAPI app.
+        runs (int): The number of interpreters to start; the median run is reported.
+        top (int): The number of slowest modules to list.
+
+    Returns:
+        dict: The median cumulative import time in milliseconds, the peak resident memory in KiB,
+        the heavy packages loaded at startup, and the slowest modules of the median run by self time.
+    """
+    measurements = []
+    for _ in range(runs):
+        modules, max_rss, packages = _run_once(module)
+        total = next((cumulative for name, _, cumulative in modules if name == module), 0)
+        measurements.append((total, max_rss, modules, packages))
+    measurements.sort(key=lambda measurement: measurement[0])
+    total, max_rss, modules, packages = measurements[len(measurements) // 2]
+    slowest = sorted(modules, key=lambda entry: entry[1], reverse=True)[:top]
+    return {
+        "module": module,
+        "runs": runs,
+        "import_ms": round(total / 1000, 1),
+        "import_ms_min": round(measurements[0][0] / 1000, 1),
+        "import_ms_stdev": round(statistics.pstdev(measurement[0] for measurement in measurements) / 1000, 1),
+        "max_rss_kib": max_rss,
+        "heavy_packages": sorted(package for package in HEAVY_PACKAGES if package in packages),
+        "modules": len(modules),
+        "slowest": [{"module": name, "self_ms": round(self_us / 1000, 1),
+                     "cumulative_ms": round(cumulative / 1000, 1)} for name, self_us, cumulative in slowest],
+    }
+
+
+def print_startup(report):
+    heavy = ", ".join(report["heavy_packages"]) or "none"
+    print(f"import {report['module']}: {report['import_ms']:.1f} ms (median of {report['runs']}, "
+          f"min {report['import_ms_min']:.1f}), peak RSS {report['max_rss_kib'] / 1024:.1f} MiB, "
+          f"{report['modules']} modules, heavy packages loaded: {heavy}")
+    for entry in report["slowest"]:
+        print(f"  {entry['self_ms']:>8.1f} ms self {entry['cumulative_ms']:>8.1f} ms cumulative  {entry['module']}")
+
+
+if __name__ == "__main__":
+    result = measure_startup(*sys.argv[1:2])
+    print_startup(result)
+    if "--json" in sys.argv:
+        print(json.dumps(result, indent=2))
@@ -0,0 +1,233 @@
+"""
+Concurrent load test that checks a user's balance stays correct under contention.
+
+Thousands of expense and revenue creates, updates and deletes are fired at a single user at once,
+the way a user's web and mobile clients may race each other. Afterwards the user's balance must
+equal the sum of their revenues minus the sum of their expenses, and must agree with the monthly
+summaries and the ledger. Run it with `python -m benchmarks.load_test --help`; it exits non-zero
+when an invariant is broken.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import random
+import sys
+import time
+from benchmarks.environment import configure_environment, git_commit, prepare_database, shutdown
+
+ACTIONS = ("create", "update", "delete")
+TOLERANCE = 0.005
+
+# kind -> (collection, amount field, description field, amount range)
+KINDS = {
+    "expense": ("expenses", "total_expense", "description_expense", (1, 50)),
+    "revenue": ("revenues", "total_revenue", "description_revenue", (20, 100)),
+}
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(","):
+        action, _, weight = part.partition("=")
+        if action.strip() not in ACTIONS or not weight.strip().isdigit():
+            raise argparse.ArgumentTypeError(f"expected e.g. create=50,update=30,delete=20, got {value!r}")
+        mix[action.strip()] = int(weight)
+    return mix
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.load_test",
+                                     description="Check balance correctness under concurrent writes to one user.")
+    parser.add_argument("--backend", choices=("memory", "motor"), default="memory",
+                        help="memory: the in-process repository, which yields once per operation so "
+                             "requests interleave; motor: the scratch MongoDB at MONGO_*")
+    parser.add_argument("--drop", action="store_true", help="drop MONGO_DB first (motor backend only)")
+    parser.add_argument("--operations", type=int, default=5000, help="operations to fire (default: %(default)s)")
+    parser.add_argument("--concurrency", type=int, default=200, help="operations in flight (default: %(default)s)")
+    parser.add_argument("--pool", type=int, default=500,
+                        help="expenses and revenues created up front for updates and deletes (default: %(default)s)")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("create=50,update=30,delete=20"),
+                        help="relative weights of the actions (default: create=50,update=30,delete=20)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for the operations")
+    parser.add_argument("--output", help="write the report as JSON to this file")
+    return parser.parse_args(argv)
+
+
+def _entry(kind, user_id, rng):
+    _, amount_field, description_field, (low, high) = KINDS[kind]
+    return {"id": 0, "user_id": user_id, amount_field: round(rng.uniform(low, high), 2),
+            "date": (datetime.datetime.now() - datetime.timedelta(days=rng.randrange(90))).isoformat(),
+            description_field: f"load {kind}"}
+
+
+def plan_operations(count, mix, pools, user_id, rng):
+    """
+    Draws a reproducible sequence of operations.
+
+    Updates and deletes target the pre-created pools, so the same documents are hit by racing
+    updates and deletes (including repeated deletes).
+
+    Args:
+        count (int): The number of operations.
+        mix (dict): The relative weight of each action.
+        pools (dict): The pre-created document IDs of each kind.
+        user_id (int): The ID of the user.
+        rng (random.Random): The source of the operations.
+
+    Returns:
+        list: (action, kind, document ID or None, body or None) tuples.
+    """
+    actions = list(mix)
+    weights = [mix[action] for action in actions]
+    operations = []
+    for _ in range(count):
+        action = rng.choices(actions, weights)[0]
+        kind = rng.choice(tuple(KINDS))
+        document_id = None if action == "create" else rng.choice(pools[kind])
+        body = None if action == "delete" else _entry(kind, user_id, rng)
+        if body is not None and document_id is not None:
+            body["id"] = document_id
+        operations.append((action, kind, document_id, body))
+    return operations
+
+
+def _request(action, kind, document_id, body, user_id):
+    paths = {
+        ("create", "expense"): ("POST", f"/expense/create_expense_to_user/{user_id}"),
+        ("update", "expense"): ("PUT", f"/expense/update_expense/{document_id}"),
+        ("delete", "expense"): ("DELETE", f"/expense/delete_expense/{document_id}"),
+        ("create", "revenue"): ("POST", f"/revenue/create_revenue_to_user/{user_id}"),
+        ("update", "revenue"): ("PUT", f"/revenue/update revenue/{document_id}"),
+        ("delete", "revenue"): ("DELETE", f"/revenue/delete revenue/{document_id}"),
+    }
+    method, url = paths[(action, kind)]
+    kwargs = {"json": body} if body is not None else {}
+    if kind == "expense" and action != "delete":
+        kwargs["params"] = {"user_id": user_id}
+    return method, url, kwargs
+
+
+async def _sum(user_id, collection_name, amount_field):
+    from app.db import ledger_store
+
+    total, count = 0, 0
+    async for document in ledger_store.iter_by_user_id(user_id, collection_name, projection={amount_field: 1}):
+        total += document[amount_field]
+        count += 1
+    return total, count
+
+
+async def verify(user_id):
+    """
+    Checks the user's balance against their stored expenses and revenues, monthly summaries and ledger.
+
+    Args:
+        user_id (int): The ID of the user.
+
+    Returns:
+        dict: The balance, the stored totals and counts, and whether each invariant holds.
+    """
+    from app.db import db_functions
+    from app.services import ledger_service, summary_service
+
+    user = await db_functions.get_by_id(user_id, collection_name="users")
+    expense_total, expense_count = await _sum(user_id, "expenses", "total_expense")
+    revenue_total, revenue_count = await _sum(user_id, "revenues", "total_revenue")
+    summary_expense, summary_revenue = await summary_service.get_user_totals(user_id)
+    ledger = await ledger_service.check_balance(user_id)
+    expected = revenue_total - expense_total
+    return {
+        "balance": user["balance"],
+        "expected_balance": round(expected, 2),
+        "expenses": {"count": expense_count, "total": round(expense_total, 2)},
+        "revenues": {"count": revenue_count, "total": round(revenue_total, 2)},
+        "summary_totals": {"expense": round(summary_expense, 2), "revenue": round(summary_revenue, 2)},
+        "ledger_version": ledger["version"],
+        "balance_matches_entries": abs(user["balance"] - expected) < TOLERANCE,
+        "summaries_match_entries": (abs(summary_expense - expense_total) < TOLERANCE
+                                    and abs(summary_revenue - revenue_total) < TOLERANCE),
+        "ledger_consistent": ledger["consistent"],
+    }
+
+
+async def _create_pool(client, kind, user_id, size, rng):
+    collection_name = KINDS[kind][0]
+    ids = []
+    for start in range(0, size, 1000):
+        items = [_entry(kind, user_id, rng) for _ in range(min(1000, size - start))]
+        params = {"user_id": user_id} if kind == "expense" else {}
+        response = await client.post(f"/{kind}/batch", json=items, params=params)
+        response.raise_for_status()
+        ids += [item["id"] for item in response.json()["created"]]
+    if len(ids) != size:
+        raise SystemExit(f"Could only create {len(ids)} of {size} {collection_name} for the pool")
+    return ids
+
+
+async def main(args):
+    import httpx
+    from app.db import ledger_store
+    from app.main import app
+    from benchmarks.runner import summarize
+
+    rng = random.Random(args.seed)
+    await prepare_database(args.backend, args.drop)
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://load-test") as client:
+            user = {"id": 0, "user_name": "loadtest", "password": "Load!2345", "email": "load@example.com",
+                    "address": "1 Load St", "phone": "0501234567", "balance": 0}
+            (await client.post("/user/register", json=user)).raise_for_status()
+            login = await client.post("/user/login", params={"user_name": "loadtest", "user_password": "Load!2345"})
+            login.raise_for_status()
+            user_id = login.json()[0]["id"]
+            pools = {kind: await _create_pool(client, kind, user_id, args.pool, rng) for kind in KINDS}
+            operations = plan_operations(args.operations, args.mix, pools, user_id, rng)
+
+            semaphore = asyncio.Semaphore(args.concurrency)
+            latencies = {action: [] for action in ACTIONS}
+            statuses = {action: {} for action in ACTIONS}
+
+            async def run(action, kind, document_id, body):
+                method, url, kwargs = _request(action, kind, document_id, body, user_id)
+                async with semaphore:
+                    started = time.perf_counter()
+                    response = await client.request(method, url, **kwargs)
+                    latencies[action].append(time.perf_counter() - started)
+                status = str(response.status_code)
+                statuses[action][status] = statuses[action].get(status, 0) + 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(run(*operation) for operation in operations))
+            elapsed = time.perf_counter() - started
+        invariants = await verify(user_id)
+    finally:
+        shutdown()
+
+    results = []
+    for action in ACTIONS:
+        server_errors = sum(count for status, count in statuses[action].items() if status.startswith("5"))
+        result = summarize(action, latencies[action], server_errors, elapsed, args.concurrency)
+        result["statuses"] = statuses[action]
+        results.append(result)
+    report = {
+        "meta": {"commit": git_commit(), "backend": args.backend, "ledger_storage": ledger_store.LEDGER_STORAGE,
+                 "operations": args.operations, "concurrency": args.concurrency, "pool": args.pool,
+                 "mix": args.mix, "seed": args.seed},
+        "elapsed_seconds": round(elapsed, 3),
+        "operations_per_second": round(len(operations) / elapsed, 1),
+        "results": results,
+        "invariants": invariants,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    return all(invariants[name] for name in ("balance_matches_entries", "summaries_match_entries",
+                                              "ledger_consistent"))
+
+
+if __name__ == "__main__":
+    arguments = parse_args(sys.argv[1:])
+    configure_environment(arguments.backend)
+    sys.exit(0 if asyncio.run(main(arguments)) else 1)
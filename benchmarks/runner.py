@@ -0,0 +1,150 @@
+import asyncio
+import datetime
+import itertools
+import math
+import time
+from benchmarks.seed import SEED_PASSWORD, user_name
+
+
+def percentile(sorted_values, fraction):
+    """
+    Returns the nearest-rank percentile of already sorted values.
+
+    Args:
+        sorted_values (list): The values in ascending order.
+        fraction (float): The percentile as a fraction, e.g. 0.95.
+
+    Returns:
+        float: The value at that percentile, or 0 if there are no values.
+    """
+    if not sorted_values:
+        return 0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(name, latencies, errors, elapsed, concurrency):
+    """
+    Condenses the latencies of one scenario into the reported statistics.
+
+    Args:
+        name (str): The scenario name.
+        latencies (list): The latency of every request, in seconds.
+        errors (int): The number of requests that failed.
+        elapsed (float): The wall-clock duration of the scenario, in seconds.
+        concurrency (int): The number of requests kept in flight.
+
+    Returns:
+        dict: The request count, errors, p50/p95/p99/mean/max latency in milliseconds and requests per second.
+    """
+    ordered = sorted(latencies)
+    milliseconds = 1000
+    return {
+        "name": name,
+        "requests": len(ordered),
+        "concurrency": concurrency,
+        "errors": errors,
+        "p50_ms": round(percentile(ordered, 0.50) * milliseconds, 3),
+        "p95_ms": round(percentile(ordered, 0.95) * milliseconds, 3),
+        "p99_ms": round(percentile(ordered, 0.99) * milliseconds, 3),
+        "mean_ms": round(sum(ordered) / len(ordered) * milliseconds, 3) if ordered else 0,
+        "max_ms": round(ordered[-1] * milliseconds, 3) if ordered else 0,
+        "rps": round(len(ordered) / elapsed, 1) if elapsed else 0,
+    }
+
+
+async def run_scenario(client, name, make_request, requests, concurrency, warmup=0):
+    """
+    Issues a scenario's requests with a fixed number in flight and times each of them.
+
+    Args:
+        client (httpx.AsyncClient): The client bound to the app.
+        name (str): The scenario name.
+        make_request (Callable): Called with the request number; returns the (method, url, kwargs) to send.
+        requests (int): The number of timed requests.
+        concurrency (int): The number of requests kept in flight.
+        warmup (int): Untimed requests sent first, e.g. to fill caches and connection pools.
+
+    Returns:
+        dict: The statistics from summarize.
+    """
+    counter = itertools.count()
+    latencies = []
+    errors = 0
+
+    async def worker(stop, record):
+        nonlocal errors
+        while (number := next(counter)) < stop:
+            method, url, kwargs = make_request(number)
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            finished = time.perf_counter()
+            if record:
+                latencies.append(finished - started)
+                errors += response.status_code >= 400
+
+    if warmup:
+        await asyncio.gather(*(worker(warmup, False) for _ in range(min(concurrency, warmup))))
+    # Timed requests continue the numbering, so e.g. registrations never reuse a warmup user name.
+    first = next(counter)
+    counter = itertools.count(first)
+    stop = first + requests
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(stop, True) for _ in range(concurrency)))
+    return summarize(name, latencies, errors, time.perf_counter() - started, concurrency)
+
+
+def scenarios(user_ids, rng, first_new_user):
+    """
+    Builds the request factories of every benchmarked endpoint.
+
+    Reads and chart renders are spread over the seeded users in a reproducible order; registrations
+    use fresh user names starting at first_new_user.
+
+    Args:
+        user_ids (list): The IDs of the seeded users.
+        rng (random.Random): The source of the user order.
+        first_new_user (int): The index of the first user name to register.
+
+    Returns:
+        dict: The scenario name mapped to its request factory.
+    """
+    order = [rng.choice(user_ids) for _ in range(4096)]
+
+    def user(number):
+        return order[number % len(order)]
+
+    def register(number):
+        name = user_name(first_new_user + number)
+        return "POST", "/user/register", {"json": {"id": 0, "user_name": name, "password": SEED_PASSWORD,
+                                                   "email": f"{name}@example.com", "address": "1 Bench St",
+                                                   "phone": "0501234567", "balance": 0}}
+
+    def login(number):
+        return "POST", "/user/login", {"params": {"user_name": user_name(user(number)),
+                                                  "user_password": SEED_PASSWORD}}
+
+    def create_expense(number):
+        user_id = user(number)
+        return "POST", f"/expense/create_expense_to_user/{user_id}", {
+            "params": {"user_id": user_id},
+            "json": {"id": 0, "user_id": user_id, "total_expense": 12.5,
+                     "date": datetime.datetime.now().isoformat(), "description_expense": "bench"}}
+
+    def list_expenses(number):
+        return "GET", f"/expense/user/{user(number)}", {}
+
+    def chart(path):
+        def make_request(number):
+            return "GET", f"/visualization/{path}", {"params": {"user_id": user(number)}}
+        return make_request
+
+    return {
+        "register": register,
+        "login": login,
+        "expense_create": create_expense,
+        "expense_list": list_expenses,
+        "chart_bar": chart("plot_revenue_expense_per_user"),
+        "chart_over_time": chart("plot_revenue_expense_over_time"),
+        "chart_pie": chart("plot_pie_chart"),
+    }
@@ -0,0 +1,78 @@
+import datetime
+from app.db import db_functions, id_allocator, ledger_store
+from app.services import password_service, summary_service
+from app.services.ledger_service import BALANCE_SNAPSHOTS_COLLECTION
+
+SEED_PASSWORD = "Bench!2345"
+SEED_BATCH_SIZE = 10000
+# Large enough that the expense-create scenario never hits the deficit limit.
+OPENING_BALANCE = 1000000.0
+
+
+def user_name(index):
+    """
+    Returns a unique, purely alphabetic user name for an index, as the user name validator requires.
+
+    Args:
+        index (int): The index of the user.
+
+    Returns:
+        str: The user name, e.g. "benchb" for 1.
+    """
+    letters = ""
+    while True:
+        index, remainder = divmod(index, 26)
+        letters = chr(ord('a') + remainder) + letters
+        if index == 0:
+            return "bench" + letters
+
+
+def _entries(count, first_id, user_ids, amount_field, description_field, rng, now):
+    return [{"id": first_id + offset, "user_id": user_ids[offset % len(user_ids)],
+             amount_field: round(rng.uniform(1, 200), 2),
+             "date": now - datetime.timedelta(days=rng.randrange(365), seconds=rng.randrange(86400)),
+             description_field: f"bench {offset}"}
+            for offset in range(count)]
+
+
+async def _insert(collection_name, documents):
+    for start in range(0, len(documents), SEED_BATCH_SIZE):
+        batch = documents[start:start + SEED_BATCH_SIZE]
+        await ledger_store.add_many(batch, collection_name)
+        await summary_service.apply_entries(collection_name, batch)
+
+
+async def seed_data(users, expenses, revenues, rng):
+    """
+    Stores benchmark users with expenses and revenues spread round-robin over them and over the last year.
+
+    Every user gets the same password (SEED_PASSWORD) and a balance of OPENING_BALANCE, recorded as
+    their opening ledger snapshot.
+
+    Args:
+        users (int): The number of users.
+        expenses (int): The total number of expenses.
+        revenues (int): The total number of revenues.
+        rng (random.Random): The source of amounts and dates, seeded for reproducible data.
+
+    Returns:
+        list: The IDs of the seeded users.
+    """
+    now = datetime.datetime.now()
+    first_user_id = await id_allocator.reserve_ids("users", users)
+    user_ids = list(range(first_user_id, first_user_id + users))
+    expense_documents = _entries(expenses, await id_allocator.reserve_ids("expenses", max(expenses, 1)), user_ids,
+                                 "total_expense", "description_expense", rng, now)
+    revenue_documents = _entries(revenues, await id_allocator.reserve_ids("revenues", max(revenues, 1)), user_ids,
+                                 "total_revenue", "description_revenue", rng, now)
+
+    password = await password_service.hash_password(SEED_PASSWORD)
+    await db_functions.add_many([{"id": user_id, "user_name": user_name(user_id), "password": password,
+                                  "email": f"{user_name(user_id)}@example.com", "address": "1 Bench St",
+                                  "phone": "0501234567", "balance": OPENING_BALANCE, "ledger_version": 0}
+                                 for user_id in user_ids], collection_name="users")
+    await db_functions.add_many([{"user_id": user_id, "version": 0, "balance": OPENING_BALANCE, "created_at": now}
+                                 for user_id in user_ids], collection_name=BALANCE_SNAPSHOTS_COLLECTION)
+    await _insert("expenses", expense_documents)
+    await _insert("revenues", revenue_documents)
+    return user_ids